@@ -0,0 +1,57 @@
+"""Payload decoding and response encoding speed, for every codec, on telemetry payloads
+
+    python -m benchmarks.codec
+    python -m benchmarks.codec --telemetry-sizes 100,10000
+
+Decoding is measured on the body of a telemetry request, encoding on the
+response echoing every point as a failure, the worst case.
+"""
+import argparse
+import json
+import random
+import timeit
+
+from benchmarks import suite
+from mds_agency_validator import codec
+
+
+def get_codecs():
+    """name: (encode the payload into a body, decode a body)"""
+    codecs = {'json': (lambda payload: json.dumps(payload).encode('utf8'), codec.loads_json)}
+    if codec.ORJSON_INSTALLED:
+        codecs['orjson'] = (codecs['json'][0], codec.loads_orjson)
+    if codec.MSGPACK_INSTALLED:
+        codecs['msgpack'] = (codec.msgpack.packb, codec.loads_msgpack)
+    return codecs
+
+
+def run(telemetry_sizes=(1, 100, 10000), repeat=5, log=None):
+    """Return {size: {name: (body size, decode us, encode us)}}"""
+    random.seed(0)
+    results = {}
+    for size in telemetry_sizes:
+        payload = suite.telemetry_points(suite.VERSIONS['v1_0_0'], size)
+        response = {'result': 0, 'failures': payload['data']}
+        number = max(1, 1000 // size)
+        encode_time = min(timeit.repeat(lambda: codec.dumps(response), number=number, repeat=repeat)) / number
+        results[size] = {}
+        for name, (encode, decode) in get_codecs().items():
+            body = encode(payload)
+            assert decode(body) == payload
+            decode_time = min(timeit.repeat(lambda: decode(body), number=number, repeat=repeat)) / number
+            results[size][name] = (len(body), decode_time * 1e6, encode_time * 1e6)
+            if log:
+                log('%-8s %8d points %10d bytes %12.1fus decode %12.1fus encode' % ((name, size) + results[size][name]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--telemetry-sizes', type=suite.parse_sizes, default=(1, 100, 10000))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    run(args.telemetry_sizes, args.repeat, log=lambda line: print(line, flush=True))
+
+
+if __name__ == '__main__':
+    main()
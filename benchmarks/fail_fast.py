@@ -0,0 +1,67 @@
+"""Invalid requests validation speed, with full and fail-fast validation
+
+    python -m benchmarks.fail_fast
+    python -m benchmarks.fail_fast --telemetry-sizes 100,1000 --engines compiled
+
+Every invalid case of the benchmark suite is run with both validation engines,
+once reporting all anomalies, once with the `fail_fast` query parameter.
+"""
+import argparse
+import statistics
+
+from benchmarks import suite
+from mds_agency_validator.app import app
+
+
+def with_query(case, fail_fast):
+    """Copy of case whose requests give the fail_fast query parameter"""
+    query_string = {'fail_fast': 'true' if fail_fast else 'false'}
+    make_request = lambda: dict(case.make_request(), query_string=query_string)
+    return suite.Case(case.name, case.endpoint, make_request, case.status, case.view_args)
+
+
+def run(engines=('cerberus', 'compiled'), telemetry_sizes=(100, 1000), min_time=1.0, min_rounds=3, log=None):
+    """Return {engine: {case name: (full median ms, fail-fast median ms)}}"""
+    results = {}
+    client = app.test_client()
+    cases = [case for case in suite.route_cases(telemetry_sizes) if case.name.endswith('.invalid')]
+    default_engine = app.config['VALIDATION_ENGINE']
+    with app.test_request_context():
+        suite.fill_registry(1)
+        try:
+            for engine in engines:
+                app.config['VALIDATION_ENGINE'] = engine
+                results[engine] = {}
+                for case in cases:
+                    medians = tuple(
+                        statistics.median(
+                            suite.run_case(client, with_query(case, fail_fast), min_time, min_rounds, 10000)
+                        )
+                        * 1000
+                        for fail_fast in (False, True)
+                    )
+                    results[engine][case.name] = medians
+                    if log:
+                        log(
+                            '%-9s %-32s %10.3fms %10.3fms  x%.2f'
+                            % ((engine, case.name) + medians + (medians[0] / medians[1],))
+                        )
+        finally:
+            app.config['VALIDATION_ENGINE'] = default_engine
+            suite.cache.clear()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--engines', type=lambda value: tuple(value.split(',')), default=('cerberus', 'compiled'))
+    parser.add_argument('--telemetry-sizes', type=suite.parse_sizes, default=(100, 1000))
+    parser.add_argument('--min-time', type=float, default=1.0, help='minimum seconds spent on each case')
+    parser.add_argument('--min-rounds', type=int, default=3)
+    args = parser.parse_args(argv)
+    print('%-9s %-32s %12s %12s' % ('engine', 'case', 'full', 'fail-fast'))
+    run(args.engines, args.telemetry_sizes, args.min_time, args.min_rounds, log=lambda line: print(line, flush=True))
+
+
+if __name__ == '__main__':
+    main()
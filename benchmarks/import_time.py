@@ -0,0 +1,86 @@
+"""Cold start time: importing the package and the application in fresh interpreters
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 250
+
+The application is imported with and without SCHEMA_WARM_UP. Without it,
+importing the application must stay within the budget, and must not import
+the dependencies only requests need: the run fails otherwise.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies which should only be imported by requests, or not at all
+DEFERRED_MODULES = ('pkg_resources', 'cerberus', 'yaml', 'numpy', 'jwt', 'orjson', 'msgpack')
+
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'deferred': sorted(name for name in %r if name in sys.modules)}))
+'''
+
+
+def measure(module, settings=None, repeat=5):
+    """Return (best import time in seconds, deferred modules imported anyway)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    if settings is not None:
+        env['MDS_AGENCY_VALIDATOR_SETTINGS'] = settings
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', SCRIPT % (module, DEFERRED_MODULES)],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        result = json.loads(output.decode('utf8').splitlines()[-1])
+        times.append(result['seconds'])
+    return min(times), result['deferred']
+
+
+def run(repeat=5, log=None):
+    """Return {case: (import ms, deferred modules imported anyway)}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        no_warm_up = os.path.join(directory, 'settings.py')
+        with open(no_warm_up, 'w') as settings:
+            settings.write('SCHEMA_WARM_UP = False\n')
+        cases = {
+            'package': ('mds_agency_validator', None),
+            'app': ('mds_agency_validator.app', None),
+            'app.no_warm_up': ('mds_agency_validator.app', no_warm_up),
+        }
+        for name, (module, settings) in cases.items():
+            seconds, deferred = measure(module, settings, repeat)
+            results[name] = (seconds * 1000, deferred)
+            if log:
+                log('%-16s %8.1fms   %s' % (name, seconds * 1000, ', '.join(deferred) or '-'))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=250.0, help='budget of app.no_warm_up')
+    args = parser.parse_args(argv)
+    results = run(args.repeat, log=lambda line: print(line, flush=True))
+    milliseconds, deferred = results['app.no_warm_up']
+    if deferred:
+        print('Imported on start: %s' % ', '.join(deferred))
+        return 1
+    if milliseconds > args.budget_ms:
+        print('Start is slower than its budget: %.1fms > %.1fms' % (milliseconds, args.budget_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
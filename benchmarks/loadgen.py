@@ -0,0 +1,345 @@
+"""Synthetic fleet traffic at a target request rate, to size deployments
+
+    python -m benchmarks.loadgen --rps 200 --duration 30
+    python -m benchmarks.loadgen --url http://localhost:5000 --version v0_4_0 --providers 5 --devices 1000
+
+Each provider registers its devices through /vehicles, then devices move
+through the state machine of the API version, emitting valid events, while
+providers post telemetry batches of their devices. Requests are sent by an
+open-loop scheduler: the n-th request is due at n / rps seconds whatever the
+latency of previous ones, and latencies are measured from that due time, so
+that a saturated validator shows up as growing latencies instead of a lower
+request rate.
+
+Without --url, requests go through the Flask test client, in process.
+"""
+import argparse
+import concurrent.futures
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+import jwt
+from flask import url_for
+
+from benchmarks import suite
+from mds_agency_validator import replay
+from mds_agency_validator.app import app
+from mds_agency_validator.v0_4_0 import validators as v0_4_0
+from mds_agency_validator.v1_0_0 import transitions
+from tests import utils
+
+# Agency API 0.4.0 has no transition table, these follow its state machine diagram.
+# state: [(event_type, next state)]
+V0_4_0_TRANSITIONS = {
+    'removed': [('provider_drop_off', 'available')],
+    'available': [
+        ('reserve', 'reserved'),
+        ('trip_start', 'trip'),
+        ('service_end', 'unavailable'),
+        ('provider_pick_up', 'removed'),
+        ('city_pick_up', 'removed'),
+    ],
+    'reserved': [('trip_start', 'trip'), ('cancel_reservation', 'available')],
+    'trip': [('trip_end', 'available'), ('trip_leave', 'elsewhere')],
+    'elsewhere': [('trip_enter', 'trip')],
+    'unavailable': [('service_start', 'available'), ('provider_pick_up', 'removed')],
+}
+
+# States of both versions during which a trip keeps its trip_id
+TRIP_STATES = frozenset(['on_trip', 'trip', 'elsewhere', 'reserved'])
+
+# off_hours is a service_end reason of the validator, but not an allowed event_type_reason of the schema
+V0_4_0_REASONS = {
+    event_type: [reason for reason in reasons if reason != 'off_hours']
+    for event_type, reasons in v0_4_0.EVENT_TYPE_TO_EVENT_TYPES_REASONS.items()
+}
+
+
+def v1_0_0_transitions():
+    """state: [(event_type, next state)], for events accepted with SEQUENCE_CHECKS"""
+    moves = {}
+    for state in transitions.ALLOWED_STATE_TRANSITIONS:
+        moves[state] = [
+            (event_type, next_state)
+            for next_state, event_types in sorted(transitions.ALLOWED_STATE_TRANSITIONS.items())
+            for event_type in event_types
+            if state in transitions.UNCONSTRAINED_STATES
+            or state in transitions.PREVIOUS_STATES.get(event_type, [state])
+        ]
+    return moves
+
+
+class Device:
+    __slots__ = ('device_id', 'provider', 'state', 'trip_id')
+
+    def __init__(self, device_id, provider, state):
+        self.device_id = device_id
+        self.provider = provider
+        self.state = state
+        self.trip_id = None
+
+
+class Fleet:
+    """Devices of several providers, building the requests of their traffic
+
+    Requests are (kind, path, body, headers) tuples. Devices change state as
+    their events are built, requests must be sent in the order they are built.
+    """
+
+    def __init__(self, version, providers=2, devices=100, telemetry_share=0.3, batch_size=50):
+        self.version = version
+        self.builders = suite.VERSIONS[version]
+        self.telemetry_share = telemetry_share
+        self.batch_size = batch_size
+        if version == 'v1_0_0':
+            self.transitions = v1_0_0_transitions()
+            self.trip_event_types = transitions.TRIP_EVENT_TYPES
+        else:
+            self.transitions = V0_4_0_TRANSITIONS
+            self.trip_event_types = v0_4_0.TRIP_EVENT_TYPES
+        self.tokens = {}
+        self.devices = []
+        for _ in range(providers):
+            provider = str(uuid.uuid4())
+            self.tokens[provider] = jwt.encode({'provider_id': provider}, 'secret', algorithm='HS256')
+            # Registered devices are not deployed yet
+            self.devices += [Device(str(uuid.uuid4()), provider, 'removed') for _ in range(devices)]
+        with app.test_request_context():
+            self.register_path = url_for('%s.vehicle_register' % version)
+            self.telemetry_path = url_for('%s.vehicle_telemetry' % version)
+            self.event_paths = {
+                device.device_id: url_for('%s.vehicle_event' % version, device_id=device.device_id)
+                for device in self.devices
+            }
+
+    def build(self, kind, path, provider, payload):
+        request = utils.get_request(payload)
+        headers = dict(request['headers'], **{'Content-Type': request['content_type']})
+        headers['Authorization'] = 'Bearer %s' % self.tokens[provider]
+        return kind, path, request['data'].encode('utf8'), headers
+
+    def telemetry(self, device):
+        return dict(self.builders['telemetry'](), device_id=device.device_id)
+
+    def registrations(self):
+        for device in self.devices:
+            payload = dict(self.builders['register'](), device_id=device.device_id)
+            yield self.build('register', self.register_path, device.provider, payload)
+
+    def next_event(self, device):
+        event_type, device.state = random.choice(self.transitions[device.state])
+        event = {'telemetry': self.telemetry(device), 'timestamp': utils.get_timestamp()}
+        if self.version == 'v1_0_0':
+            event.update(vehicle_state=device.state, event_types=[event_type])
+        else:
+            event['event_type'] = event_type
+            if event_type in V0_4_0_REASONS:
+                event['event_type_reason'] = random.choice(V0_4_0_REASONS[event_type])
+        if event_type in self.trip_event_types:
+            if device.trip_id is None:
+                device.trip_id = str(uuid.uuid4())
+            event['trip_id'] = device.trip_id
+        if device.state not in TRIP_STATES:
+            device.trip_id = None
+        return self.build('event', self.event_paths[device.device_id], device.provider, event)
+
+    def next_telemetry(self):
+        provider = random.choice(self.devices).provider
+        devices = [device for device in self.devices if device.provider == provider]
+        points = [self.telemetry(random.choice(devices)) for _ in range(self.batch_size)]
+        return self.build('telemetry', self.telemetry_path, provider, {'data': points})
+
+    def traffic(self):
+        """Endless requests, telemetry batches for telemetry_share of them"""
+        while True:
+            if random.random() < self.telemetry_share:
+                yield self.next_telemetry()
+            else:
+                yield self.next_event(random.choice(self.devices))
+
+
+class InProcessSender:
+    """Send requests through the Flask test client, one client per thread"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, path, body, headers):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = app.test_client()
+        return client.post(path, data=body, headers=headers).status_code
+
+
+class HttpSender:
+    """Send requests to a validator over HTTP, one keep-alive connection per thread"""
+
+    def __init__(self, url):
+        url = urllib.parse.urlsplit(url)
+        self.host = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.local = threading.local()
+
+    def __call__(self, path, body, headers):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(self.host)
+        try:
+            connection.request('POST', self.prefix + path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            # Counted as an error, reconnect for the next request
+            connection.close()
+            self.local.connection = None
+            return 0
+
+
+class Recorder:
+    """Latencies and status codes of sent requests, by kind"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # kind: [(latency in seconds, status code)]
+        self.samples = {}
+
+    def record(self, kind, latency, status):
+        with self.lock:
+            self.samples.setdefault(kind, []).append((latency, status))
+
+    def summary(self, elapsed=None):
+        kinds = dict(self.samples)
+        kinds['all'] = [sample for samples in self.samples.values() for sample in samples]
+        results = {}
+        for kind, samples in sorted(kinds.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, status in samples if status != 201)
+            statuses = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            results[kind] = {
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': errors / len(samples) if samples else 0.0,
+                'statuses': statuses,
+                'latency_ms': {
+                    name: replay.percentile(latencies, fraction) * 1000 if latencies else 0.0
+                    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999), ('max', 1.0))
+                },
+            }
+            if elapsed:
+                results[kind]['rps'] = len(samples) / elapsed
+        return results
+
+
+def send(sender, recorder, request, due):
+    kind, path, body, headers = request
+    status = sender(path, body, headers)
+    recorder.record(kind, time.perf_counter() - due, status)
+
+
+def run(
+    version='v1_0_0',
+    providers=2,
+    devices=100,
+    rps=100.0,
+    duration=10.0,
+    telemetry_share=0.3,
+    batch_size=50,
+    workers=8,
+    url=None,
+    seed=None,
+    log=None,
+):
+    """Register the fleet, then send its traffic at rps for duration seconds
+
+    Return {'register': summary, 'traffic': summary}, summaries by request kind.
+    """
+    random.seed(seed)
+    fleet = Fleet(version, providers, devices, telemetry_share, batch_size)
+    sender = HttpSender(url) if url else InProcessSender()
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        recorder = Recorder()
+        start = time.perf_counter()
+        futures = [
+            executor.submit(send, sender, recorder, request, time.perf_counter()) for request in fleet.registrations()
+        ]
+        concurrent.futures.wait(futures)
+        results['register'] = recorder.summary(time.perf_counter() - start)
+        if log:
+            log('registered %d devices in %.1fs' % (len(fleet.devices), time.perf_counter() - start))
+
+        recorder = Recorder()
+        traffic = fleet.traffic()
+        futures = []
+        start = time.perf_counter()
+        for index in range(int(rps * duration)):
+            # Built before waiting, so that building doesn't delay sending
+            request = next(traffic)
+            due = start + index / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send, sender, recorder, request, due))
+        concurrent.futures.wait(futures)
+        results['traffic'] = recorder.summary(time.perf_counter() - start)
+    if log:
+        for kind, summary in results['traffic'].items():
+            log(
+                '%-10s %7d requests %8.1f rps %6.2f%% errors   p50 %8.2fms p99 %8.2fms max %8.2fms'
+                % (
+                    kind,
+                    summary['requests'],
+                    summary['rps'],
+                    summary['error_rate'] * 100,
+                    summary['latency_ms']['p50'],
+                    summary['latency_ms']['p99'],
+                    summary['latency_ms']['max'],
+                )
+            )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--version', choices=sorted(suite.VERSIONS), default='v1_0_0')
+    parser.add_argument('--providers', type=int, default=2)
+    parser.add_argument('--devices', type=int, default=100, help='devices per provider')
+    parser.add_argument('--rps', type=float, default=100.0, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of traffic')
+    parser.add_argument('--telemetry-share', type=float, default=0.3, help='share of telemetry batches in traffic')
+    parser.add_argument('--batch-size', type=int, default=50, help='points per telemetry batch')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent requests')
+    parser.add_argument('--url', help='validator base url, requests go through the test client without it')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='write results as json')
+    args = parser.parse_args(argv)
+    results = run(
+        args.version,
+        args.providers,
+        args.devices,
+        args.rps,
+        args.duration,
+        args.telemetry_share,
+        args.batch_size,
+        args.workers,
+        args.url,
+        args.seed,
+        log=lambda line: print(line, flush=True),
+    )
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    return 0 if results['traffic']['all']['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+"""Memory used per registered device, by registry backend
+
+    python -m benchmarks.registry_memory --devices 1000000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+import uuid
+
+from mds_agency_validator.cache import Cache
+from mds_agency_validator.compact_cache import CompactCache
+from tests.v1_0_0.test_vehicle_register import PROPULSION_TYPE, VEHICLE_TYPE
+
+
+class DictCache:
+    """The original registry: a plain dict of registration payloads"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, payload):
+        self.data[key] = payload
+
+
+BACKENDS = {
+    'dict': DictCache,
+    'memory': Cache,
+    'compact': CompactCache,
+    'compact_with_payload': lambda: CompactCache(keep_payload=True),
+}
+
+
+def generate_payload(rand):
+    return {
+        'device_id': str(uuid.UUID(int=rand.getrandbits(128), version=4)),
+        'vehicle_id': 'AM-%04d-%s' % (rand.randrange(10000), rand.choice(['EZ', 'FR', 'KL'])),
+        'vehicle_type': rand.choice(VEHICLE_TYPE),
+        'propulsion_types': [rand.choice(PROPULSION_TYPE)],
+        'year': rand.randint(2015, 2021),
+    }
+
+
+def measure(backend_factory, devices):
+    """Return bytes allocated per device, to store devices registration payloads.
+    Payloads are created as the registration route does, from a parsed request,
+    so their memory is counted.
+    """
+    rand = random.Random(0)
+    gc.collect()
+    tracemalloc.start()
+    cache = backend_factory()
+    for _ in range(devices):
+        payload = generate_payload(rand)
+        cache.set(payload['device_id'], payload)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / devices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=1000000)
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS))
+    args = parser.parse_args()
+    for name in args.backend or BACKENDS:
+        print('%-22s %8.1f bytes/device' % (name, measure(BACKENDS[name], args.devices)))
+
+
+if __name__ == '__main__':
+    main()
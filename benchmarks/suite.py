@@ -0,0 +1,281 @@
+"""Request validation speed, for every route of both Agency API versions
+
+    python -m benchmarks.suite --output build/benchmarks.json
+    python -m benchmarks.suite --compare build/benchmarks.json --threshold 0.2
+
+Requests go through the test client, with payloads built by the functional
+tests helpers. Results are written as json, and compared with a previous run:
+the run fails when a case median is slower than the threshold allows.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from flask import url_for
+
+from benchmarks.registry_memory import generate_payload as generate_device
+from mds_agency_validator.app import app
+from mds_agency_validator.cache import cache
+from tests import utils
+from tests.v0_4_0 import test_vehicle_event as v0_4_0_event
+from tests.v0_4_0 import test_vehicle_register as v0_4_0_register
+from tests.v0_4_0 import test_vehicle_update as v0_4_0_update
+from tests.v0_4_0.utils import generate_telemetry as v0_4_0_telemetry
+from tests.v1_0_0 import test_vehicle_event as v1_0_0_event
+from tests.v1_0_0 import test_vehicle_register as v1_0_0_register
+from tests.v1_0_0 import test_vehicle_update as v1_0_0_update
+from tests.v1_0_0.utils import generate_telemetry as v1_0_0_telemetry
+
+TELEMETRY_SIZES = (1, 100, 10000)
+REGISTRY_SIZES = (10, 10000, 1000000)
+
+VERSIONS = {
+    'v0_4_0': {
+        'register': v0_4_0_register.generate_payload,
+        'update': v0_4_0_update.generate_payload,
+        'event': lambda: v0_4_0_event.generate_payload(
+            {'event_type': 'trip_start', 'trip_id': utils.REGISTERED_DEVICE_ID}
+        ),
+        'telemetry': v0_4_0_telemetry,
+    },
+    'v1_0_0': {
+        'register': v1_0_0_register.generate_payload,
+        'update': v1_0_0_update.generate_payload,
+        'event': lambda: v1_0_0_event.generate_payload({'vehicle_state': 'available', 'event_types': ['maintenance']}),
+        'telemetry': v1_0_0_telemetry,
+    },
+}
+
+
+class Case:
+    """One kind of request, built by make_request before each round"""
+
+    def __init__(self, name, endpoint, make_request, status, view_args=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.make_request = make_request
+        self.status = status
+        self.view_args = view_args or {}
+
+
+# Fields given a wrong type in invalid payloads
+INVALID_FIELDS = {
+    'register': ('device_id', 'vehicle_id', 'year'),
+    'update': ('vehicle_id',),
+    'event': ('telemetry', 'timestamp'),
+}
+
+
+def invalid(payload, kind):
+    """Break types of some fields, so that validators report errors"""
+    payload = dict(payload)
+    for field in INVALID_FIELDS[kind]:
+        payload[field] = 12.5
+    return payload
+
+
+def prebuilt(payload):
+    """Encode the request once, rounds reuse it"""
+    request = utils.get_request(payload)
+    return lambda: request
+
+
+def telemetry_points(builders, count, invalid_points=False):
+    points = [builders['telemetry']() for _ in range(count)]
+    if invalid_points:
+        # Every other point is invalid, batches of more than one point are accepted
+        for point in points[::2]:
+            point['gps'] = {'lat': 'north', 'lng': 500}
+    return {'data': points}
+
+
+def route_cases(telemetry_sizes):
+    device_id = {'device_id': utils.REGISTERED_DEVICE_ID}
+    for version, builders in VERSIONS.items():
+        yield Case(
+            '%s.register.valid' % version,
+            '%s.vehicle_register' % version,
+            lambda builders=builders: utils.get_request(builders['register']()),
+            201,
+        )
+        yield Case(
+            '%s.register.invalid' % version,
+            '%s.vehicle_register' % version,
+            prebuilt(invalid(builders['register'](), 'register')),
+            400,
+        )
+        for kind in ('update', 'event'):
+            yield Case(
+                '%s.%s.valid' % (version, kind),
+                '%s.vehicle_%s' % (version, kind),
+                prebuilt(builders[kind]()),
+                201,
+                device_id,
+            )
+            yield Case(
+                '%s.%s.invalid' % (version, kind),
+                '%s.vehicle_%s' % (version, kind),
+                prebuilt(invalid(builders[kind](), kind)),
+                400,
+                device_id,
+            )
+        for size in telemetry_sizes:
+            yield Case(
+                '%s.telemetry.%d.valid' % (version, size),
+                '%s.vehicle_telemetry' % version,
+                prebuilt(telemetry_points(builders, size)),
+                201,
+            )
+            yield Case(
+                '%s.telemetry.%d.invalid' % (version, size),
+                '%s.vehicle_telemetry' % version,
+                prebuilt(telemetry_points(builders, size, invalid_points=True)),
+                201 if size > 1 else 400,
+            )
+
+
+def registry_cases(size):
+    builders = VERSIONS['v1_0_0']
+    device_id = {'device_id': utils.REGISTERED_DEVICE_ID}
+    yield Case('registry.%d.event' % size, 'v1_0_0.vehicle_event', prebuilt(builders['event']()), 201, device_id)
+    yield Case(
+        'registry.%d.telemetry.100' % size,
+        'v1_0_0.vehicle_telemetry',
+        prebuilt(telemetry_points(builders, 100)),
+        201,
+    )
+
+
+def fill_registry(size):
+    cache.clear()
+    rand = random.Random(0)
+    for _ in range(size - 1):
+        payload = generate_device(rand)
+        cache.set(payload['device_id'], payload)
+    utils.register_device()
+
+
+def run_case(client, case, min_time, min_rounds, max_rounds):
+    """Return the durations of each round, in seconds"""
+    url = url_for(case.endpoint, **case.view_args)
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < min_rounds or (time.perf_counter() - start < min_time and len(durations) < max_rounds):
+        request = case.make_request()
+        before = time.perf_counter()
+        response = client.post(url, **request)
+        durations.append(time.perf_counter() - before)
+        if response.status_code != case.status:
+            raise AssertionError('%s: expected status %d, got %d' % (case.name, case.status, response.status_code))
+    return durations
+
+
+def summarize(durations):
+    durations = sorted(durations)
+    return {
+        'rounds': len(durations),
+        'median_ms': statistics.median(durations) * 1000,
+        'mean_ms': statistics.mean(durations) * 1000,
+        'min_ms': durations[0] * 1000,
+        'p99_ms': durations[min(len(durations) - 1, int(round(0.99 * (len(durations) - 1))))] * 1000,
+        'per_second': len(durations) / sum(durations),
+    }
+
+
+def run(
+    telemetry_sizes=TELEMETRY_SIZES,
+    registry_sizes=REGISTRY_SIZES,
+    min_time=1.0,
+    min_rounds=3,
+    max_rounds=10000,
+    selection=None,
+    log=None,
+):
+    """Run the benchmarks, return results by case name"""
+    results = {}
+    client = app.test_client()
+    groups = [(1, route_cases(telemetry_sizes))] + [(size, registry_cases(size)) for size in registry_sizes]
+    with app.test_request_context():
+        for registry_size, cases in groups:
+            cases = [case for case in cases if not selection or selection in case.name]
+            if not cases:
+                continue
+            fill_registry(registry_size)
+            for case in cases:
+                results[case.name] = summarize(run_case(client, case, min_time, min_rounds, max_rounds))
+                if log:
+                    log(
+                        '%-32s %10.3fms %10.1f/s'
+                        % (case.name, results[case.name]['median_ms'], results[case.name]['per_second'])
+                    )
+    cache.clear()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline median, median, ratio) of cases slower than threshold allows"""
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = result['median_ms'] / baseline[name]['median_ms']
+        if ratio > 1 + threshold:
+            regressions.append((name, baseline[name]['median_ms'], result['median_ms'], ratio))
+    return regressions
+
+
+def get_metadata():
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'validation_engine': app.config['VALIDATION_ENGINE'],
+        'registry_backend': app.config['REGISTRY_BACKEND'],
+    }
+
+
+def parse_sizes(value):
+    return tuple(int(size) for size in value.split(',') if size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help='write results to this json file')
+    parser.add_argument('--compare', help='json results of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown ratio, 0.2 for 20%%')
+    parser.add_argument('-k', '--select', help='only run cases whose name contains this string')
+    parser.add_argument('--telemetry-sizes', type=parse_sizes, default=TELEMETRY_SIZES)
+    parser.add_argument('--registry-sizes', type=parse_sizes, default=REGISTRY_SIZES)
+    parser.add_argument('--min-time', type=float, default=1.0, help='minimum seconds spent on each case')
+    parser.add_argument('--min-rounds', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run(
+        telemetry_sizes=args.telemetry_sizes,
+        registry_sizes=args.registry_sizes,
+        min_time=args.min_time,
+        min_rounds=args.min_rounds,
+        selection=args.select,
+        log=lambda line: print(line, flush=True),
+    )
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'metadata': get_metadata(), 'results': results}, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print('Regression %-32s %10.3fms -> %10.3fms (x%.2f)' % (name, before, after, ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
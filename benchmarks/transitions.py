@@ -0,0 +1,73 @@
+"""Event transition checks: compiled bit masks against the original set based code
+
+    python -m benchmarks.transitions
+"""
+import argparse
+import itertools
+import timeit
+
+from mds_agency_validator.v1_0_0 import transitions
+
+
+def legacy_check(payload):
+    """The original checks of VehicleEvent.additional_checks, return (bad_param, missing_param)"""
+    bad_param, missing_param = [], []
+    vehicle_state = payload['vehicle_state']
+    event_types = set(payload['event_types'])
+    if not event_types & {'comms_restored', 'located'}:
+        allowed_event_types = transitions.ALLOWED_STATE_TRANSITIONS[vehicle_state]
+        if not event_types & set(allowed_event_types) and not 'unspecified' in event_types:
+            bad_param.append('event_types')
+    if event_types & {
+        'trip_start',
+        'trip_cancel',
+        'trip_enter_jurisdiction',
+        'trip_leave_jurisdiction',
+        'trip_end',
+    }:
+        if 'trip_id' not in payload:
+            missing_param.append('trip_id')
+    else:
+        if 'trip_id' in payload:
+            bad_param.append('trip_id')
+    return bad_param, missing_param
+
+
+def compiled_check(payload):
+    """The same checks, with the compiled transition table"""
+    bad_param, missing_param = [], []
+    vehicle_state = payload['vehicle_state']
+    event_types = transitions.TRANSITIONS.mask(payload['event_types'])
+    if not transitions.TRANSITIONS.allows(vehicle_state, event_types):
+        bad_param.append('event_types')
+    if event_types & transitions.TRANSITIONS.trip_events:
+        if 'trip_id' not in payload:
+            missing_param.append('trip_id')
+    else:
+        if 'trip_id' in payload:
+            bad_param.append('trip_id')
+    return bad_param, missing_param
+
+
+def generate_payloads(max_event_types=2):
+    """Every state, with every combination of up to max_event_types event types, with and without trip_id"""
+    event_types = sorted(transitions.TRANSITIONS.bits) + ['unknown_event_type']
+    for state in sorted(transitions.ALLOWED_STATE_TRANSITIONS):
+        for size in range(1, max_event_types + 1):
+            for combination in itertools.combinations(event_types, size):
+                yield {'vehicle_state': state, 'event_types': list(combination)}
+                yield {'vehicle_state': state, 'event_types': list(combination), 'trip_id': 'trip'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    payloads = list(generate_payloads())
+    for name, check in (('legacy', legacy_check), ('compiled', compiled_check)):
+        duration = min(timeit.repeat(lambda: [check(payload) for payload in payloads], number=1, repeat=args.repeat))
+        print('%-10s %8.3f us/event' % (name, duration / len(payloads) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,14 @@
-import pkg_resources
+def __getattr__(name):
+    """Resolve __version__ on first use: reading installed distributions is slow"""
+    if name != '__version__':
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    try:
+        from importlib.metadata import version
+    except ImportError:  # pragma: no cover
+        import pkg_resources
 
-__version__ = pkg_resources.get_distribution('mds-agency-validator').version
+        value = pkg_resources.get_distribution('mds-agency-validator').version
+    else:
+        value = version('mds-agency-validator')
+    globals()['__version__'] = value
+    return value
@@ -1,14 +1,43 @@
 from flask import Flask
 
+from mds_agency_validator import capture, codec, metrics, timing
+from mds_agency_validator.auth import token_cache
+from mds_agency_validator.cache import cache, create_backend
+from mds_agency_validator.sequence import event_sequences
 from mds_agency_validator.v0_4_0.routes import v0_4_0_bp
 from mds_agency_validator.v1_0_0.routes import blueprint as v1_0_0_bp
+from mds_agency_validator.verdicts import verdict_cache
 
 app = Flask(__name__, static_folder=None)
+app.config.from_object('mds_agency_validator.default_settings')
+app.config.from_envvar('MDS_AGENCY_VALIDATOR_SETTINGS', silent=True)
 
 # Register routes to all validators using blueprints
 app.register_blueprint(v0_4_0_bp, url_prefix='/v0.4.0')
 app.register_blueprint(v1_0_0_bp, url_prefix='/v1.0.0')
 
+timing.install(app)
+if app.config['METRICS']:
+    metrics.install(app)
+
+if app.config['CAPTURE_PATH']:
+    capture.install(app, app.config['CAPTURE_PATH'])
+
+# Fail on start with unknown or missing json decoders
+codec.get_json_decoder(app.config['JSON_DECODER'])
+
+cache.set_backend(create_backend(app.config))
+token_cache.configure(max_entries=app.config['AUTH_CACHE_SIZE'])
+verdict_cache.configure(max_entries=app.config['VERDICT_CACHE_SIZE'])
+if app.config['SEQUENCE_CHECKS']:
+    event_sequences.configure(slots=app.config['SEQUENCE_SLOTS'])
+
+# Compile all schemas once, instead of on first request
+if app.config['SCHEMA_WARM_UP']:
+    from mds_agency_validator.schemas import schema_registry
+
+    schema_registry.warm_up(functions=app.config['VALIDATION_ENGINE'] == 'compiled')
+
 
 @app.route('/')
 def index():
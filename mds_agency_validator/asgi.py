@@ -0,0 +1,120 @@
+"""ASGI entry point of the validator.
+
+Request bodies are read on the event loop, so that slow clients uploading
+large telemetry batches don't hold a worker thread. Once the body is fully
+received, the Flask application (same routes, same validators) runs in a
+thread pool, keeping the event loop responsive during validation. Bodies
+are only buffered up to the MAX_BODY_SIZES limit of their route: once it is
+crossed, the application rejects them without waiting for the rest.
+
+Serve it with any ASGI server, for instance::
+
+    uvicorn mds_agency_validator.asgi:application
+"""
+import asyncio
+import concurrent.futures
+import io
+import sys
+
+from mds_agency_validator import limits
+from mds_agency_validator.app import app
+
+executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=app.config['ASGI_EXECUTOR_WORKERS'], thread_name_prefix='mds-agency-validator'
+)
+
+
+def build_environ(scope, body):
+    """Build the WSGI environ of an ASGI http scope"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+            # The body is fully buffered, its length is known
+            continue
+        else:
+            key = 'HTTP_%s' % name
+            environ[key] = '%s,%s' % (environ[key], value) if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    """Run the Flask application, return (status code, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+
+    result = app.wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+
+async def read_body(receive, limit=None):
+    """Buffer the request body, stop once it is larger than limit bytes"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        chunks.append(chunk)
+        size += len(chunk)
+        if not message.get('more_body', False) or (limit is not None and size > limit):
+            return b''.join(chunks)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError('Unsupported scope type %s' % scope['type'])
+
+    body = await read_body(receive, limits.match_limit(app, scope['path'], scope['method']))
+    if body is None:
+        # The client went away, nothing to answer
+        return
+    loop = asyncio.get_running_loop()
+    status, headers, content = await loop.run_in_executor(executor, call_wsgi, build_environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
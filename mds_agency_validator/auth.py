@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+from mds_agency_validator.lazy import LazyModule
+
+# Imported on first request
+jwt = LazyModule('jwt')
+
+INVALID_JWT = 'Please provide a valid JWT'
+MISSING_PROVIDER_ID = 'Please provide a provider_id'
+
+
+def decode_token(token):
+    """Decode a JWT, return (claims, error message)"""
+    try:
+        claims = jwt.decode(token, options={'verify_signature': False}, algorithms='HS256')
+    except jwt.exceptions.DecodeError:
+        return None, INVALID_JWT
+    # provider_id should be present
+    if 'provider_id' not in claims:
+        return claims, MISSING_PROVIDER_ID
+    return claims, None
+
+
+class TokenCache:
+    """A bounded LRU cache of decoded JWT, keyed by the raw token
+
+    Providers reuse the same token for many requests. Rejected tokens are
+    cached too. Tokens with an `exp` claim are dropped from the cache once
+    expired.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # token: (claims, error message, expiration timestamp or None)
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entries):
+        self.max_entries = max_entries
+        self.clear()
+
+    def decode(self, token):
+        """Return (claims, error message) of the token"""
+        with self.lock:
+            entry = self.data.get(token, None)
+            if entry is not None and (entry[2] is None or entry[2] > time.time()):
+                self.data.move_to_end(token)
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+
+        claims, error = decode_token(token)
+        if self.max_entries:
+            expires = claims.get('exp', None) if isinstance(claims, dict) else None
+            if not isinstance(expires, (int, float)) or isinstance(expires, bool):
+                expires = None
+            with self.lock:
+                self.data[token] = (claims, error, expires)
+                self.data.move_to_end(token)
+                while len(self.data) > self.max_entries:
+                    self.data.popitem(last=False)
+        return claims, error
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = TokenCache()
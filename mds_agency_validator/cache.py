@@ -1,19 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Bounded caches have at most one shard per MIN_SHARD_ENTRIES entries, so that
+# small caches are a single exact LRU
+MIN_SHARD_ENTRIES = 64
+
+
+class CacheShard:
+    """One LRU ordered part of the cache, with its own lock and counters"""
+
+    def __init__(self, max_entries=None):
+        self.lock = threading.Lock()
+        # key: (payload, expiration time or None)
+        self.data = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
 class Cache:
     """A naive in-memory cache implementation to store registered devices.
     Data is not persisted.
+
+    Keys are spread over shards, each with its own lock, so that threads
+    don't wait on each other. Optionally, the cache holds at most max_entries
+    keys, and keys expire ttl seconds after they were set.
+
+    max_entries is split between shards: the cache never holds more than
+    max_entries keys, but a shard evicts its least recently used keys once it
+    holds its part, which may happen while the whole cache holds a little less.
+    Caches of less than 2 * MIN_SHARD_ENTRIES keys have a single shard, and
+    evict exactly the least recently used keys.
     """
 
-    def __init__(self):
-        self.data = {}
+    def __init__(self, max_entries=None, ttl=None, shards=16):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        if max_entries is None:
+            self.shards = [CacheShard() for _ in range(shards)]
+        else:
+            shards = max(1, min(shards, max_entries // MIN_SHARD_ENTRIES))
+            # Parts of shards add up to max_entries
+            self.shards = [
+                CacheShard(max_entries // shards + (index < max_entries % shards)) for index in range(shards)
+            ]
+
+    def get_shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
 
     def set(self, key, payload):
-        self.data[key] = payload
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        shard = self.get_shard(key)
+        with shard.lock:
+            shard.data[key] = (payload, expires)
+            shard.data.move_to_end(key)
+            if shard.max_entries is not None:
+                while len(shard.data) > shard.max_entries:
+                    shard.data.popitem(last=False)
+                    shard.evictions += 1
 
     def get(self, key):
-        return self.data.get(key, None)
+        shard = self.get_shard(key)
+        with shard.lock:
+            try:
+                payload, expires = shard.data[key]
+            except KeyError:
+                shard.misses += 1
+                return None
+            if expires is not None and expires <= time.monotonic():
+                del shard.data[key]
+                shard.evictions += 1
+                shard.misses += 1
+                return None
+            shard.data.move_to_end(key)
+            shard.hits += 1
+            return payload
+
+    def get_many(self, keys):
+        """Return a dict of found keys and their payloads"""
+        found = {}
+        for key in keys:
+            payload = self.get(key)
+            if payload is not None:
+                found[key] = payload
+        return found
 
     def clear(self):
-        self.data = {}
+        for shard in self.shards:
+            with shard.lock:
+                shard.data.clear()
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self.shards)
+
+    def stats(self):
+        return {
+            'entries': len(self),
+            'hits': sum(shard.hits for shard in self.shards),
+            'misses': sum(shard.misses for shard in self.shards),
+            'evictions': sum(shard.evictions for shard in self.shards),
+        }
+
+
+class CacheProxy:
+    """Forward calls to the configured cache backend
+
+    Modules import `cache` before the application settings are loaded,
+    set_backend() then plugs the backend chosen in settings.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def set(self, key, payload):
+        self.backend.set(key, payload)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def get_many(self, keys):
+        return self.backend.get_many(keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def __len__(self):
+        return len(self.backend)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def create_backend(config):
+    """Create the cache backend from application settings"""
+    if config['REGISTRY_BACKEND'] == 'sqlite':
+        from mds_agency_validator.sqlite_cache import SqliteCache
+
+        return SqliteCache(config['REGISTRY_SQLITE_PATH'], read_cache_ttl=config['REGISTRY_SQLITE_READ_CACHE_TTL'])
+    if config['REGISTRY_BACKEND'] == 'compact':
+        from mds_agency_validator.compact_cache import CompactCache
+
+        return CompactCache(keep_payload=config['REGISTRY_COMPACT_KEEP_PAYLOAD'])
+    if config['REGISTRY_BACKEND'] == 'memory':
+        return Cache(max_entries=config['REGISTRY_MAX_ENTRIES'], ttl=config['REGISTRY_TTL'])
+    raise ValueError('Unknown registry backend %s' % config['REGISTRY_BACKEND'])
 
 
-cache = Cache()
+cache = CacheProxy(Cache())
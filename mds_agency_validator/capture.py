@@ -0,0 +1,127 @@
+"""Capture of incoming requests and their verdicts, in a compact binary log.
+
+The log starts with MAGIC, followed by records. Each record is a RECORD
+header (timestamp, response status and lengths), then the endpoint name, a
+json object with the path, url arguments and headers of the request, the raw
+request body and the raw response body.
+
+Set CAPTURE_PATH in settings to capture requests, and replay them with
+`mds-agency-validator replay`.
+"""
+import json
+import struct
+import threading
+import time
+
+from flask import request
+
+MAGIC = b'MDSCAP1\n'
+# timestamp, status, endpoint length, metadata length, body length, response length
+RECORD = struct.Struct('!dHHIII')
+
+
+class CapturedRequest:
+    """A request and its verdict, as read from a capture log"""
+
+    __slots__ = ('timestamp', 'status', 'endpoint', 'path', 'view_args', 'headers', 'body', 'response')
+
+    def __init__(self, timestamp, status, endpoint, path, view_args, headers, body, response):
+        self.timestamp = timestamp
+        self.status = status
+        self.endpoint = endpoint
+        self.path = path
+        self.view_args = view_args
+        self.headers = headers
+        self.body = body
+        self.response = response
+
+    def __repr__(self):
+        return '<CapturedRequest %s %s>' % (self.endpoint, self.status)
+
+
+def encode_record(captured):
+    endpoint = captured.endpoint.encode('utf8')
+    meta = json.dumps(
+        {'path': captured.path, 'view_args': captured.view_args, 'headers': captured.headers},
+        separators=(',', ':'),
+    ).encode('utf8')
+    header = RECORD.pack(
+        captured.timestamp, captured.status, len(endpoint), len(meta), len(captured.body), len(captured.response)
+    )
+    return b''.join((header, endpoint, meta, captured.body, captured.response))
+
+
+def read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated capture log')
+    return data
+
+
+def read_log(stream):
+    """Yield the CapturedRequest of a binary stream"""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a capture log')
+    while True:
+        header = stream.read(RECORD.size)
+        if not header:
+            return
+        if len(header) != RECORD.size:
+            raise ValueError('Truncated capture log')
+        timestamp, status, endpoint_size, meta_size, body_size, response_size = RECORD.unpack(header)
+        endpoint = read_exactly(stream, endpoint_size).decode('utf8')
+        meta = json.loads(read_exactly(stream, meta_size))
+        body = read_exactly(stream, body_size)
+        response = read_exactly(stream, response_size)
+        yield CapturedRequest(
+            timestamp, status, endpoint, meta['path'], meta['view_args'], meta['headers'], body, response
+        )
+
+
+class CaptureWriter:
+    """Append captured requests to a log file, from any thread"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'ab')  # pylint: disable=consider-using-with
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+
+    def write(self, captured):
+        data = encode_record(captured)
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def install(app, path):
+    """Capture all routed requests of app into the log at path"""
+    if app.config['STREAMING_TELEMETRY']:
+        # Streamed bodies are consumed by the validators, and can't be captured
+        raise ValueError('Requests cannot be captured with STREAMING_TELEMETRY')
+    writer = CaptureWriter(path)
+
+    @app.after_request
+    def capture_request(response):
+        # Bodies rejected as too large are not read
+        if request.url_rule is not None and request.blueprint is not None and response.status_code != 413:
+            writer.write(
+                CapturedRequest(
+                    time.time(),
+                    response.status_code,
+                    request.endpoint,
+                    request.path,
+                    request.view_args or {},
+                    list(request.headers.items()),
+                    request.get_data(),
+                    response.get_data(),
+                )
+            )
+        return response
+
+    return writer
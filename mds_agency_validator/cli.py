@@ -0,0 +1,280 @@
+"""Command line interface.
+
+replay validates the requests of a capture log, see replay module.
+
+validate-file validates a dump of provider requests, without a server. The
+dump is a newline-delimited json file, each line being a request::
+
+    {"endpoint": "/v1.0.0/vehicles", "headers": {"Authorization": "Bearer ..."}, "body": {...}}
+
+`body` is either a json value or the raw request body as a string, `method`
+defaults to POST.
+
+Records are validated in a pool of processes. Requests about the same device
+always go to the same process, in the order of the file, so that devices are
+registered before their events and telemetry are checked. Verdicts don't
+depend on the number of processes:
+
+- each process has its own registry, unless the sqlite registry backend is
+  configured, so registrations are validated by every process, and only
+  one of them writes the verdict;
+- with the sqlite registry, batches about devices of several processes
+  wait for the records before them, and records after them wait for them;
+- event sequences are checked per process, SEQUENCE_CHECKS requires a
+  single process.
+
+A verdict is written for each record, with the line number of the record.
+Verdicts of different devices may not be in the order of the file.
+"""
+import argparse
+import concurrent.futures
+import json
+import re
+import sys
+import time
+import zlib
+
+from werkzeug.exceptions import HTTPException
+
+from mds_agency_validator import capture, replay
+from mds_agency_validator.app import app
+
+DEVICE_ID_RE = re.compile(r'"device_id"\s*:\s*"([^"]*)"')
+
+
+def load_description(description):
+    """Abort descriptions of validators are json encoded errors"""
+    try:
+        return json.loads(description)
+    except (TypeError, ValueError):
+        return description
+
+
+def validate_record(record):
+    """Validate one request, return its verdict"""
+    body = record.get('body', '')
+    if not isinstance(body, (str, bytes)):
+        body = json.dumps(body)
+    context = app.test_request_context(
+        record['endpoint'],
+        method=record.get('method', 'POST'),
+        headers=record.get('headers', {}),
+        data=body,
+    )
+    with context:
+        try:
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as error:
+            return {'status': error.code, 'errors': load_description(error.description)}
+    return {'status': response.status_code, 'response': load_description(response.get_data(as_text=True)) or None}
+
+
+def validate_chunk(chunk):
+    """Validate (line number, record) pairs, return (line number, verdict) pairs
+
+    Records without line number are validated for their side effects only.
+    """
+    verdicts = []
+    for line_number, record in chunk:
+        try:
+            verdict = validate_record(record)
+        except Exception as error:  # pylint: disable=broad-except
+            verdict = {'status': None, 'errors': 'Unable to validate record: %r' % error}
+        if line_number is not None:
+            verdicts.append((line_number, verdict))
+    return verdicts
+
+
+def match_record(record):
+    """Return (endpoint, url arguments) of a request, (None, {}) if it has no route"""
+    try:
+        return app.url_map.bind('localhost').match(record['endpoint'], method=record.get('method', 'POST'))
+    except HTTPException:
+        return None, {}
+
+
+def get_device_ids(record):
+    """Return the device_ids a request is about, in order of appearance
+
+    They are found in the url of updates and events, or in the body of
+    registrations, telemetry and events batches.
+    """
+    endpoint, arguments = match_record(record)
+    if endpoint is None:
+        return []
+    if 'device_id' in arguments:
+        return [arguments['device_id']]
+    body = record.get('body', '')
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    return list(dict.fromkeys(DEVICE_ID_RE.findall(body)))
+
+
+def is_registration(record):
+    endpoint, _ = match_record(record)
+    return endpoint is not None and endpoint.endswith('.vehicle_register')
+
+
+def get_shard(device_id, shards):
+    # Stable between runs, unlike hash()
+    return zlib.crc32((device_id or '').encode('utf8')) % shards
+
+
+def read_records(lines):
+    """Yield (line number, record) of valid json records, or (line number, error message)"""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, 'Invalid json: %s' % error
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get('endpoint', None), str):
+            yield line_number, 'Invalid record: an object with an endpoint is expected'
+            continue
+        yield line_number, record
+
+
+class Pool:
+    """One single process executor per shard, so that each shard is validated in order"""
+
+    def __init__(self, workers, chunk_size, output, shared_registry=False):
+        self.shared_registry = shared_registry
+        self.executors = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        self.chunk_size = chunk_size
+        self.output = output
+        self.chunks = [[] for _ in range(workers)]
+        # Futures in submission order, bounded to limit memory usage
+        self.pending = []
+        self.max_pending = workers * 4
+        self.counts = {}
+
+    def add(self, line_number, record):
+        shards = list(dict.fromkeys(get_shard(device_id, len(self.executors)) for device_id in get_device_ids(record)))
+        shard = shards[0] if shards else get_shard(None, len(self.executors))
+        if not self.shared_registry and len(self.executors) > 1 and is_registration(record):
+            # Every process keeps the whole registry, one of them writes the verdict
+            for other_shard in range(len(self.executors)):
+                self.append(other_shard, line_number if other_shard == shard else None, record)
+        elif self.shared_registry and len(shards) > 1:
+            # Registrations of the devices may be pending in other processes
+            self.drain()
+            self.append(shard, line_number, record)
+            self.drain()
+        else:
+            self.append(shard, line_number, record)
+
+    def append(self, shard, line_number, record):
+        self.chunks[shard].append((line_number, record))
+        if len(self.chunks[shard]) >= self.chunk_size:
+            self.submit(shard)
+
+    def submit(self, shard):
+        if not self.chunks[shard]:
+            return
+        self.pending.append(self.executors[shard].submit(validate_chunk, self.chunks[shard]))
+        self.chunks[shard] = []
+        while len(self.pending) > self.max_pending:
+            self.write(self.pending.pop(0).result())
+
+    def write(self, verdicts):
+        for line_number, verdict in verdicts:
+            self.counts[verdict['status']] = self.counts.get(verdict['status'], 0) + 1
+            self.output.write(json.dumps({'line': line_number, **verdict}) + '\n')
+
+    def drain(self):
+        """Validate all the records added so far"""
+        for shard in range(len(self.executors)):
+            self.submit(shard)
+        for future in self.pending:
+            self.write(future.result())
+        self.pending = []
+
+    def finish(self):
+        self.drain()
+        for executor in self.executors:
+            executor.shutdown()
+
+
+def validate_file(args):
+    if app.config['SEQUENCE_CHECKS'] and args.workers > 1:
+        sys.stderr.write('Event sequences are checked per process, SEQUENCE_CHECKS requires --workers 1\n')
+        return 2
+    start = time.perf_counter()
+    pool = Pool(args.workers, args.chunk_size, args.output, shared_registry=app.config['REGISTRY_BACKEND'] == 'sqlite')
+    try:
+        for line_number, record in read_records(args.file):
+            if isinstance(record, str):
+                pool.write([(line_number, {'status': None, 'errors': record})])
+            else:
+                pool.add(line_number, record)
+    finally:
+        pool.finish()
+    duration = time.perf_counter() - start
+    total = sum(pool.counts.values())
+    statuses = ', '.join('%s: %d' % (status, count) for status, count in sorted(pool.counts.items(), key=str))
+    sys.stderr.write(
+        '%d records validated in %.2fs (%.1f records/s) - %s\n'
+        % (total, duration, total / duration if duration else 0, statuses or 'no records')
+    )
+    return 0
+
+
+def replay_log(args):
+    with args.log:
+        captured_requests = list(capture.read_log(args.log))
+    report = replay.ReplayReport()
+    for _ in range(args.repeat):
+        replay.replay(app, captured_requests, report)
+    summary = report.summary()
+    if args.json:
+        args.output.write(json.dumps(summary) + '\n')
+    else:
+        for endpoint, stats in summary['endpoints'].items():
+            args.output.write(
+                '%-26s %8d requests  p50 %8.3fms  p99 %8.3fms  %10.1f/s\n'
+                % (endpoint, stats['count'], stats['p50_ms'], stats['p99_ms'], stats['per_second'] or 0)
+            )
+        args.output.write(
+            '%d replayed, %d skipped, %d drifts\n' % (summary['replayed'], summary['skipped'], summary['drifts'])
+        )
+    for index, endpoint, expected, status in report.drifts[: args.max_drifts]:
+        sys.stderr.write('Drift on request %d (%s): captured %s, replayed %s\n' % (index, endpoint, expected, status))
+    return 1 if report.drifts else 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='mds-agency-validator', description='Validate MDS Agency API requests')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    validate = subparsers.add_parser('validate-file', help='validate a newline-delimited json dump of requests')
+    validate.add_argument('file', type=argparse.FileType('r', encoding='utf8'), help='requests dump, - for stdin')
+    validate.add_argument(
+        '-o',
+        '--output',
+        type=argparse.FileType('w', encoding='utf8'),
+        default=sys.stdout,
+        help='newline-delimited json verdicts, stdout by default',
+    )
+    validate.add_argument('-w', '--workers', type=int, default=4, help='number of processes')
+    validate.add_argument('--chunk-size', type=int, default=100, help='records sent to a process at once')
+    validate.set_defaults(function=validate_file)
+
+    replay_parser = subparsers.add_parser('replay', help='replay a capture log straight into the validators')
+    replay_parser.add_argument('log', type=argparse.FileType('rb'), help='capture log, see CAPTURE_PATH setting')
+    replay_parser.add_argument('-o', '--output', type=argparse.FileType('w', encoding='utf8'), default=sys.stdout)
+    replay_parser.add_argument('-r', '--repeat', type=int, default=1, help='number of times the log is replayed')
+    replay_parser.add_argument('--json', action='store_true', help='write the report as json')
+    replay_parser.add_argument('--max-drifts', type=int, default=10, help='number of drifts to print')
+    replay_parser.set_defaults(function=replay_log)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Decoding of request payloads.
+
+Payloads are json, unless their Content-Type is msgpack. msgpack payloads
+may only hold what json can: binary and extension values, and map keys
+other than strings, are rejected with a 400. json is decoded
+with orjson when it is installed, and the standard json module otherwise.
+Both give the same payloads: bodies orjson would decode differently, or
+reject, are left to the json module.
+
+Responses are always encoded with the json module: orjson formats json
+differently (no spaces after separators, no ascii escaping...), and verdicts
+must not depend on the installed packages.
+
+orjson and msgpack are optional dependencies, install the `fast` and
+`msgpack` extras to use them. They are imported on first use.
+"""
+import json
+
+from flask import abort
+
+from mds_agency_validator.lazy import LazyModule, installed
+
+orjson = LazyModule('orjson')
+msgpack = LazyModule('msgpack')
+ORJSON_INSTALLED = installed('orjson')
+MSGPACK_INSTALLED = installed('msgpack')
+
+MSGPACK_TYPES = frozenset(['application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'])
+# Types of json values other than objects and arrays
+JSON_SCALARS = (str, int, float, bool, type(None))
+
+# orjson decodes integers which don't fit in 64 bits as floats, json keeps them as integers.
+# Digits are translated to zeros and other characters to spaces, except dots, so that numbers
+# with an integer part of 19 digits or more are found with a substring search (much faster than re)
+NUMBER_DIGITS = bytes(ord('0') if 0x30 <= i <= 0x39 else ord('.') if i == ord('.') else ord(' ') for i in range(256))
+LONG_INTEGER = b' ' + b'0' * 19
+
+
+def loads_json(data):
+    return json.loads(data.decode('utf8'))
+
+
+def has_long_integers(data):
+    digits = data.translate(NUMBER_DIGITS)
+    return LONG_INTEGER in digits or digits.startswith(LONG_INTEGER[1:])
+
+
+def loads_orjson(data):
+    if not has_long_integers(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json (NaN, lone surrogates...), let json decide
+            pass
+    return loads_json(data)
+
+
+def loads_msgpack(data):
+    # Non string keys are rejected by check_json_types, with a 400
+    payload = msgpack.unpackb(data, raw=False, strict_map_key=False)
+    check_json_types(payload)
+    return payload
+
+
+def check_json_types(payload):
+    """Abort with a 400 if a decoded msgpack payload holds values json can't carry"""
+    values = [payload]
+    while values:
+        value = values.pop()
+        if isinstance(value, dict):
+            if not all(isinstance(key, str) for key in value):
+                abort(400, dumps({'error': 'unsupported_msgpack_type'}))
+            values.extend(value.values())
+        elif isinstance(value, list):
+            values.extend(value)
+        elif not isinstance(value, JSON_SCALARS):
+            abort(400, dumps({'error': 'unsupported_msgpack_type'}))
+
+
+JSON_DECODERS = {
+    'json': loads_json,
+    'orjson': loads_orjson,
+}
+
+
+def get_json_decoder(name):
+    """Return the json decoder function, 'auto' picks the fastest installed one"""
+    if name == 'auto':
+        name = 'orjson' if ORJSON_INSTALLED else 'json'
+    if name == 'orjson' and not ORJSON_INSTALLED:
+        raise ValueError('orjson json decoder is not installed')
+    try:
+        return JSON_DECODERS[name]
+    except KeyError:
+        raise ValueError('Unknown json decoder %s' % name) from None
+
+
+def loads(data, mimetype, json_decoder='auto'):
+    """Decode the payload of a request body, according to its mimetype"""
+    if mimetype in MSGPACK_TYPES:
+        if not MSGPACK_INSTALLED:
+            abort(415, 'msgpack payloads are not supported')
+        return loads_msgpack(data)
+    return get_json_decoder(json_decoder)(data)
+
+
+def dumps(data):
+    """Encode a response payload"""
+    return json.dumps(data)
@@ -0,0 +1,198 @@
+"""Columnar validation of large telemetry batches.
+
+Instead of validating telemetry points one by one, the list of points is
+pivoted into one column per field (device_id, timestamp, gps.lat...), and
+each rule is checked with numpy on whole columns at once.
+
+Points that cannot be pivoted (not a dict, or a nested field that is not
+a dict) are left to the per point cerberus validation.
+
+numpy is an optional dependency, install the `columnar` extra to use it.
+"""
+import functools
+import itertools
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from mds_agency_validator.schemas import schema_registry
+
+SUPPORTED_RULES = {'type', 'required', 'min', 'max'}
+
+# Codes of types json.loads can return, other types can't be classified in columns
+UNKNOWN, MISSING_CODE, NONE, BOOL, INT, FLOAT, STR, LIST, DICT = range(9)
+
+HYPHEN_POSITIONS = [8, 13, 18, 23]
+
+
+class Missing:
+    """Marker for fields absent from a telemetry point"""
+
+
+MISSING = Missing()
+
+TYPE_CODES = {
+    Missing: MISSING_CODE,
+    type(None): NONE,
+    bool: BOOL,
+    int: INT,
+    float: FLOAT,
+    str: STR,
+    list: LIST,
+    dict: DICT,
+}
+
+
+class Unsupported(ValueError):
+    """The schema can't be validated in columns"""
+
+
+def get_types(values):
+    """Return an array of type codes"""
+    codes = map(TYPE_CODES.get, map(type, values), itertools.repeat(UNKNOWN))
+    return numpy.fromiter(codes, dtype=numpy.int8, count=len(values))
+
+
+class Column:
+    """Rules on one scalar field"""
+
+    def __init__(self, path, rules):
+        unsupported = set(rules) - SUPPORTED_RULES
+        if unsupported or rules.get('type') not in ('integer', 'number', 'string', 'uuid'):
+            raise Unsupported('/'.join(path))
+        self.path = path
+        self.type = rules['type']
+        self.required = rules.get('required', False)
+        self.min = rules.get('min', None)
+        self.max = rules.get('max', None)
+
+    def check(self, values):
+        """Return (invalid, unclassified) boolean arrays, or raise Unsupported"""
+        types = get_types(values)
+        unclassified = types == UNKNOWN
+        missing = types == MISSING_CODE
+        invalid = missing if self.required else numpy.zeros(len(values), dtype=bool)
+        present = ~missing
+
+        if self.type == 'integer':
+            valid_type = (types == INT) | (types == BOOL)
+        elif self.type == 'number':
+            valid_type = (types == INT) | (types == FLOAT)
+        else:
+            valid_type = types == STR
+        invalid |= present & ~valid_type
+
+        if self.type == 'uuid':
+            invalid |= valid_type & ~self.check_uuids(values, valid_type)
+        if self.min is not None or self.max is not None:
+            indexes = numpy.flatnonzero(valid_type)
+            try:
+                numbers = numpy.array([values[i] for i in indexes], dtype=float)
+            except OverflowError as error:
+                raise Unsupported('/'.join(self.path)) from error
+            if self.min is not None:
+                invalid[indexes[numbers < self.min]] = True
+            if self.max is not None:
+                invalid[indexes[numbers > self.max]] = True
+        return invalid, unclassified
+
+    @staticmethod
+    def check_uuids(values, mask):
+        """Check the beginning of strings is an uuid, as re.match does.
+        Return a boolean array, True for valid uuids, only meaningful where mask is True
+        """
+        valid = numpy.zeros(len(values), dtype=bool)
+        indexes = numpy.flatnonzero(mask)
+        # Numpy arrays have no truth value
+        if indexes.size == 0:
+            return valid
+        # Fixed width unicode array, shorter strings are padded with zeros
+        strings = numpy.array([values[i] for i in indexes], dtype='U36')
+        codes = strings.view(numpy.uint32).reshape(-1, 36)
+        lowered = codes | 0x20  # lower case ascii letters, keep digits and hyphens
+        is_hex = ((codes >= 48) & (codes <= 57)) | ((lowered >= 97) & (lowered <= 102))
+        is_hyphen = codes == ord('-')
+        expected_hyphen = numpy.zeros(36, dtype=bool)
+        expected_hyphen[HYPHEN_POSITIONS] = True
+        ok = numpy.where(expected_hyphen, is_hyphen, is_hex)
+        valid[indexes] = ok.all(axis=1)
+        return valid
+
+
+class ColumnarValidator:
+    """Validate a list of dicts against the schema of one item, column by column"""
+
+    def __init__(self, schema):
+        self.fields = frozenset(schema)
+        self.columns = []
+        # nested dict fields: name -> (required, ColumnarValidator)
+        self.nested = {}
+        for field, rules in schema.items():
+            if rules.get('type') == 'dict' and 'schema' in rules:
+                if set(rules) - {'type', 'schema', 'required'}:
+                    raise Unsupported(field)
+                self.nested[field] = (rules.get('required', False), ColumnarValidator(rules['schema']))
+            else:
+                self.columns.append(Column((field,), rules))
+
+    def analyze(self, rows):
+        """Return (invalid, unclassified) boolean arrays
+
+        invalid rows would have cerberus errors,
+        unclassified rows must be checked by cerberus.
+        """
+        count = len(rows)
+        invalid = numpy.zeros(count, dtype=bool)
+        unclassified = numpy.zeros(count, dtype=bool)
+        if not count:
+            return invalid, unclassified
+        fields = self.fields
+        invalid[[i for i, row in enumerate(rows) if not row.keys() <= fields]] = True
+
+        for column in self.columns:
+            field = column.path[0]
+            column_invalid, column_unclassified = column.check([row.get(field, MISSING) for row in rows])
+            invalid |= column_invalid
+            unclassified |= column_unclassified
+
+        for field, (required, validator) in self.nested.items():
+            values = [row.get(field, MISSING) for row in rows]
+            kinds = get_types(values)
+            is_dict = kinds == DICT
+            if required:
+                invalid |= kinds == MISSING_CODE
+            unclassified |= ~is_dict & (kinds != MISSING_CODE)
+            indexes = numpy.flatnonzero(is_dict)
+            if len(indexes):
+                nested_invalid, nested_unclassified = validator.analyze([values[i] for i in indexes])
+                invalid[indexes[nested_invalid]] = True
+                unclassified[indexes[nested_unclassified]] = True
+        return invalid, unclassified
+
+
+def available():
+    return numpy is not None
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(schema_prefix, schema_name, field='data'):
+    """Return the columnar validator of list items in field, or None if the schema is not supported"""
+    try:
+        return ColumnarValidator(schema_registry.definition(schema_prefix, schema_name, (field, 'schema', 'schema')))
+    except Unsupported:
+        return None
+
+
+def analyze_rows(validator, rows):
+    """Return (invalid, unclassified) lists of indexes, or raise Unsupported"""
+    pivotable = [i for i, row in enumerate(rows) if type(row) is dict]  # pylint: disable=unidiomatic-typecheck
+    unclassified = numpy.ones(len(rows), dtype=bool)
+    invalid = numpy.zeros(len(rows), dtype=bool)
+    if pivotable:
+        rows_invalid, rows_unclassified = validator.analyze([rows[i] for i in pivotable])
+        pivotable = numpy.array(pivotable)
+        unclassified[pivotable] = rows_unclassified
+        invalid[pivotable] = rows_invalid & ~rows_unclassified
+    return numpy.flatnonzero(invalid).tolist(), numpy.flatnonzero(unclassified).tolist()
@@ -0,0 +1,112 @@
+import sys
+import threading
+import uuid
+
+# Registration payload fields, for both Agency API versions
+VEHICLE_TYPE_FIELDS = ('vehicle_type', 'type')
+PROPULSION_FIELDS = ('propulsion_types', 'propulsion')
+
+
+class DeviceRecord:
+    """Registration attributes of a device, without a per instance dict"""
+
+    __slots__ = ('vehicle_id', 'vehicle_type', 'propulsion', 'payload')
+
+    def __init__(self, vehicle_id, vehicle_type, propulsion, payload=None):
+        self.vehicle_id = vehicle_id
+        self.vehicle_type = vehicle_type
+        self.propulsion = propulsion
+        self.payload = payload
+
+    def __repr__(self):
+        return '<DeviceRecord %s>' % self.vehicle_id
+
+
+def encode_key(key):
+    """Store canonical uuids as 16 bytes instead of 36 characters strings"""
+    if isinstance(key, str) and len(key) == 36:
+        try:
+            value = uuid.UUID(key)
+        except ValueError:
+            return key
+        # Other spellings (upper case...) must stay distinct keys
+        if str(value) == key:
+            return value.bytes
+    return key
+
+
+# Shared tuples of propulsion types
+INTERNED_TUPLES = {}
+
+
+def intern_value(value):
+    """Share identical strings and lists of strings between records"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        value = tuple(sys.intern(item) for item in value)
+        return INTERNED_TUPLES.setdefault(value, value)
+    return value
+
+
+class CompactCache:
+    """A memory efficient store of registered devices
+
+    Hot path requests only check that devices exist. Keys are stored as 16
+    bytes uuids, and devices as DeviceRecord with interned vehicle type and
+    propulsion. The full registration payload is only kept with keep_payload.
+
+    get() returns the payload if it was kept, the DeviceRecord otherwise.
+    """
+
+    def __init__(self, keep_payload=False):
+        self.keep_payload = keep_payload
+        self.lock = threading.Lock()
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_field(payload, fields):
+        for field in fields:
+            if field in payload:
+                return intern_value(payload[field])
+        return None
+
+    def set(self, key, payload):
+        record = DeviceRecord(
+            payload.get('vehicle_id', None),
+            self.get_field(payload, VEHICLE_TYPE_FIELDS),
+            self.get_field(payload, PROPULSION_FIELDS),
+            payload if self.keep_payload else None,
+        )
+        key = encode_key(key)
+        with self.lock:
+            self.data[key] = record
+
+    def get(self, key):
+        record = self.data.get(encode_key(key), None)
+        # Counters are only indicative, don't lock the hot path for them
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record.payload if record.payload is not None else record
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            payload = self.get(key)
+            if payload is not None:
+                found[key] = payload
+        return found
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': 0}
@@ -0,0 +1,254 @@
+"""Compile yaml schemas into plain python validation functions.
+
+Cerberus is interpretive: every field of every document goes through rule
+dispatch and error objects creation. For the small subset of cerberus rules
+used by our schemas, we can instead generate one straight-line python function
+per schema, which only does work when an error is found.
+
+CompiledValidator exposes the part of the cerberus.Validator interface used by
+BaseValidator (validate() and errors), with the same error tree, so it can be
+used as a drop-in replacement.
+"""
+import re
+from collections.abc import Mapping, Sequence
+
+from cerberus import DocumentError
+
+UUID_RE = re.compile(r'[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}', re.I)
+
+SUPPORTED_RULES = {'type', 'required', 'nullable', 'allowed', 'min', 'max', 'schema'}
+
+# cerberus type name: python check expression, with {0} as the checked value
+TYPE_CHECKS = {
+    'boolean': 'isinstance({0}, bool)',
+    'dict': 'isinstance({0}, Mapping)',
+    'float': 'isinstance({0}, (float, int))',
+    'integer': 'isinstance({0}, int)',
+    'list': '(isinstance({0}, Sequence) and not isinstance({0}, str))',
+    'number': '(isinstance({0}, (int, float)) and not isinstance({0}, bool))',
+    'string': 'isinstance({0}, str)',
+    'uuid': '(isinstance({0}, str) and UUID_RE.match({0}) is not None)',
+}
+
+
+class UnsupportedSchema(ValueError):
+    """The schema uses a cerberus feature the compiler does not handle"""
+
+
+def is_allowed(value, allowed):
+    try:
+        return value in allowed
+    except TypeError:
+        # unhashable values, such as lists or dicts, are never allowed
+        return False
+
+
+def unallowed_values(values, allowed):
+    return tuple(value for value in values if not is_allowed(value, allowed))
+
+
+class SchemaCompiler:
+    """Generate the source code of a validation function from a schema definition
+
+    The generated function has the signature `function(document, error)`, and
+    calls `error(path, message)` for every anomaly found, path being a tuple of
+    field names and list indexes, as cerberus document_path.
+    """
+
+    def __init__(self, definition, name='validate'):
+        self.definition = definition
+        self.name = name
+        self.lines = []
+        self.constants = {}
+        self.counter = 0
+
+    def compile(self):
+        """Return the generated function, with its source code in `source` attribute"""
+        source = self.generate()
+        namespace = {
+            'DocumentError': DocumentError,
+            'Mapping': Mapping,
+            'Sequence': Sequence,
+            'UUID_RE': UUID_RE,
+            'is_allowed': is_allowed,
+            'unallowed_values': unallowed_values,
+        }
+        namespace.update(self.constants)
+        exec(compile(source, '<schema %s>' % self.name, 'exec'), namespace)  # pylint: disable=exec-used
+        function = namespace[self.name]
+        function.source = source
+        return function
+
+    def generate(self):
+        self.lines = ['def %s(document, error):' % self.name]
+        self.emit(1, 'if not isinstance(document, Mapping):')
+        self.emit(2, "raise DocumentError(\"'{0}' is not a document, must be a dict\".format(document))")
+        self.generate_mapping('document', self.definition, [], 1)
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def new_name(self, prefix):
+        self.counter += 1
+        return '%s_%s' % (prefix, self.counter)
+
+    def constant(self, prefix, value):
+        name = self.new_name(prefix.upper())
+        self.constants[name] = value
+        return name
+
+    @staticmethod
+    def path(parts):
+        if len(parts) == 1:
+            return '(%s,)' % parts[0]
+        return '(%s)' % ', '.join(parts)
+
+    def generate_mapping(self, document, schema, path, indent):
+        """Generate checks of a dict value against a mapping schema"""
+        if not isinstance(schema, Mapping):
+            raise UnsupportedSchema('schema should be a mapping')
+        known = self.constant('fields', frozenset(schema))
+        key = self.new_name('key')
+        self.emit(indent, 'if not %s.keys() <= %s:' % (document, known))
+        self.emit(indent + 1, 'for %s in %s:' % (key, document))
+        self.emit(indent + 2, 'if %s not in %s:' % (key, known))
+        self.emit(indent + 3, "error(%s, 'unknown field')" % self.path(path + [key]))
+
+        for field, rules in schema.items():
+            if not isinstance(field, str):
+                raise UnsupportedSchema('field names should be strings')
+            field_path = path + [repr(field)]
+            value = self.new_name('value')
+            self.emit(indent, 'if %r in %s:' % (field, document))
+            self.emit(indent + 1, '%s = %s[%r]' % (value, document, field))
+            self.generate_value(value, rules, field_path, indent + 1)
+            if rules.get('required', False):
+                self.emit(indent, 'else:')
+                self.emit(indent + 1, "error(%s, 'required field')" % self.path(field_path))
+
+    def generate_value(self, value, rules, path, indent):
+        """Generate checks of a value against its field rules"""
+        unsupported = set(rules) - SUPPORTED_RULES
+        if unsupported:
+            raise UnsupportedSchema('unsupported rules: %s' % ', '.join(sorted(unsupported)))
+        data_type = rules.get('type', None)
+        if data_type is not None and data_type not in TYPE_CHECKS:
+            raise UnsupportedSchema('unsupported type: %s' % data_type)
+        if data_type is None and 'schema' in rules:
+            raise UnsupportedSchema('schema rule requires a type')
+
+        if rules.get('nullable', False):
+            self.emit(indent, 'if %s is not None:' % value)
+            self.generate_block(indent + 1, self.generate_type, value, rules, path)
+            if self.lines[-1].endswith(':'):
+                self.emit(indent + 1, 'pass')
+        else:
+            self.emit(indent, 'if %s is None:' % value)
+            self.emit(indent + 1, "error(%s, 'null value not allowed')" % self.path(path))
+            self.generate_block(indent, self.generate_type, value, rules, path, branch='else:')
+
+    def generate_block(self, indent, generator, *args, branch=None):
+        """Call generator in an optional branch, which is dropped if nothing was generated"""
+        if branch:
+            self.emit(indent, branch)
+            indent += 1
+        mark = len(self.lines)
+        generator(*args, indent)
+        if branch and len(self.lines) == mark:
+            self.lines.pop()
+
+    def generate_type(self, value, rules, path, indent):
+        data_type = rules.get('type', None)
+        if data_type is None:
+            self.generate_rules(value, rules, path, indent)
+        else:
+            self.emit(indent, 'if not %s:' % TYPE_CHECKS[data_type].format(value))
+            self.emit(indent + 1, "error(%s, 'must be of %s type')" % (self.path(path), data_type))
+            self.generate_block(indent, self.generate_rules, value, rules, path, branch='else:')
+
+    def generate_rules(self, value, rules, path, indent):
+        """Remaining rules are checked in definition order, as cerberus does"""
+        data_type = rules.get('type', None)
+        error_path = self.path(path)
+        for rule, constraint in rules.items():
+            if rule == 'min':
+                self.generate_comparison(value, '<', constraint, 'min value is %s' % constraint, error_path, indent)
+            elif rule == 'max':
+                self.generate_comparison(value, '>', constraint, 'max value is %s' % constraint, error_path, indent)
+            elif rule == 'allowed':
+                allowed = self.constant('allowed', frozenset(constraint))
+                if data_type == 'list':
+                    unallowed = self.new_name('unallowed')
+                    self.emit(indent, '%s = unallowed_values(%s, %s)' % (unallowed, value, allowed))
+                    self.emit(indent, 'if %s:' % unallowed)
+                    self.emit(indent + 1, "error(%s, 'unallowed values {0}'.format(%s))" % (error_path, unallowed))
+                elif data_type in ('string', 'integer', 'number', 'uuid', 'boolean', 'float'):
+                    self.emit(indent, 'if not is_allowed(%s, %s):' % (value, allowed))
+                    self.emit(indent + 1, "error(%s, 'unallowed value {0}'.format(%s))" % (error_path, value))
+                else:
+                    raise UnsupportedSchema('allowed rule is not supported on %s type' % data_type)
+            elif rule == 'schema':
+                if data_type == 'dict':
+                    self.generate_mapping(value, constraint, path, indent)
+                elif data_type == 'list':
+                    index = self.new_name('index')
+                    item = self.new_name('item')
+                    self.emit(indent, 'for %s, %s in enumerate(%s):' % (index, item, value))
+                    self.generate_value(item, constraint, path + [index], indent + 1)
+                else:
+                    raise UnsupportedSchema('schema rule is not supported on %s type' % data_type)
+
+    def generate_comparison(self, value, operator, constraint, message, error_path, indent):
+        self.emit(indent, 'try:')
+        self.emit(indent + 1, 'if %s %s %r:' % (value, operator, constraint))
+        self.emit(indent + 2, 'error(%s, %r)' % (error_path, message))
+        self.emit(indent, 'except TypeError:')
+        self.emit(indent + 1, 'pass')
+
+
+def compile_schema(definition, name='validate'):
+    return SchemaCompiler(definition, name).compile()
+
+
+def build_error_tree(errors):
+    """Build a cerberus like error tree from a list of (path, message)
+
+    Like cerberus BasicErrorHandler, errors are sorted on their path,
+    and each field holds a list of messages, followed by a subtree
+    for nested fields errors.
+    """
+    tree = {}
+    for path, message in sorted(errors, key=lambda error: error[0]):
+        node = tree
+        for field in path[:-1]:
+            field_errors = node.setdefault(field, [])
+            if not field_errors or not isinstance(field_errors[-1], dict):
+                field_errors.append({})
+            node = field_errors[-1]
+        field_errors = node.setdefault(path[-1], [])
+        if field_errors and isinstance(field_errors[-1], dict):
+            field_errors.insert(-1, message)
+        else:
+            field_errors.append(message)
+    return tree
+
+
+class CompiledValidator:
+    """Run a compiled schema function with a cerberus.Validator like interface"""
+
+    def __init__(self, function):
+        self.function = function
+        self._errors = []
+
+    def validate(self, document):
+        self._errors = []
+        self.function(document, self.add_error)
+        return not self._errors
+
+    def add_error(self, path, message):
+        self._errors.append((path, message))
+
+    @property
+    def errors(self):
+        return build_error_tree(self._errors)
@@ -0,0 +1,98 @@
+"""Decompression of request bodies, according to their Content-Encoding.
+
+Bodies are decompressed chunk by chunk: no chunk of decompressed data is
+larger than chunk_size, and the decompressed size is checked while it grows,
+so that a small compressed body can't expand into gigabytes before it is
+rejected with a 413 error. Unknown encodings are rejected with a 415 error.
+
+zstandard is an optional dependency, install the `zstd` extra to accept zstd bodies.
+Unlike gzip and deflate, truncated zstd bodies are not detected here, they are
+decompressed as far as they go and fail as invalid json.
+"""
+import zlib
+
+from flask import abort
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Content-Encoding: zlib wbits
+ZLIB_ENCODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def available_encodings():
+    encodings = ['identity'] + sorted(ZLIB_ENCODINGS)
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+
+def decompress(chunks, encoding, max_size, chunk_size):
+    """Return an iterator of the decompressed chunks of the body
+
+    Aborts with a 415 error if the encoding is not supported, and while
+    iterating, with a 413 error once max_size bytes were decompressed, or
+    a 400 error if the body is not valid for its encoding.
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        return iter(chunks)
+    if encoding in ZLIB_ENCODINGS:
+        return limit_size(iter_zlib(chunks, ZLIB_ENCODINGS[encoding], chunk_size), max_size)
+    if encoding == 'zstd' and zstandard is not None:
+        return limit_size(iter_zstd(chunks, chunk_size), max_size)
+    abort(415, 'Unsupported Content-Encoding %s, use one of %s' % (encoding, ', '.join(available_encodings())))
+    return None
+
+
+def limit_size(chunks, max_size):
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            abort(413, 'Decompressed body is larger than %d bytes' % max_size)
+        yield chunk
+
+
+def iter_zlib(chunks, wbits, chunk_size):
+    decompressor = zlib.decompressobj(wbits)
+    try:
+        for chunk in chunks:
+            # Input that would decompress into more than chunk_size bytes is kept for the next round
+            while chunk and not decompressor.eof:
+                data = decompressor.decompress(chunk, chunk_size)
+                chunk = decompressor.unconsumed_tail
+                if data:
+                    yield data
+        data = decompressor.flush()
+    except zlib.error as error:
+        abort(400, 'Invalid compressed body: %s' % error)
+    if data:
+        yield data
+    if not decompressor.eof:
+        abort(400, 'Invalid compressed body: truncated')
+
+
+class ChunksReader:
+    """File like object reading from an iterable of bytes chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def read(self, size=-1):  # pylint: disable=unused-argument
+        # Chunks are returned as they come, readers accept shorter reads
+        return next(self.chunks, b'')
+
+
+def iter_zstd(chunks, chunk_size):
+    decompressor = zstandard.ZstdDecompressor()
+    try:
+        yield from decompressor.read_to_iter(ChunksReader(chunks), write_size=chunk_size)
+    except zstandard.ZstdError as error:
+        abort(400, 'Invalid compressed body: %s' % error)
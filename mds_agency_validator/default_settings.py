@@ -0,0 +1,92 @@
+"""Default settings
+
+Override them with a python file, whose path is given in the
+MDS_AGENCY_VALIDATOR_SETTINGS environment variable.
+"""
+
+# Validation engine, either:
+# - 'cerberus': interpret yaml schemas with cerberus
+# - 'compiled': run yaml schemas compiled into python functions (faster)
+VALIDATION_ENGINE = 'cerberus'
+
+# Load and compile all schemas on start, instead of on first request. Disable it for faster
+# cold starts: validators and their dependencies are then only imported by the first request
+SCHEMA_WARM_UP = True
+
+# Validate telemetry batches column by column with numpy (requires the `columnar` extra),
+# when they hold at least COLUMNAR_MIN_BATCH_SIZE telemetry points
+COLUMNAR_TELEMETRY = False
+COLUMNAR_MIN_BATCH_SIZE = 100
+
+# Parse telemetry payloads while they are read from the request, by chunks of
+# STREAMING_CHUNK_SIZE bytes, and validate each telemetry point as soon as it is parsed
+STREAMING_TELEMETRY = False
+STREAMING_CHUNK_SIZE = 64 * 1024
+
+# Decoder of json payloads: 'orjson', 'json' (standard library), or 'auto' for orjson
+# when it is installed. msgpack payloads (application/msgpack Content-Type) need msgpack.
+JSON_DECODER = 'auto'
+
+# Bodies compressed with gzip, deflate or zstd (Content-Encoding header) are rejected
+# once they decompress into more than DECOMPRESSED_MAX_SIZE bytes
+DECOMPRESSED_MAX_SIZE = 32 * 1024 * 1024
+
+# Registered devices storage, either:
+# - 'memory': in process memory, not shared between worker processes
+# - 'sqlite': in the REGISTRY_SQLITE_PATH sqlite database, shared by all the processes
+#   of the host. Found devices are kept in memory for REGISTRY_SQLITE_READ_CACHE_TTL seconds.
+# - 'compact': in process memory, with binary uuids and only the main registration
+#   attributes, unless REGISTRY_COMPACT_KEEP_PAYLOAD is set
+REGISTRY_BACKEND = 'memory'
+REGISTRY_SQLITE_PATH = 'mds_agency_validator.sqlite3'
+REGISTRY_SQLITE_READ_CACHE_TTL = 1.0
+REGISTRY_COMPACT_KEEP_PAYLOAD = False
+
+# Memory registered devices cache bounds: maximum number of devices (least recently
+# used ones are evicted first), and time to live in seconds. None for no limit.
+REGISTRY_MAX_ENTRIES = None
+REGISTRY_TTL = None
+
+# Number of decoded JWT kept in memory, 0 to decode tokens on every request
+AUTH_CACHE_SIZE = 1024
+
+# Threads validating requests in the ASGI application, None for the executor default
+ASGI_EXECUTOR_WORKERS = None
+
+# Record incoming requests and verdicts in this binary log, see capture module
+CAPTURE_PATH = None
+
+# Measure validation stages, and return them in a Server-Timing header
+STAGE_TIMING = False
+# Log requests slower than this number of seconds, when STAGE_TIMING is enabled
+SLOW_REQUEST_THRESHOLD = None
+
+# Count requests, and serve them in Prometheus text format on /metrics
+METRICS = True
+
+# Number of verdicts kept for retried identical requests, 0 to disable, see verdicts module
+VERDICT_CACHE_SIZE = 0
+
+# Check that v1.0.0 events follow the previous event of the device (state machine and time order)
+SEQUENCE_CHECKS = False
+# Slots of the table of last events, 17 bytes each. Devices sharing a slot evict each other.
+SEQUENCE_SLOTS = 1 << 20
+
+# Telemetry failures in responses: 'payload' returns the failed telemetry points,
+# 'compact' their index and invalid fields. Overridden by the `failures` query parameter.
+TELEMETRY_FAILURES = 'payload'
+
+# Stop validation at the first missing or bad field, and only report that field.
+# Telemetry points are each validated up to their first anomaly.
+# Overridden by the `fail_fast` query parameter (true or false).
+FAIL_FAST = False
+
+# Maximum size of request bodies in bytes, by route, None for no limit. Larger bodies are
+# rejected with a 413 error from their Content-Length, or while chunked uploads are read.
+MAX_BODY_SIZES = {
+    'vehicle_register': 64 * 1024,
+    'vehicle_update': 64 * 1024,
+    'vehicle_event': 64 * 1024,
+    'vehicle_events': 16 * 1024 * 1024,
+    'vehicle_telemetry': 64 * 1024 * 1024,
+}
@@ -0,0 +1,29 @@
+"""Modules imported on first use, to keep application start fast.
+
+Version blueprints only need their validators (cerberus, yaml, numpy...)
+when they serve their first request, url rules are registered without them.
+"""
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Import module name on first attribute access"""
+
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute):
+        # Only called for attributes of the module, import locks make the import thread safe
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+    def __repr__(self):
+        return '<LazyModule %s>' % self.name
+
+
+def installed(name):
+    """Return whether module name can be imported, without importing it"""
+    return importlib.util.find_spec(name) is not None
@@ -0,0 +1,47 @@
+"""Size limits of request bodies, by route.
+
+Bodies larger than the MAX_BODY_SIZES limit of their route are rejected
+before they are read when they give a Content-Length, or as soon as the
+limit is crossed while chunked uploads are read.
+"""
+from werkzeug.exceptions import HTTPException
+
+
+def get_limit(endpoint, config):
+    """Return the body size limit of an endpoint, None for no limit"""
+    if endpoint is None:
+        return None
+    return config['MAX_BODY_SIZES'].get(endpoint.rsplit('.', 1)[-1], None)
+
+
+def match_limit(app, path, method='POST'):
+    """Return the body size limit of the route of path, None for no limit"""
+    try:
+        endpoint, _ = app.url_map.bind('localhost').match(path, method=method)
+    except HTTPException:
+        return None
+    return get_limit(endpoint, app.config)
+
+
+class LimitedBody:
+    """Request stream calling on_exceeded(size) once more than limit bytes were read
+
+    At most limit + 1 bytes are read from the underlying stream.
+    """
+
+    def __init__(self, stream, limit, on_exceeded):
+        self.stream = stream
+        self.limit = limit
+        self.on_exceeded = on_exceeded
+        self.position = 0
+
+    def read(self, size=-1):
+        remaining = self.limit + 1 - self.position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self.stream.read(size) if size > 0 else b''
+        before = self.position
+        self.position += len(data)
+        if before <= self.limit < self.position:
+            self.on_exceeded(self.position)
+        return data
@@ -0,0 +1,266 @@
+"""Request metrics, exposed in Prometheus text format on /metrics.
+
+To keep the request path cheap, each thread counts in its own accumulator,
+without locks. Accumulators of all threads are merged when metrics are
+scraped. Accumulators of finished threads are folded into a shared total,
+so that counters never go backwards, while servers starting a thread per
+request don't pile up accumulators.
+
+Field failures are labelled with the path of the field in the schema, list
+indexes being replaced by *. Fields which are not in the schema, whose names
+are chosen by clients, share the UNKNOWN_FIELD label.
+"""
+import bisect
+import functools
+import threading
+import time
+
+from flask import g, request
+
+from mds_agency_validator.cache import cache
+
+# Upper bounds of latency histograms buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of request payload size classes, in bytes
+PAYLOAD_SIZES = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+# Field label of failures on fields which are not in the schema
+UNKNOWN_FIELD = '_unknown'
+
+
+class Accumulator:
+    """Metrics counted by one thread"""
+
+    def __init__(self):
+        # (version, route, status): count
+        self.requests = {}
+        # (version, route, payload size class): [bucket counts..., +Inf count, sum of durations]
+        self.latencies = {}
+        # (version, result): count of telemetry points, result is valid or failure
+        self.telemetry_points = {}
+        # (version, route, kind, field): count, kind is bad_param or missing_param
+        self.field_failures = {}
+        # (version, route, body size class): count of bodies rejected as too large
+        self.oversized_bodies = {}
+
+    def add(self, accumulator):
+        """Add the metrics of another accumulator"""
+        # Copy before iterating, the thread may be adding keys
+        for name in ('requests', 'telemetry_points', 'field_failures', 'oversized_bodies'):
+            total = getattr(self, name)
+            for key, count in list(getattr(accumulator, name).items()):
+                total[key] = total.get(key, 0) + count
+        for key, histogram in list(accumulator.latencies.items()):
+            total = self.latencies.setdefault(key, [0] * len(histogram))
+            for i, value in enumerate(list(histogram)):
+                total[i] += value
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # (thread, accumulator) of running threads
+        self.accumulators = []
+        # Metrics of finished threads
+        self.retired = Accumulator()
+
+    def accumulator(self):
+        try:
+            return self.local.accumulator
+        except AttributeError:
+            accumulator = Accumulator()
+            with self.lock:
+                self.retire()
+                self.accumulators.append((threading.current_thread(), accumulator))
+            self.local.accumulator = accumulator
+            return accumulator
+
+    def retire(self):
+        """Fold accumulators of finished threads into self.retired, with the lock held"""
+        running = []
+        for thread, accumulator in self.accumulators:
+            if thread.is_alive():
+                running.append((thread, accumulator))
+            else:
+                self.retired.add(accumulator)
+        self.accumulators = running
+
+    def observe_request(self, version, route, status, payload_size, duration, validator=None):
+        accumulator = self.accumulator()
+        key = (version, route, status)
+        accumulator.requests[key] = accumulator.requests.get(key, 0) + 1
+
+        key = (version, route, get_size_class(payload_size))
+        histogram = accumulator.latencies.get(key, None)
+        if histogram is None:
+            histogram = accumulator.latencies[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        histogram[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+        histogram[-1] += duration
+
+        if validator is None:
+            return
+        if validator.oversized_body is not None:
+            key = (version, route, get_size_class(validator.oversized_body))
+            accumulator.oversized_bodies[key] = accumulator.oversized_bodies.get(key, 0) + 1
+        for kind in ('bad_param', 'missing_param'):
+            for field in getattr(validator, kind):
+                key = (version, route, kind, field_label(validator, field))
+                accumulator.field_failures[key] = accumulator.field_failures.get(key, 0) + 1
+        failures = getattr(validator, 'failures', None)
+        # Event batches have failures too
+        if failures is not None and route == 'vehicle_telemetry':
+            for result, count in (('valid', validator.result), ('failure', len(failures))):
+                key = (version, result)
+                accumulator.telemetry_points[key] = accumulator.telemetry_points.get(key, 0) + count
+
+    def merge(self):
+        """Return an Accumulator with the metrics of all threads"""
+        merged = Accumulator()
+        with self.lock:
+            self.retire()
+            merged.add(self.retired)
+            accumulators = [accumulator for _, accumulator in self.accumulators]
+        for accumulator in accumulators:
+            merged.add(accumulator)
+        return merged
+
+    def clear(self):
+        with self.lock:
+            self.accumulators = []
+            self.retired = Accumulator()
+            self.local = threading.local()
+
+    def render(self):
+        """Return metrics in Prometheus text format"""
+        merged = self.merge()
+        lines = [
+            '# HELP mds_requests_total Requests by version, route and response status.',
+            '# TYPE mds_requests_total counter',
+        ]
+        for (version, route, status), count in sorted(merged.requests.items()):
+            lines.append('mds_requests_total{%s} %d' % (labels(version=version, route=route, status=status), count))
+
+        lines += [
+            '# HELP mds_request_duration_seconds Request duration by version, route and payload size class.',
+            '# TYPE mds_request_duration_seconds histogram',
+        ]
+        for (version, route, size_class), histogram in sorted(merged.latencies.items(), key=str):
+            common = {'version': version, 'route': route, 'payload_bytes': size_class}
+            cumulated = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram):
+                cumulated += count
+                lines.append('mds_request_duration_seconds_bucket{%s} %d' % (labels(**common, le=bound), cumulated))
+            lines.append('mds_request_duration_seconds_sum{%s} %r' % (labels(**common), histogram[-1]))
+            lines.append('mds_request_duration_seconds_count{%s} %d' % (labels(**common), cumulated))
+
+        lines += [
+            '# HELP mds_telemetry_points_total Telemetry points validated, by version and result.',
+            '# TYPE mds_telemetry_points_total counter',
+        ]
+        for (version, result), count in sorted(merged.telemetry_points.items()):
+            lines.append('mds_telemetry_points_total{%s} %d' % (labels(version=version, result=result), count))
+
+        lines += [
+            '# HELP mds_field_failures_total Invalid or missing fields, by version and route.',
+            '# TYPE mds_field_failures_total counter',
+        ]
+        for (version, route, kind, field), count in sorted(merged.field_failures.items()):
+            lines.append(
+                'mds_field_failures_total{%s} %d'
+                % (labels(version=version, route=route, kind=kind, field=field), count)
+            )
+
+        lines += [
+            '# HELP mds_oversized_bodies_total Bodies rejected as too large, by version, route and body size class.',
+            '# TYPE mds_oversized_bodies_total counter',
+        ]
+        for (version, route, size_class), count in sorted(merged.oversized_bodies.items(), key=str):
+            lines.append(
+                'mds_oversized_bodies_total{%s} %d'
+                % (labels(version=version, route=route, payload_bytes=size_class), count)
+            )
+
+        lines += [
+            '# HELP mds_registry_devices Registered devices.',
+            '# TYPE mds_registry_devices gauge',
+            'mds_registry_devices %d' % len(cache),
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def schema_fields(definition, prefix=''):
+    """Yield the paths of the fields of a schema definition, list items being *"""
+    for field, rules in definition.items():
+        path = prefix + str(field)
+        yield path
+        yield from nested_fields(rules, path)
+
+
+def nested_fields(rules, path):
+    schema = rules.get('schema', None) if isinstance(rules, dict) else None
+    if not isinstance(schema, dict):
+        return
+    if rules.get('type', None) == 'list':
+        yield path + '.*'
+        yield from nested_fields(schema, path + '.*')
+    else:
+        yield from schema_fields(schema, path + '.')
+
+
+@functools.lru_cache(maxsize=None)
+def known_fields(schema_prefix, schema_name):
+    # Validators loaded the schema already
+    from mds_agency_validator.schemas import schema_registry
+
+    # The device_id of routes is checked against the payload too
+    return frozenset(schema_fields(schema_registry.definition(schema_prefix, schema_name))) | {'device_id'}
+
+
+def field_label(validator, field):
+    """Path of the field in the validator schema, UNKNOWN_FIELD if it is not there"""
+    if validator.schema_name is None:
+        return UNKNOWN_FIELD
+    path = '.'.join('*' if part.isdigit() else part for part in str(field).split('.'))
+    return path if path in known_fields(validator.schema_prefix, validator.schema_name) else UNKNOWN_FIELD
+
+
+def get_size_class(size):
+    """Upper bound of the payload size class of size"""
+    return PAYLOAD_SIZES[bisect.bisect_left(PAYLOAD_SIZES, size)] if size <= PAYLOAD_SIZES[-1] else '+Inf'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return ','.join('%s="%s"' % (name, escape(value)) for name, value in values.items())
+
+
+metrics = Metrics()
+
+
+def install(app):
+    """Count requests of the validation routes, and serve metrics on /metrics"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None and request.blueprint is not None:
+            metrics.observe_request(
+                request.blueprint,
+                request.endpoint.rsplit('.', 1)[-1],
+                response.status_code,
+                request.content_length or 0,
+                time.perf_counter() - start,
+                g.get('validator', None),
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics_view():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
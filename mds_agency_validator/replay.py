@@ -0,0 +1,109 @@
+"""Replay of captured requests, straight into the validator classes.
+
+Requests of a capture log (see capture module) are validated without the WSGI
+and routing layers: only the validator of the endpoint runs, in a request
+context. The latency of each validation is measured, and verdicts (status and
+response body) are compared with the captured ones.
+
+As with a restarted server, the registry, event sequences and cached verdicts
+are cleared before replaying, and successful registrations are stored again.
+"""
+import time
+
+from flask import current_app
+from werkzeug.exceptions import HTTPException
+
+from mds_agency_validator.cache import cache
+from mds_agency_validator.sequence import event_sequences
+from mds_agency_validator.v0_4_0 import validators as v0_4_0
+from mds_agency_validator.v1_0_0 import validators as v1_0_0
+from mds_agency_validator.verdicts import verdict_cache
+
+# endpoint: (validator class, whether valid payloads are stored in the registry)
+VALIDATORS = {
+    'v0_4_0.vehicle_register': (v0_4_0.VehicleRegister_v0_4_0, True),
+    'v0_4_0.vehicle_update': (v0_4_0.VehicleUpdate_v0_4_0, False),
+    'v0_4_0.vehicle_event': (v0_4_0.VehicleEvent_v0_4_0, False),
+    'v0_4_0.vehicle_events': (v0_4_0.VehicleEvents_v0_4_0, False),
+    'v0_4_0.vehicle_telemetry': (v0_4_0.VehicleTelemetry_v0_4_0, False),
+    'v1_0_0.vehicle_register': (v1_0_0.VehicleRegister, True),
+    'v1_0_0.vehicle_update': (v1_0_0.VehicleUpdate, False),
+    'v1_0_0.vehicle_event': (v1_0_0.VehicleEvent, False),
+    'v1_0_0.vehicle_events': (v1_0_0.VehicleEvents, False),
+    'v1_0_0.vehicle_telemetry': (v1_0_0.VehicleTelemetry, False),
+}
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_validator(validator_class, registers, view_args):
+    """Validate the request of the current context, return the response"""
+    try:
+        validator = validator_class(**view_args)
+        response = current_app.make_response(validator.validate())
+    except HTTPException as error:
+        return error.get_response()
+    if registers:
+        cache.set(validator.payload['device_id'], validator.payload)
+    return response
+
+
+class ReplayReport:
+    """Latencies per endpoint, and verdicts which differ from the captured ones"""
+
+    def __init__(self):
+        # endpoint: list of latencies in seconds
+        self.latencies = {}
+        # (index in log, endpoint, captured status, replayed status)
+        self.drifts = []
+        self.skipped = 0
+        self.duration = 0.0
+
+    def add(self, endpoint, latency):
+        self.latencies.setdefault(endpoint, []).append(latency)
+
+    def summary(self):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            endpoints[endpoint] = {
+                'count': len(latencies),
+                'p50_ms': percentile(latencies, 0.5) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'per_second': len(latencies) / sum(latencies) if sum(latencies) else None,
+            }
+        return {
+            'endpoints': endpoints,
+            'replayed': sum(len(latencies) for latencies in self.latencies.values()),
+            'skipped': self.skipped,
+            'drifts': len(self.drifts),
+            'duration': self.duration,
+        }
+
+
+def replay(app, captured_requests, report=None):
+    """Validate captured requests with the validators of app, return a ReplayReport"""
+    report = report or ReplayReport()
+    cache.clear()
+    event_sequences.clear()
+    verdict_cache.clear()
+    start = time.perf_counter()
+    for index, captured in enumerate(captured_requests):
+        if captured.endpoint not in VALIDATORS:
+            report.skipped += 1
+            continue
+        validator_class, registers = VALIDATORS[captured.endpoint]
+        context = app.test_request_context(captured.path, method='POST', headers=captured.headers, data=captured.body)
+        with context:
+            before = time.perf_counter()
+            response = run_validator(validator_class, registers, captured.view_args)
+            report.add(captured.endpoint, time.perf_counter() - before)
+            if response.status_code != captured.status or response.get_data() != captured.response:
+                report.drifts.append((index, captured.endpoint, captured.status, response.status_code))
+    report.duration = time.perf_counter() - start
+    return report
@@ -0,0 +1,111 @@
+import os
+import threading
+
+import yaml
+
+from mds_agency_validator.compiler import compile_schema
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+class SchemaRegistry:
+    """Process-wide registry of compiled cerberus schemas.
+
+    Each (schema_prefix, schema_name) pair is read from disk, parsed and
+    validated by cerberus only once. Validators then get the compiled
+    DefinitionSchema, which cerberus reuses as is without validating it again.
+
+    Schemas are loaded lazily on first use, or all at once with warm_up().
+    The registry also holds the schemas compiled into python functions, used
+    by the 'compiled' validation engine.
+    """
+
+    def __init__(self, base_path=BASE_PATH):
+        self.base_path = base_path
+        self.definitions = {}
+        self.schemas = {}
+        self.functions = {}
+        self.lock = threading.RLock()
+
+    def get(self, schema_prefix, schema_name, path=()):
+        """Return the compiled schema, loading it on first use
+
+        path selects a sub schema in the definition, for instance
+        ('data', 'schema', 'schema') is the schema of one telemetry point.
+        """
+        key = (schema_prefix, schema_name, path) if path else (schema_prefix, schema_name)
+        try:
+            return self.schemas[key]
+        except KeyError:
+            pass
+        with self.lock:
+            # Another thread may have loaded it while we were waiting for the lock
+            if key not in self.schemas:
+                self.schemas[key] = self.compile(self.definition(schema_prefix, schema_name, path))
+            return self.schemas[key]
+
+    def get_function(self, schema_prefix, schema_name, path=()):
+        """Return the schema compiled into a python function, compiling it on first use"""
+        key = (schema_prefix, schema_name, path) if path else (schema_prefix, schema_name)
+        try:
+            return self.functions[key]
+        except KeyError:
+            pass
+        with self.lock:
+            if key not in self.functions:
+                name = '_'.join(('validate', os.path.splitext(schema_name)[0]) + path)
+                self.functions[key] = compile_schema(self.definition(schema_prefix, schema_name, path), name)
+            return self.functions[key]
+
+    def definition(self, schema_prefix, schema_name, path=()):
+        """Return raw schema definition, loading it on first use"""
+        key = (schema_prefix, schema_name)
+        with self.lock:
+            if key not in self.definitions:
+                self.definitions[key] = self.load(schema_prefix, schema_name)
+            definition = self.definitions[key]
+        for field in path:
+            definition = definition[field]
+        return definition
+
+    def load(self, schema_prefix, schema_name):
+        """Load raw schema definition from yaml file"""
+        path = os.path.join(self.base_path, schema_prefix, schema_name)
+        with open(path, 'r') as schema:
+            return yaml.safe_load(schema)
+
+    def compile(self, definition):
+        """Let cerberus validate and expand the schema definition"""
+        # Avoid circular import, validators need the registry
+        from mds_agency_validator.validators import MdsValidator
+
+        return MdsValidator(definition).schema
+
+    def warm_up(self, functions=False):
+        """Load all schemas shipped with the package.
+
+        Schemas are looked up in the `schemas` directory of every version package.
+        Set functions to also compile them into python functions.
+        """
+        for schema_prefix in sorted(os.listdir(self.base_path)):
+            schemas_dir = os.path.join(self.base_path, schema_prefix, 'schemas')
+            if not os.path.isdir(schemas_dir):
+                continue
+            for schema_name in sorted(os.listdir(schemas_dir)):
+                if schema_name.endswith('.yaml'):
+                    self.get(schema_prefix + '/schemas', schema_name)
+                    if functions:
+                        self.get_function(schema_prefix + '/schemas', schema_name)
+
+    def loaded(self):
+        """List loaded (schema_prefix, schema_name) pairs"""
+        return sorted(self.schemas)
+
+    def clear(self):
+        with self.lock:
+            self.definitions = {}
+            self.schemas = {}
+            self.functions = {}
+
+
+schema_registry = SchemaRegistry()
@@ -0,0 +1,83 @@
+"""Last known state and timestamp of each device, in bounded memory.
+
+SequenceTable is a direct-mapped table: a device always uses the same slot,
+chosen from the hash of its device_id. Each slot holds a 64 bits fingerprint
+of the device_id, a state code and a timestamp, in fixed-size arrays, so
+memory only depends on the number of slots (17 bytes each), whatever the
+number of devices, and lookups are O(1).
+
+Two devices sharing a slot evict each other: the fingerprint tells that the
+slot holds another device, whose state is then unknown. Tables are not
+shared between processes.
+"""
+import array
+import threading
+
+FINGERPRINT_MASK = (1 << 64) - 1
+# Timestamps are stored as signed 64 bits integers
+TIMESTAMP_RANGE = range(-(1 << 63), 1 << 63)
+
+
+class SequenceTable:
+    """Last state and timestamp per device, states being codes from 1 to 255"""
+
+    def __init__(self, slots=1 << 20):
+        self.lock = threading.Lock()
+        self.configure(slots)
+
+    def configure(self, slots):
+        with self.lock:
+            self.slots = slots
+            # Arrays are allocated on first use
+            self.fingerprints = None
+            self.states = None
+            self.timestamps = None
+
+    def allocate(self):
+        self.fingerprints = array.array('Q', bytes(8 * self.slots))
+        # 0 for empty slots
+        self.states = array.array('B', bytes(self.slots))
+        self.timestamps = array.array('q', bytes(8 * self.slots))
+
+    @staticmethod
+    def valid_timestamp(timestamp):
+        return isinstance(timestamp, int) and not isinstance(timestamp, bool) and timestamp in TIMESTAMP_RANGE
+
+    @staticmethod
+    def fingerprint(device_id):
+        return hash(device_id) & FINGERPRINT_MASK
+
+    def get(self, device_id):
+        """Return (state code, timestamp) of the last event of the device, or None"""
+        fingerprint = self.fingerprint(device_id)
+        slot = fingerprint % self.slots
+        with self.lock:
+            if self.states is None or not self.states[slot] or self.fingerprints[slot] != fingerprint:
+                return None
+            return self.states[slot], self.timestamps[slot]
+
+    def set(self, device_id, state, timestamp):
+        fingerprint = self.fingerprint(device_id)
+        slot = fingerprint % self.slots
+        with self.lock:
+            if self.states is None:
+                self.allocate()
+            self.fingerprints[slot] = fingerprint
+            self.states[slot] = state
+            self.timestamps[slot] = timestamp
+
+    def clear(self):
+        self.configure(self.slots)
+
+    def __len__(self):
+        """Number of used slots"""
+        return self.slots - self.states.count(0) if self.states is not None else 0
+
+    def memory(self):
+        """Bytes used by the table arrays"""
+        if self.states is None:
+            return 0
+        return sum(len(values) * values.itemsize for values in (self.fingerprints, self.states, self.timestamps))
+
+
+event_sequences = SequenceTable()
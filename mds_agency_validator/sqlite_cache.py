@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+
+from mds_agency_validator.cache import Cache
+
+CREATE_TABLE = 'CREATE TABLE IF NOT EXISTS devices (device_id TEXT PRIMARY KEY, payload TEXT NOT NULL) WITHOUT ROWID'
+CREATE_LOOKUP_TABLE = 'CREATE TEMP TABLE IF NOT EXISTS lookup (device_id TEXT PRIMARY KEY) WITHOUT ROWID'
+INSERT = 'INSERT OR REPLACE INTO devices (device_id, payload) VALUES (?, ?)'
+SELECT = 'SELECT payload FROM devices WHERE device_id = ?'
+INSERT_LOOKUP = 'INSERT OR IGNORE INTO lookup (device_id) VALUES (?)'
+SELECT_LOOKUP = 'SELECT devices.device_id, devices.payload FROM lookup JOIN devices USING (device_id)'
+DELETE_LOOKUP = 'DELETE FROM lookup'
+DELETE = 'DELETE FROM devices'
+COUNT = 'SELECT COUNT(*) FROM devices'
+
+
+class SqliteCache:
+    """Registered devices stored in a local sqlite database
+
+    All the worker processes of a host share the same registry. The database
+    uses WAL journal mode so that readers don't block the writer.
+
+    Each thread of each process gets its own connection. Found devices are
+    kept in memory for read_cache_ttl seconds, so that devices sending
+    events and telemetry don't hit the database on every request. Unknown
+    devices are not kept, as another process may register them.
+    """
+
+    def __init__(self, path, read_cache_size=10000, read_cache_ttl=1.0):
+        self.path = path
+        self.local = threading.local()
+        self.read_cache = Cache(max_entries=read_cache_size, ttl=read_cache_ttl)
+        with self.connection() as connection:
+            connection.execute(CREATE_TABLE)
+
+    def connection(self):
+        """Return the connection of the current thread, opened on first use"""
+        pid = os.getpid()
+        # Connections must not be shared with forked worker processes
+        if getattr(self.local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=32)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(CREATE_LOOKUP_TABLE)
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def set(self, key, payload):
+        self.connection().execute(INSERT, (key, json.dumps(payload)))
+        self.read_cache.set(key, payload)
+
+    def get(self, key):
+        payload = self.read_cache.get(key)
+        if payload is not None:
+            return payload
+        if not isinstance(key, str):
+            return None
+        row = self.connection().execute(SELECT, (key,)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[0])
+        self.read_cache.set(key, payload)
+        return payload
+
+    def get_many(self, keys):
+        """Return a dict of found keys and their payloads
+
+        Keys missing from the read cache are looked up with a single query,
+        joining a temporary table filled with executemany.
+        """
+        found = self.read_cache.get_many(keys)
+        missing = [(key,) for key in keys if key not in found and isinstance(key, str)]
+        if not missing:
+            return found
+        connection = self.connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(INSERT_LOOKUP, missing)
+            rows = connection.execute(SELECT_LOOKUP).fetchall()
+            connection.execute(DELETE_LOOKUP)
+        for key, payload in rows:
+            payload = json.loads(payload)
+            self.read_cache.set(key, payload)
+            found[key] = payload
+        return found
+
+    def clear(self):
+        self.connection().execute(DELETE)
+        self.read_cache.clear()
+
+    def __len__(self):
+        return self.connection().execute(COUNT).fetchone()[0]
+
+    def stats(self):
+        stats = self.read_cache.stats()
+        stats['entries'] = len(self)
+        return stats
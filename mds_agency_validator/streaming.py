@@ -0,0 +1,134 @@
+"""Incremental json parsing of large payloads.
+
+A telemetry payload is a json object, whose `data` field is a (possibly huge)
+list of telemetry points. StreamingObject parses the payload while it is read
+from the request, and yields the items of that list one by one, so that only
+one telemetry point is held in memory at a time.
+"""
+import codecs
+import json
+
+WHITESPACES = ' \t\n\r'
+NUMBER_CHARS = '0123456789+-.eE'
+
+
+class StreamingObject:
+    """Parse a json object from an iterable of bytes chunks
+
+    Iterate on items() to get the items of the list in array_field.
+    Other fields of the object are decoded as a whole, and stored in fields.
+    Invalid json raises json.JSONDecodeError, as json.loads does.
+    """
+
+    def __init__(self, chunks, array_field):
+        self.chunks = iter(chunks)
+        self.array_field = array_field
+        self.fields = {}
+        # Whether array_field was found, and was a list
+        self.found = False
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def items(self):
+        if self.peek() != '{':
+            self.fail('Expecting object')
+        self.pos += 1
+        if self.peek() == '}':
+            self.pos += 1
+        else:
+            yield from self.parse_fields()
+        if self.peek() is not None:
+            self.fail('Extra data')
+
+    def parse_fields(self):
+        while True:
+            key = self.decode()
+            if not isinstance(key, str):
+                self.fail('Expecting property name enclosed in double quotes')
+            self.expect(':')
+            if key == self.array_field and self.peek() == '[':
+                self.found = True
+                self.pos += 1
+                yield from self.parse_items()
+            else:
+                self.fields[key] = self.decode()
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect('}')
+                return
+
+    def parse_items(self):
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(']')
+                return
+
+    def read(self):
+        """Read next chunk into the buffer, return False at the end of the stream"""
+        if self.eof:
+            return False
+        # Drop what was already parsed
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer += self.utf8.decode(b'', final=True)
+        else:
+            self.buffer += self.utf8.decode(chunk)
+        return True
+
+    def peek(self):
+        """Skip whitespaces, return next character or None at the end of the stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACES:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            self.fail("Expecting '%s' delimiter" % char)
+        self.pos += 1
+
+    def decode(self):
+        """Decode next json value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may be incomplete
+                if not self.read():
+                    raise
+            else:
+                # A number at the end of the buffer may go on in the next chunk
+                if not self.may_continue(value, end) or not self.read():
+                    self.pos = end
+                    return value
+
+    def may_continue(self, value, end):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        while end < len(self.buffer) and self.buffer[end] in NUMBER_CHARS:
+            end += 1
+        return end == len(self.buffer)
+
+    def fail(self, message):
+        raise json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def iter_chunks(stream, chunk_size):
+    return iter(lambda: stream.read(chunk_size), b'')
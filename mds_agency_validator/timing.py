@@ -0,0 +1,74 @@
+"""Opt-in timing of the validation stages of requests.
+
+With STAGE_TIMING enabled, BaseValidator.validate() measures each of its
+stages, and responses get a Server-Timing header, also on aborted requests:
+
+    Server-Timing: check_authorization;dur=0.052, extract_payload;dur=0.031, ..., total;dur=1.204
+
+Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged as json, by the
+`mds_agency_validator.timing` logger.
+"""
+import json
+import logging
+import time
+
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Durations of the validation stages of a request, in seconds"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # (stage name, duration)
+        self.stages = []
+
+    def run(self, name, function):
+        """Call function, and record its duration, even if it aborts"""
+        before = time.perf_counter()
+        try:
+            return function()
+        finally:
+            self.stages.append((name, time.perf_counter() - before))
+
+    def header(self, total):
+        stages = self.stages + [('total', total)]
+        return ', '.join('%s;dur=%.3f' % (name, duration * 1000) for name, duration in stages)
+
+
+def start_timer():
+    """Return the StageTimer of the current request, or None if timing is disabled"""
+    if not current_app.config['STAGE_TIMING']:
+        return None
+    g.stage_timer = StageTimer()
+    return g.stage_timer
+
+
+def log_slow_request(timer, total, response):
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 3),
+        'stages_ms': {name: round(duration * 1000, 3) for name, duration in timer.stages},
+    }
+    logger.warning('slow request %s', json.dumps(record), extra={'timing': record})
+
+
+def install(app):
+    """Add the Server-Timing header to responses of timed requests"""
+
+    @app.after_request
+    def add_server_timing(response):
+        timer = g.pop('stage_timer', None)
+        if timer is None:
+            return response
+        total = time.perf_counter() - timer.start
+        response.headers['Server-Timing'] = timer.header(total)
+        threshold = current_app.config['SLOW_REQUEST_THRESHOLD']
+        if threshold is not None and total >= threshold:
+            log_slow_request(timer, total, response)
+        return response
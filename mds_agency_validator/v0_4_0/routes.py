@@ -1,8 +1,10 @@
 from flask import Blueprint
 
 from mds_agency_validator.cache import cache
+from mds_agency_validator.lazy import LazyModule
 
-from . import validators
+# Imported on first request
+validators = LazyModule('mds_agency_validator.v0_4_0.validators')
 
 # Create Blueprint for all v0.4.0 routes below
 v0_4_0_bp = Blueprint('v0_4_0', __name__)
@@ -28,6 +30,11 @@ def vehicle_event(device_id):
     return validators.VehicleEvent_v0_4_0(device_id).validate()
 
 
+@v0_4_0_bp.route('/vehicles/events', methods=['POST'])
+def vehicle_events():
+    return validators.VehicleEvents_v0_4_0().validate()
+
+
 @v0_4_0_bp.route('/vehicles/telemetry', methods=['POST'])
 def vehicle_telemetry():
     return validators.VehicleTelemetry_v0_4_0().validate()
@@ -1,9 +1,29 @@
-import json
-
 from flask import abort
 
-from mds_agency_validator.cache import cache
-from mds_agency_validator.validators import BaseValidator
+from mds_agency_validator.validators import BaseValidator, EventBatchValidator, TelemetryValidator
+
+# Allowed event_type_reason values, for event types which require one
+EVENT_TYPE_TO_EVENT_TYPES_REASONS = {
+    'service_end': (
+        'low_battery',
+        'maintenance',
+        'compliance',
+        'off_hours',
+    ),
+    'provider_pick_up': (
+        'rebalance',
+        'maintenance',
+        'charge',
+        'compliance',
+    ),
+    'deregister': (
+        'missing',
+        'decommissioned',
+    ),
+}
+
+# Event types which require a trip_id
+TRIP_EVENT_TYPES = frozenset(['trip_start', 'trip_enter', 'trip_leave', 'trip_end'])
 
 
 class Agency0_4_0Validator(BaseValidator):
@@ -13,10 +33,12 @@ class Agency0_4_0Validator(BaseValidator):
 class VehicleRegister_v0_4_0(Agency0_4_0Validator):
 
     schema_name = 'vehicle_register.yaml'
+    # Successful registrations store the device
+    caches_success = False
 
     def additional_checks(self):
         device_id = self.payload.get('device_id', None)
-        if device_id and cache.get(device_id):
+        if device_id and self.lookup_device(device_id):
             abort(409, 'already_registered')
 
 
@@ -29,7 +51,7 @@ class VehicleUpdate_v0_4_0(Agency0_4_0Validator):
         self.device_id = device_id
 
     def additional_checks(self):
-        if not cache.get(self.device_id):
+        if not self.lookup_device(self.device_id):
             abort(404)
 
 
@@ -42,7 +64,7 @@ class VehicleEvent_v0_4_0(Agency0_4_0Validator):
         self.device_id = device_id
 
     def additional_checks(self):
-        if not cache.get(self.device_id):
+        if not self.lookup_device(self.device_id):
             abort(404)
 
         # compare route device_id and telemetry device_id
@@ -57,25 +79,7 @@ class VehicleEvent_v0_4_0(Agency0_4_0Validator):
         event_type = self.payload.get('event_type', None)
         if event_type:
             # Check event_type_reason values
-            event_type_to_event_types_reasons = {
-                'service_end': [
-                    'low_battery',
-                    'maintenance',
-                    'compliance',
-                    'off_hours',
-                ],
-                'provider_pick_up': [
-                    'rebalance',
-                    'maintenance',
-                    'charge',
-                    'compliance',
-                ],
-                'deregister': [
-                    'missing',
-                    'decommissioned',
-                ],
-            }
-            allowed_event_types_reasons = event_type_to_event_types_reasons.get(event_type, None)
+            allowed_event_types_reasons = EVENT_TYPE_TO_EVENT_TYPES_REASONS.get(event_type, None)
             if allowed_event_types_reasons:
                 # event_type_reason is required
                 try:
@@ -92,7 +96,7 @@ class VehicleEvent_v0_4_0(Agency0_4_0Validator):
                 self.bad_param.append('event_type_reason')
 
             # Check trip_id
-            if event_type in ['trip_start', 'trip_enter', 'trip_leave', 'trip_end']:
+            if event_type in TRIP_EVENT_TYPES:
                 if 'trip_id' not in self.payload:
                     self.missing_param.append('trip_id')
             else:
@@ -100,37 +104,14 @@ class VehicleEvent_v0_4_0(Agency0_4_0Validator):
                     self.bad_param.append('trip_id')
 
 
-class VehicleTelemetry_v0_4_0(Agency0_4_0Validator):
+class VehicleTelemetry_v0_4_0(Agency0_4_0Validator, TelemetryValidator):
 
     schema_name = 'vehicle_telemetry.yaml'
 
-    def __init__(self):
-        super().__init__()
-        self.result = 0
-        self.failures = []
-
-    def analyze_payload(self):
-        # Replace base cerberus errors parsing
-        self.cerberus_validator.validate(self.payload)
-        # on this payload (list of dict) the errors will be a list with only one dict inside
-        # containing the list index as keys :
-        # errors = [{0: {<anomalies on first telemetry>},  {<anomalies on 2nd telemetry>}}]
-        # We need to store failures in self.failures to return them in 201 Success responses
-        errors = self.cerberus_validator.errors.get('data', [{}])[0]
-        data = self.payload['data']
-        for i, telemetry in enumerate(data):
-            # if cerberus found an error, or if device isn't registred
-            if i in errors or not cache.get(telemetry.get('device_id', None)):
-                self.failures.append(data[i])
-
-        self.result = len(data) - len(self.failures)
-
-    def raise_on_anomalies(self):
-        # TODO : check response data format
-        # Are bad_params and missing_params also required ?
-        if self.result == 0:
-            abort(400, 'invalid_data')
-
-    def valid_response(self):
-        data = json.dumps({'result': self.result, 'failures': self.failures})
-        return data, 201
+
+class VehicleEvents_v0_4_0(Agency0_4_0Validator, EventBatchValidator):
+
+    schema_name = 'vehicle_events.yaml'
+
+    def make_event_validator(self, device_id, cerberus_validator=None):
+        return VehicleEvent_v0_4_0(device_id, cerberus_validator=cerberus_validator)
@@ -1,8 +1,10 @@
 from flask import Blueprint
 
 from mds_agency_validator.cache import cache
+from mds_agency_validator.lazy import LazyModule
 
-from . import validators
+# Imported on first request
+validators = LazyModule('mds_agency_validator.v1_0_0.validators')
 
 blueprint = Blueprint('v1_0_0', __name__)
 
@@ -25,6 +27,11 @@ def vehicle_event(device_id):
     return validators.VehicleEvent(device_id).validate()
 
 
+@blueprint.route('/vehicles/events', methods=['POST'])
+def vehicle_events():
+    return validators.VehicleEvents().validate()
+
+
 @blueprint.route('/vehicles/telemetry', methods=['POST'])
 def vehicle_telemetry():
     return validators.VehicleTelemetry().validate()
@@ -0,0 +1,158 @@
+"""Vehicle state transitions of Agency API 1.0.0 events.
+
+The rules are written as ALLOWED_STATE_TRANSITIONS, and compiled once into
+TRANSITIONS, where each event type is a bit of an integer mask. Checking an
+event is then a few integer operations.
+
+TRANSITIONS can be introspected to proofread the compiled rules::
+
+    >>> TRANSITIONS.allowed_event_types('on_trip')
+    ['comms_restored', 'located', 'trip_enter_jurisdiction', 'trip_start', 'unspecified']
+"""
+ALLOWED_STATE_TRANSITIONS = {
+    'available': [
+        'agency_drop_off',
+        'battery_charged',
+        'maintenance',
+        'on_hours',
+        'provider_drop_off',
+        'reservation_cancel',
+        'system_resume',
+        'trip_cancel',
+        'trip_end',
+    ],
+    'elsewhere': ['trip_leave_jurisdiction'],
+    'non_operational': [
+        'battery_low',
+        'maintenance',
+        'off_hours',
+        'system_suspend',
+        'unspecified',
+    ],
+    'on_trip': ['trip_start', 'trip_enter_jurisdiction'],
+    'removed': [
+        'agency_pick_up',
+        'compliance_pick_up',
+        'decommissioned',
+        'maintenance_pick_up',
+        'rebalance_pick_up',
+        'system_suspend',
+    ],
+    'reserved': ['reservation_start'],
+    'unknown': ['comms_lost', 'missing'],
+}
+
+# Vehicle states an event type may come from, for stateful checks (SEQUENCE_CHECKS).
+# Event types missing here may come from any state.
+PREVIOUS_STATES = {
+    'agency_drop_off': ['removed'],
+    'battery_charged': ['non_operational'],
+    'battery_low': ['available'],
+    'off_hours': ['available'],
+    'on_hours': ['non_operational'],
+    'provider_drop_off': ['removed'],
+    'reservation_cancel': ['reserved'],
+    'reservation_start': ['available'],
+    'system_resume': ['non_operational'],
+    'trip_cancel': ['on_trip', 'reserved'],
+    'trip_end': ['on_trip'],
+    'trip_enter_jurisdiction': ['elsewhere'],
+    'trip_leave_jurisdiction': ['on_trip'],
+    'trip_start': ['available', 'reserved'],
+}
+
+# Any event may follow these vehicle states
+UNCONSTRAINED_STATES = ['unknown']
+
+# Event types allowed whatever the vehicle state
+ALWAYS_ALLOWED_EVENT_TYPES = ['comms_restored', 'located', 'unspecified']
+
+# Event types which require a trip_id
+TRIP_EVENT_TYPES = [
+    'trip_start',
+    'trip_cancel',
+    'trip_enter_jurisdiction',
+    'trip_leave_jurisdiction',
+    'trip_end',
+]
+
+
+class TransitionTable:
+    """Allowed event types of each vehicle state, as bit masks"""
+
+    def __init__(self, transitions, always_allowed, trip_event_types, previous_states, unconstrained_states):
+        event_types = set(always_allowed) | set(trip_event_types) | set(previous_states)
+        for allowed in transitions.values():
+            event_types.update(allowed)
+        # event type: bit
+        self.bits = {event_type: 1 << i for i, event_type in enumerate(sorted(event_types))}
+        self.always_allowed = self.mask(always_allowed)
+        self.trip_events = self.mask(trip_event_types)
+        # vehicle state: mask of allowed event types
+        self.state_masks = {state: self.mask(allowed) | self.always_allowed for state, allowed in transitions.items()}
+        # States are stored as codes in sequence tables, 0 is for unknown
+        self.states = [None] + sorted(transitions)
+        self.state_codes = {state: code for code, state in enumerate(self.states) if state}
+        # vehicle state: mask of event types which may come from this state
+        unconstrained = self.mask(sorted(set(self.bits) - set(previous_states)))
+        self.from_masks = {state: unconstrained for state in transitions}
+        for event_type, states in previous_states.items():
+            for state in states:
+                self.from_masks[state] |= self.bits[event_type]
+        for state in unconstrained_states:
+            self.from_masks[state] = self.mask(sorted(self.bits))
+
+    def mask(self, event_types):
+        """Return the mask of a list of event types, unknown event types are ignored"""
+        mask = 0
+        if isinstance(event_types, list):
+            for event_type in event_types:
+                if isinstance(event_type, str):
+                    mask |= self.bits.get(event_type, 0)
+        return mask
+
+    def state_mask(self, vehicle_state):
+        """Return the mask of event types allowed for vehicle_state.
+        Unknown states, already reported by the schema, only allow the always allowed event types.
+        """
+        if not isinstance(vehicle_state, str):
+            return self.always_allowed
+        return self.state_masks.get(vehicle_state, self.always_allowed)
+
+    def allows(self, vehicle_state, mask):
+        """Whether one of the event types of mask leads to vehicle_state"""
+        return bool(mask & self.state_mask(vehicle_state))
+
+    def follows(self, previous_state_code, mask):
+        """Whether one of the event types of mask may come from the state of code previous_state_code"""
+        previous_state = self.states[previous_state_code]
+        if previous_state is None:
+            return True
+        return bool(mask & self.from_masks[previous_state])
+
+    def event_types(self, mask):
+        """Return the sorted event types of a mask"""
+        return sorted(event_type for event_type, bit in self.bits.items() if mask & bit)
+
+    def allowed_event_types(self, vehicle_state):
+        return self.event_types(self.state_mask(vehicle_state))
+
+    def describe(self):
+        """Return the compiled rules: vehicle state: allowed event types"""
+        return {state: self.event_types(mask) for state, mask in sorted(self.state_masks.items())}
+
+    def describe_previous_states(self):
+        """Return the compiled rules: vehicle state: event types which may come from it"""
+        return {state: self.event_types(mask) for state, mask in sorted(self.from_masks.items())}
+
+    def __repr__(self):
+        return '<TransitionTable %d states, %d event types>' % (len(self.state_masks), len(self.bits))
+
+
+TRANSITIONS = TransitionTable(
+    ALLOWED_STATE_TRANSITIONS,
+    ALWAYS_ALLOWED_EVENT_TYPES,
+    TRIP_EVENT_TYPES,
+    PREVIOUS_STATES,
+    UNCONSTRAINED_STATES,
+)
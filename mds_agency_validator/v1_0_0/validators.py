@@ -1,42 +1,11 @@
-import json
-
-from flask import abort
-
-from mds_agency_validator.cache import cache
-from mds_agency_validator.validators import BaseValidator
-
-ALLOWED_STATE_TRANSITIONS = {
-    'available': [
-        'agency_drop_off',
-        'battery_charged',
-        'maintenance',
-        'on_hours',
-        'provider_drop_off',
-        'reservation_cancel',
-        'system_resume',
-        'trip_cancel',
-        'trip_end',
-    ],
-    'elsewhere': ['trip_leave_jurisdiction'],
-    'non_operational': [
-        'battery_low',
-        'maintenance',
-        'off_hours',
-        'system_suspend',
-        'unspecified',
-    ],
-    'on_trip': ['trip_start', 'trip_enter_jurisdiction'],
-    'removed': [
-        'agency_pick_up',
-        'compliance_pick_up',
-        'decommissioned',
-        'maintenance_pick_up',
-        'rebalance_pick_up',
-        'system_suspend',
-    ],
-    'reserved': ['reservation_start'],
-    'unknown': ['comms_lost', 'missing'],
-}
+from flask import abort, current_app
+
+from mds_agency_validator.sequence import event_sequences
+from mds_agency_validator.v1_0_0.transitions import (  # pylint: disable=unused-import
+    ALLOWED_STATE_TRANSITIONS,
+    TRANSITIONS,
+)
+from mds_agency_validator.validators import BaseValidator, EventBatchValidator, TelemetryValidator
 
 
 class Agency1_0_0Validator(BaseValidator):
@@ -44,17 +13,17 @@ class Agency1_0_0Validator(BaseValidator):
 
 
 class VehicleRegister(Agency1_0_0Validator):
-
     schema_name = 'vehicle_register.yaml'
+    # Successful registrations store the device
+    caches_success = False
 
     def additional_checks(self):
         device_id = self.payload.get('device_id', None)
-        if device_id and cache.get(device_id):
+        if device_id and self.lookup_device(device_id):
             abort(409, 'already_registered')
 
 
 class VehicleUpdate(Agency1_0_0Validator):
-
     schema_name = 'vehicle_update.yaml'
 
     def __init__(self, device_id, **kwargs):
@@ -62,20 +31,21 @@ class VehicleUpdate(Agency1_0_0Validator):
         self.device_id = device_id
 
     def additional_checks(self):
-        if not cache.get(self.device_id):
+        if not self.lookup_device(self.device_id):
             abort(404)
 
 
 class VehicleEvent(Agency1_0_0Validator):
-
     schema_name = 'vehicle_event.yaml'
 
     def __init__(self, device_id, **kwargs):
         super().__init__(**kwargs)
         self.device_id = device_id
+        # (state code, timestamp) of the event, with SEQUENCE_CHECKS
+        self.sequence = None
 
     def additional_checks(self):
-        if not cache.get(self.device_id):
+        if not self.lookup_device(self.device_id):
             abort(404)
 
         # compare route device_id and telemetry device_id
@@ -94,62 +64,67 @@ class VehicleEvent(Agency1_0_0Validator):
             abort(400)
 
         try:
-            event_types = set(self.payload['event_types'])
+            event_types = TRANSITIONS.mask(self.payload['event_types'])
         except KeyError:
             self.missing_param.append('event_types')
             abort(400)
 
-        if not event_types & {'comms_restored', 'located'}:
-            allowed_event_types = ALLOWED_STATE_TRANSITIONS[vehicle_state]
-            if not event_types & set(allowed_event_types) and not 'unspecified' in event_types:
-                self.bad_param.append('event_types')
+        if not TRANSITIONS.allows(vehicle_state, event_types):
+            self.bad_param.append('event_types')
 
         # Check trip_id
-        if event_types & {
-            'trip_start',
-            'trip_cancel',
-            'trip_enter_jurisdiction',
-            'trip_leave_jurisdiction',
-            'trip_end',
-        }:
+        if event_types & TRANSITIONS.trip_events:
             if 'trip_id' not in self.payload:
                 self.missing_param.append('trip_id')
         else:
             if 'trip_id' in self.payload:
                 self.bad_param.append('trip_id')
 
+        if current_app.config['SEQUENCE_CHECKS']:
+            self.check_sequence(vehicle_state, event_types)
+
+    def check_sequence(self, vehicle_state, event_types):
+        """Compare the event with the previous valid event of the device"""
+        timestamp = self.payload.get('timestamp', None)
+        state = TRANSITIONS.state_codes.get(vehicle_state, None) if isinstance(vehicle_state, str) else None
+        if state is None or not event_sequences.valid_timestamp(timestamp):
+            # Already reported by the schema
+            return
+        # Recorded once all checks passed
+        self.sequence = (state, timestamp)
+        previous = event_sequences.get(self.device_id)
+        if previous is None:
+            return
+        previous_state, previous_timestamp = previous
+        if previous == self.sequence:
+            # The same event, sent again
+            return
+        if timestamp < previous_timestamp:
+            self.bad_param.append('timestamp')
+        if not TRANSITIONS.follows(previous_state, event_types):
+            self.bad_param.append('vehicle_state')
+
+    def raise_on_anomalies(self):
+        super().raise_on_anomalies()
+        # The event is valid, it is now the last event of the device
+        if self.sequence is not None:
+            event_sequences.set(self.device_id, *self.sequence)
+
+    def cacheable(self):
+        # Verdicts depend on previous events
+        return not current_app.config['SEQUENCE_CHECKS']
 
-class VehicleTelemetry(Agency1_0_0Validator):
 
+class VehicleTelemetry(Agency1_0_0Validator, TelemetryValidator):
     schema_name = 'vehicle_telemetry.yaml'
 
-    def __init__(self):
-        super().__init__()
-        self.result = 0
-        self.failures = []
-
-    def analyze_payload(self):
-        # Replace base cerberus errors parsing
-        self.cerberus_validator.validate(self.payload)
-        # on this payload (list of dict) the errors will be a list with only one dict inside
-        # containing the list index as keys :
-        # errors = [{0: {<anomalies on first telemetry>},  {<anomalies on 2nd telemetry>}}]
-        # We need to store failures in self.failures to return them in 201 Success responses
-        errors = self.cerberus_validator.errors.get('data', [{}])[0]
-        data = self.payload['data']
-        for i, telemetry in enumerate(data):
-            # if cerberus found an error, or if device isn't registred
-            if i in errors or not cache.get(telemetry.get('device_id', None)):
-                self.failures.append(data[i])
-
-        self.result = len(data) - len(self.failures)
 
-    def raise_on_anomalies(self):
-        # TODO : check response data format
-        # Are bad_params and missing_params also required ?
-        if self.result == 0:
-            abort(400, 'invalid_data')
-
-    def valid_response(self):
-        data = json.dumps({'result': self.result, 'failures': self.failures})
-        return data, 201
+class VehicleEvents(Agency1_0_0Validator, EventBatchValidator):
+    schema_name = 'vehicle_events.yaml'
+
+    def make_event_validator(self, device_id, cerberus_validator=None):
+        return VehicleEvent(device_id, cerberus_validator=cerberus_validator)
+
+    def cacheable(self):
+        # Verdicts depend on previous events
+        return not current_app.config['SEQUENCE_CHECKS']
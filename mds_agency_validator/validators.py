@@ -1,12 +1,24 @@
-import json
-import os
-import re
 from collections import defaultdict
+from collections.abc import Mapping
 
 import cerberus
-import jwt
-import yaml
-from flask import abort, request
+from flask import abort, current_app, g, make_response, request
+from werkzeug.exceptions import HTTPException
+
+from mds_agency_validator import codec, compression, limits, streaming, timing, verdicts
+from mds_agency_validator.auth import token_cache
+from mds_agency_validator.cache import cache
+from mds_agency_validator.compiler import UUID_RE, CompiledValidator, build_error_tree
+from mds_agency_validator.lazy import LazyModule
+from mds_agency_validator.schemas import schema_registry
+
+# Imports numpy, only needed with COLUMNAR_TELEMETRY
+columnar = LazyModule('mds_agency_validator.columnar')
+
+# Formats of telemetry failures in responses
+FAILURES_FORMATS = ('payload', 'compact')
+# Values of the fail_fast query parameter
+FAIL_FAST_VALUES = {'true': True, '1': True, 'false': False, '0': False}
 
 
 class MdsValidator(cerberus.Validator):
@@ -18,8 +30,60 @@ class MdsValidator(cerberus.Validator):
     def _validate_type_uuid(self, value):
         if not isinstance(value, str):
             return False
-        re_uuid = re.compile(r'[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}', re.I)
-        return bool(re_uuid.match(value))
+        return bool(UUID_RE.match(value))
+
+
+class FirstAnomaly(Exception):
+    """Raised by fail-fast validators on the first anomaly found
+
+    path is the document path of the field, as a tuple of field names and list indexes.
+    """
+
+    def __init__(self, path, message):
+        super().__init__(path, message)
+        self.path = path
+        self.message = message
+
+    @property
+    def field(self):
+        return '.'.join(str(part) for part in self.path)
+
+    @property
+    def missing(self):
+        return self.message == 'required field'
+
+    @property
+    def errors(self):
+        """The cerberus like error tree of this anomaly"""
+        return build_error_tree([(self.path, self.message)])
+
+
+class FailFastValidator(MdsValidator):
+    """Our custom cerberus validator, raising FirstAnomaly on the first error
+    instead of building the whole error tree
+    """
+
+    def validate(self, document, schema=None, update=False, normalize=False):
+        # Our schemas have no normalization rules, skip the normalization pass,
+        # which is the most expensive part of validating many small documents
+        return super().validate(document, schema=schema, update=update, normalize=normalize)
+
+    def _error(self, *args):
+        if len(args) == 1:
+            # Errors of a child validator, which would have raised already
+            error = args[0][0]
+            path, code = error.document_path, error.code
+        else:
+            path = self.document_path + (args[0],)
+            code = None if isinstance(args[1], str) else args[1].code
+        raise FirstAnomaly(path, 'required field' if code == cerberus.errors.REQUIRED_FIELD.code else 'bad value')
+
+
+class FailFastCompiledValidator(CompiledValidator):
+    """Compiled schema function, raising FirstAnomaly on the first error"""
+
+    def add_error(self, path, message):
+        raise FirstAnomaly(path, message)
 
 
 class BaseValidator:
@@ -42,25 +106,88 @@ class BaseValidator:
 
     schema_prefix = None
     schema_name = None
+    # Whether successful verdicts may be cached, see verdicts module
+    caches_success = True
+    # Attributes restored from cached verdicts
+    verdict_attributes = ('bad_param', 'missing_param')
 
     class Meta:
         abstract = True
 
-    def __init__(self):
+    def __init__(self, cerberus_validator=None):
         self.bad_param = []
         self.missing_param = []
         self.payload = None
-        self.load_cerberus_validator()
+        self.provider_id = None
+        # Whether validation stops at the first anomaly
+        self.fail_fast = False
+        # Size of the body, once it was rejected as too large
+        self.oversized_body = None
+        # device_id: whether it was found in the registry
+        self.registry_lookups = {}
+        if cerberus_validator is None:
+            self.load_cerberus_validator()
+        else:
+            # Shared between validators of the same schema, see EventBatchValidator
+            self.cerberus_validator = cerberus_validator
 
     def load_cerberus_validator(self):
-        """Load yaml file from class schema_name,
+        """Get compiled schema from class schema_name,
         then create an instance of our custom cerberus validator
+
+        With the 'compiled' validation engine, use the schema compiled into
+        a python function instead, which returns the same errors.
+        """
+        self.cerberus_validator = self.get_validator()
+
+    def get_validator(self, path=(), fail_fast=False):
+        """Return a validator for the class schema, or the sub schema at path,
+        using the configured validation engine
+
+        Fail-fast validators raise FirstAnomaly on the first error, see first_anomaly().
+        """
+        if current_app.config['VALIDATION_ENGINE'] == 'compiled':
+            function = schema_registry.get_function(self.schema_prefix, self.schema_name, path)
+            return FailFastCompiledValidator(function) if fail_fast else CompiledValidator(function)
+        schema = schema_registry.get(self.schema_prefix, self.schema_name, path)
+        return FailFastValidator(schema) if fail_fast else MdsValidator(schema)
+
+    @staticmethod
+    def first_anomaly(validator, document):
+        """Validate document with a fail-fast validator, return its FirstAnomaly or None"""
+        try:
+            validator.validate(document)
+        except FirstAnomaly as anomaly:
+            return anomaly
+        return None
+
+    def use_fail_fast(self):
+        """Whether validation stops at the first anomaly,
+        from the `fail_fast` query parameter or the FAIL_FAST setting
         """
-        base_path = os.path.abspath(os.path.dirname(__file__))
-        path = os.path.join(base_path, self.schema_prefix)
-        path = os.path.join(path, self.schema_name)
-        with open(path, 'r') as schema:
-            self.cerberus_validator = MdsValidator(yaml.safe_load(schema))
+        value = request.args.get('fail_fast', None)
+        if value is None:
+            return current_app.config['FAIL_FAST']
+        if value not in FAIL_FAST_VALUES:
+            abort(400, codec.dumps({'bad_param': ['fail_fast']}))
+        return FAIL_FAST_VALUES[value]
+
+    def lookup_device(self, device_id):
+        """Return the registered device, or None"""
+        device = cache.get(device_id)
+        self.registry_lookups[device_id] = bool(device)
+        return device
+
+    def lookup_devices(self, device_ids):
+        """Return a dict of registered devices"""
+        devices = cache.get_many(device_ids)
+        for device_id in device_ids:
+            self.registry_lookups[device_id] = bool(devices.get(device_id))
+        return devices
+
+    def cacheable(self):
+        """Whether the verdict may be cached, see verdicts module"""
+        return True
 
     def check_authorization(self):
         """Check request authorization"""
@@ -72,31 +199,77 @@ class BaseValidator:
         if auth_type != 'Bearer':
             abort(401, 'Please provide a Bearer token')
         # provider_id should be present
-        try:
-            data = jwt.decode(token, options={'verify_signature': False}, algorithms='HS256')
-        except jwt.exceptions.DecodeError:
-            abort(401, 'Please provide a valid JWT')
-        else:
-            if 'provider_id' not in data:
-                abort(401, 'Please provide a provider_id')
+        claims, error = token_cache.decode(token)
+        if error:
+            abort(401, error)
+        self.provider_id = claims['provider_id']
+
+    def check_body_size(self):
+        """Reject bodies larger than the MAX_BODY_SIZES limit of the route, from their
+        Content-Length, or while they are read for chunked uploads
+        """
+        limit = limits.get_limit(request.endpoint, current_app.config)
+        if limit is None:
+            return
+        if request.content_length is None:
+            request.stream = limits.LimitedBody(request.stream, limit, self.reject_body)
+        elif request.content_length > limit:
+            self.reject_body(request.content_length)
+
+    def reject_body(self, size):
+        self.oversized_body = size
+        limit = limits.get_limit(request.endpoint, current_app.config)
+        body = codec.dumps({'error': 'payload_too_large', 'max_size': limit})
+        abort(make_response(body, 413, {'Content-Type': 'application/json'}))
 
     def extract_payload(self):
         """Extract payload from request"""
         # We cannot use request.get_json() because it only works if Content-Type is
         # application/json and Agency API v0.4.0 specs don't enforce the Content-Type
-        self.payload = json.loads(request.data.decode('utf8'))
+        body = request.get_data()
+        if request.content_encoding:
+            body = b''.join(self.decompress([body]))
+        self.payload = codec.loads(body, request.mimetype, current_app.config['JSON_DECODER'])
+
+    def decompress(self, chunks):
+        """Decompress chunks of the request body according to its Content-Encoding,
+        up to DECOMPRESSED_MAX_SIZE bytes
+        """
+        config = current_app.config
+        return compression.decompress(
+            chunks, request.content_encoding, config['DECOMPRESSED_MAX_SIZE'], config['STREAMING_CHUNK_SIZE']
+        )
 
     def analyze_payload(self):
         """Use our custom cerberus validator for base checks"""
+        self.fail_fast = self.use_fail_fast()
+        if self.fail_fast:
+            self.analyze_first_anomaly()
+            return
         self.cerberus_validator.validate(self.payload)
+        bad_param, missing_param = self.sort_errors(self.cerberus_validator.errors)
+        self.bad_param.extend(bad_param)
+        self.missing_param.extend(missing_param)
+
+    def analyze_first_anomaly(self):
+        """Stop at the first missing or bad field, and raise it"""
+        anomaly = self.first_anomaly(self.get_validator(fail_fast=True), self.payload)
+        if anomaly is not None:
+            (self.missing_param if anomaly.missing else self.bad_param).append(anomaly.field)
+            self.raise_on_anomalies()
+
+    def sort_errors(self, errors):
+        """Return (bad_param, missing_param) field paths of cerberus errors"""
+        bad_param, missing_param = [], []
         # Flatten errors on nested fields
-        flat_errors = self.flatten_errors(self.cerberus_validator.errors)
+        flat_errors = self.flatten_errors(errors)
         # Sort errors between missing fields and bad fields value
-        for field, errors in flat_errors.items():
-            if 'required field' in errors:
-                self.missing_param.append(field)
+        for field, field_errors in flat_errors.items():
+            if 'required field' in field_errors:
+                missing_param.append(field)
             else:
-                self.bad_param.append(field)
+                bad_param.append(field)
+        return bad_param, missing_param
 
     def flatten_errors(self, errors):
         """Flatten cerberus errors on nested schema"""
@@ -125,13 +298,19 @@ class BaseValidator:
         By default, it's when bad_params or missing_params are not empty
         but you can add new anomalies in child class
         """
+        if self.fail_fast:
+            # Additional checks may have found several anomalies, only report one
+            if self.bad_param:
+                del self.bad_param[1:], self.missing_param[:]
+            else:
+                del self.missing_param[1:]
         result = {}
         if self.bad_param:
             result['bad_param'] = self.bad_param
         if self.missing_param:
             result['missing_param'] = self.missing_param
         if result:
-            abort(400, json.dumps(result))
+            abort(400, codec.dumps(result))
 
     def valid_response(self):
         """Return that everything went well"""
@@ -139,6 +318,19 @@ class BaseValidator:
 
     def validate(self):
         """Base validation for v0.4.0 Agency API"""
+        # Metrics count anomalies of the request validator
+        g.validator = self
+        # Before the body is read, by verdicts or extract_payload()
+        self.check_body_size()
+        if verdicts.enabled():
+            return verdicts.verdict_cache.validate(self)
+        return self.run_stages()
+
+    def run_stages(self):
+        """Run all validation steps"""
+        timer = timing.start_timer()
+        if timer is not None:
+            return self.validate_timed(timer)
         self.check_authorization()
         # No check on Content-Type
         self.extract_payload()
@@ -146,3 +338,328 @@ class BaseValidator:
         self.additional_checks()
         self.raise_on_anomalies()
         return self.valid_response()
+
+    def validate_timed(self, timer):
+        """Same as run_stages(), measuring the duration of each stage"""
+        timer.run('check_authorization', self.check_authorization)
+        timer.run('extract_payload', self.extract_payload)
+        timer.run('analyze_payload', self.analyze_payload)
+        timer.run('additional_checks', self.additional_checks)
+        timer.run('raise_on_anomalies', self.raise_on_anomalies)
+        return timer.run('valid_response', self.valid_response)
+
+
+class TelemetryValidator(BaseValidator):
+    """Base class for telemetry validators
+
+    The payload holds a list of telemetry points in data. Invalid points, or points
+    from unregistered devices, are returned as failures in the 201 Success response.
+
+    Failures are the telemetry points themselves, or with compact failures
+    (`failures=compact` query parameter or TELEMETRY_FAILURES setting), their
+    index in data and the paths of their invalid fields.
+
+    Large batches can be validated column by column, see columnar module,
+    or while they are read from the request, see streaming module.
+    """
+
+    class Meta:
+        abstract = True
+
+    verdict_attributes = BaseValidator.verdict_attributes + ('result', 'failures')
+
+    def __init__(self):
+        super().__init__()
+        self.result = 0
+        self.failures = []
+        self.stream = None
+        self.compact_failures = False
+        # Indexes of failures in data, and their cerberus errors when known, for compact failures
+        self.failure_indexes = []
+        self.failure_errors = {}
+
+    def cacheable(self):
+        # Streamed bodies are consumed while validated, they can't be hashed beforehand
+        return not current_app.config['STREAMING_TELEMETRY']
+
+    def extract_payload(self):
+        failures_format = request.args.get('failures', current_app.config['TELEMETRY_FAILURES'])
+        if failures_format not in FAILURES_FORMATS:
+            abort(400, codec.dumps({'bad_param': ['failures']}))
+        self.compact_failures = failures_format == 'compact'
+        # msgpack payloads are decoded in one piece
+        if current_app.config['STREAMING_TELEMETRY'] and request.mimetype not in codec.MSGPACK_TYPES:
+            chunks = streaming.iter_chunks(request.stream, current_app.config['STREAMING_CHUNK_SIZE'])
+            # Compressed bodies are parsed as they are decompressed
+            self.stream = streaming.StreamingObject(self.decompress(chunks), 'data')
+        else:
+            super().extract_payload()
+
+    def analyze_payload(self):
+        self.fail_fast = self.use_fail_fast()
+        if self.stream is not None:
+            self.analyze_stream()
+            return
+
+        invalid = None
+        if self.use_columnar():
+            try:
+                invalid = self.analyze_columns()
+            except columnar.Unsupported:
+                pass
+        if invalid is None:
+            invalid = self.analyze_items() if self.fail_fast else self.analyze_rows()
+
+        # We need to store failures in self.failures to return them in 201 Success responses
+        data = self.payload['data']
+        # Look up all devices at once, telemetry points with errors may not have a valid device_id
+        registered = self.lookup_devices(
+            {telemetry['device_id'] for i, telemetry in enumerate(data) if i not in invalid}
+        )
+        for i, telemetry in enumerate(data):
+            # if cerberus found an error, or if device isn't registred
+            if i in invalid or not registered.get(telemetry['device_id']):
+                self.failures.append(data[i])
+                if self.compact_failures:
+                    errors = invalid.get(i, None) if isinstance(invalid, dict) else None
+                    self.add_failure_errors(i, errors, i in invalid)
+
+        self.result = len(data) - len(self.failures)
+
+    def analyze_stream(self):
+        """Validate telemetry points one by one, while the payload is parsed.
+        Only failures are kept in memory.
+        """
+        item_validator = self.get_item_validator(fail_fast=self.fail_fast)
+        count = 0
+        for telemetry in self.stream.items():
+            count += 1
+            valid = isinstance(telemetry, Mapping) and self.item_is_valid(item_validator, telemetry)
+            if not valid or not self.lookup_device(telemetry.get('device_id', None)):
+                self.failures.append(telemetry)
+                if self.compact_failures:
+                    # Fail-fast errors are cheaper to compute again than to keep
+                    errors = [item_validator.errors] if isinstance(telemetry, Mapping) and not self.fail_fast else None
+                    self.add_failure_errors(count - 1, errors, not valid)
+        self.result = count - len(self.failures)
+
+    def add_failure_errors(self, index, errors, invalid):
+        """Keep the cerberus errors of the telemetry point at index, for compact failures.
+        Errors of invalid points are computed again when unknown.
+        """
+        self.failure_indexes.append(index)
+        if not invalid:
+            self.failure_errors[index] = {}
+        elif errors is not None and len(errors) == 1 and isinstance(errors[0], dict):
+            # The errors of one point are a list holding a dict of field errors
+            self.failure_errors[index] = errors[0]
+
+    def analyze_rows(self):
+        """Validate the whole payload with cerberus, return invalid telemetry indexes"""
+        self.cerberus_validator.validate(self.payload)
+        # on this payload (list of dict) the errors will be a list with only one dict inside
+        # containing the list index as keys :
+        # errors = [{0: {<anomalies on first telemetry>},  {<anomalies on 2nd telemetry>}}]
+        return self.cerberus_validator.errors.get('data', [{}])[0]
+
+    def analyze_items(self):
+        """Validate telemetry points one by one, stopping at the first anomaly of each point.
+        Return invalid telemetry indexes, with their errors as analyze_rows() does for compact failures
+        """
+        data = self.payload.get('data', None) if isinstance(self.payload, Mapping) else None
+        if not isinstance(data, list):
+            return self.analyze_rows()
+        item_validator = self.get_item_validator(fail_fast=True)
+        invalid = {}
+        for i, telemetry in enumerate(data):
+            if not isinstance(telemetry, Mapping):
+                invalid[i] = None
+            else:
+                anomaly = self.first_anomaly(item_validator, telemetry)
+                if anomaly is not None:
+                    invalid[i] = [anomaly.errors] if self.compact_failures else None
+        return invalid
+
+    def item_is_valid(self, item_validator, telemetry):
+        """Whether a telemetry point is valid, with a fail-fast or a full validator"""
+        if self.fail_fast:
+            return self.first_anomaly(item_validator, telemetry) is None
+        return item_validator.validate(telemetry)
+
+    def item_errors(self, item_validator, telemetry):
+        """Return the errors of one telemetry point, an empty dict if it is valid.
+        Fail-fast validation only returns the first anomaly
+        """
+        if self.fail_fast:
+            anomaly = self.first_anomaly(item_validator, telemetry)
+            return {} if anomaly is None else anomaly.errors
+        if item_validator.validate(telemetry):
+            return {}
+        return item_validator.errors
+
+    def use_columnar(self):
+        config = current_app.config
+        if not config['COLUMNAR_TELEMETRY'] or not columnar.available():
+            return False
+        if not isinstance(self.payload, dict) or not isinstance(self.payload.get('data'), list):
+            return False
+        return len(self.payload['data']) >= config['COLUMNAR_MIN_BATCH_SIZE']
+
+    def analyze_columns(self):
+        """Validate telemetry points in columns, return invalid telemetry indexes.
+        Points that can't be classified in columns are validated one by one.
+        """
+        validator = columnar.get_validator(self.schema_prefix, self.schema_name)
+        if validator is None:
+            raise columnar.Unsupported(self.schema_name)
+        data = self.payload['data']
+        invalid, unclassified = columnar.analyze_rows(validator, data)
+        invalid = set(invalid)
+        if unclassified:
+            item_validator = self.get_item_validator(fail_fast=self.fail_fast)
+            for i in unclassified:
+                if not isinstance(data[i], Mapping) or not self.item_is_valid(item_validator, data[i]):
+                    invalid.add(i)
+        return invalid
+
+    def get_item_validator(self, fail_fast=False):
+        """Validator for one telemetry point"""
+        return self.get_validator(('data', 'schema', 'schema'), fail_fast=fail_fast)
+
+    def raise_on_anomalies(self):
+        # TODO : check response data format
+        # Are bad_params and missing_params also required ?
+        if self.result == 0:
+            abort(400, 'invalid_data')
+
+    def valid_response(self):
+        if self.compact_failures:
+            failures = ', '.join(self.iter_compact_failures())
+            return '{"result": %s, "failures": [%s]}' % (codec.dumps(self.result), failures), 201
+        data = codec.dumps({'result': self.result, 'failures': self.failures})
+        return data, 201
+
+    def iter_compact_failures(self):
+        """Yield json encoded failures, with their index and invalid field paths"""
+        item_validator = None
+        for index, telemetry in zip(self.failure_indexes, self.failures):
+            failure = {'index': index}
+            errors = self.failure_errors.get(index, None)
+            if errors is None and isinstance(telemetry, Mapping):
+                item_validator = item_validator or self.get_item_validator(fail_fast=self.fail_fast)
+                errors = self.item_errors(item_validator, telemetry)
+            if errors is None:
+                failure['error'] = 'invalid_telemetry'
+            elif not errors:
+                failure['error'] = 'unregistered_device'
+            else:
+                bad_param, missing_param = self.sort_errors(errors)
+                if bad_param:
+                    failure['bad_param'] = bad_param
+                if missing_param:
+                    failure['missing_param'] = missing_param
+            yield codec.dumps(failure)
+
+
+class EventBatchValidator(BaseValidator):
+    """Base class for event batch validators
+
+    The payload holds a list of {device_id, event} items in data. The request
+    authorization is checked once, then each event goes through the checks of
+    the single event validator from make_event_validator(), all sharing one
+    schema validator.
+
+    Invalid events are returned as failures in the 201 Success response, with
+    their index in data and the paths of their invalid fields, or an error.
+    """
+
+    class Meta:
+        abstract = True
+
+    verdict_attributes = BaseValidator.verdict_attributes + ('result', 'failures')
+
+    def __init__(self):
+        super().__init__()
+        self.result = 0
+        self.failures = []
+        self.event_cerberus_validator = None
+
+    def analyze_payload(self):
+        self.fail_fast = self.use_fail_fast()
+        self.cerberus_validator.validate(self.payload)
+        errors = dict(self.cerberus_validator.errors)
+        data_errors = errors.pop('data', [])
+        data = self.payload.get('data', None)
+        if not isinstance(data, list):
+            errors['data'] = data_errors
+        # Anomalies of the payload itself, not of its events
+        bad_param, missing_param = self.sort_errors(errors)
+        self.bad_param.extend(bad_param)
+        self.missing_param.extend(missing_param)
+        if not isinstance(data, list):
+            return
+
+        # on this payload (list of dict) the errors of items are a dict in the last error of data
+        invalid = data_errors[-1] if data_errors and isinstance(data_errors[-1], dict) else {}
+        for i, item in enumerate(data):
+            if i in invalid:
+                self.failures.append(self.item_failure(i, invalid[i]))
+            else:
+                failure = self.check_event(i, item['device_id'], item['event'])
+                if failure is not None:
+                    self.failures.append(failure)
+        self.result = len(data) - len(self.failures)
+
+    def item_failure(self, index, errors):
+        """Failure of an item which is not a valid {device_id, event} object"""
+        failure = {'index': index}
+        if not isinstance(errors[-1], dict):
+            failure['error'] = 'invalid_event'
+            return failure
+        bad_param, missing_param = self.sort_errors(errors[-1])
+        if bad_param:
+            failure['bad_param'] = bad_param
+        if missing_param:
+            failure['missing_param'] = missing_param
+        return failure
+
+    def make_event_validator(self, device_id, cerberus_validator=None):
+        """Return the single event validator of device_id
+
+        Override this method in child class.
+        """
+        raise NotImplementedError
+
+    def check_event(self, index, device_id, event):
+        """Run the checks of single events, return the failure of the event or None"""
+        validator = self.make_event_validator(device_id, cerberus_validator=self.event_cerberus_validator)
+        self.event_cerberus_validator = validator.cerberus_validator
+        validator.provider_id = self.provider_id
+        validator.payload = event
+        try:
+            validator.analyze_payload()
+            validator.additional_checks()
+            validator.raise_on_anomalies()
+        except HTTPException as error:
+            failure = {'index': index}
+            if error.code == 404:
+                failure['error'] = 'unregistered_device'
+            elif not validator.bad_param and not validator.missing_param:
+                failure['error'] = 'invalid_event'
+            else:
+                for kind in ('bad_param', 'missing_param'):
+                    if getattr(validator, kind):
+                        failure[kind] = ['event.' + field for field in getattr(validator, kind)]
+            return failure
+        finally:
+            self.registry_lookups.update(validator.registry_lookups)
+        return None
+
+    def raise_on_anomalies(self):
+        super().raise_on_anomalies()
+        if self.result == 0:
+            abort(400, 'invalid_data')
+
+    def valid_response(self):
+        data = codec.dumps({'result': self.result, 'failures': self.failures})
+        return data, 201
@@ -0,0 +1,103 @@
+"""Cache of validation verdicts, for retried identical requests.
+
+Verdicts are keyed by validator class, url (version, route and device_id),
+query string, Authorization, Content-Encoding and Content-Type headers, which
+tell how the body is to be decoded, and a blake2b hash of the raw body.
+
+A verdict also depends on the registry: validators look devices up with
+BaseValidator.lookup_device(s), which records whether each device was
+found. A cached verdict is only returned while these devices are still
+(un)registered as they were.
+
+Verdicts changing the registry are never cached: registrations succeeding
+store the device, so that the same request then gets a 409.
+"""
+import hashlib
+import threading
+
+from flask import abort, current_app, request
+from werkzeug.exceptions import HTTPException
+
+from mds_agency_validator.cache import Cache, cache
+
+
+class VerdictCache:
+    def __init__(self, max_entries=0):
+        self.lock = threading.Lock()
+        self.configure(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = Cache(max_entries=max_entries or None)
+
+    @staticmethod
+    def get_key(validator):
+        digest = hashlib.blake2b(request.get_data(), digest_size=16).digest()
+        return (
+            type(validator).__name__,
+            request.path,
+            request.query_string,
+            request.headers.get('Authorization', None),
+            request.headers.get('Content-Encoding', None),
+            request.mimetype,
+            digest,
+        )
+
+    @staticmethod
+    def registry_unchanged(lookups):
+        """Whether devices are still (un)registered as they were"""
+        if len(lookups) == 1:
+            ((device_id, found),) = lookups.items()
+            return bool(cache.get(device_id)) == found
+        registered = cache.get_many(list(lookups))
+        return all(bool(registered.get(device_id)) == found for device_id, found in lookups.items())
+
+    def validate(self, validator):
+        """Return the cached verdict of the request, or validate it"""
+        if not validator.cacheable():
+            return validator.run_stages()
+        key = self.get_key(validator)
+        entry = self.entries.get(key)
+        if entry is not None and self.registry_unchanged(entry['lookups']):
+            with self.lock:
+                self.hits += 1
+            # Restore anomalies, for metrics
+            for name, value in entry['attributes'].items():
+                setattr(validator, name, value)
+            if 'error' in entry:
+                abort(*entry['error'])
+            return entry['response']
+        with self.lock:
+            self.misses += 1
+
+        try:
+            response = validator.run_stages()
+        except HTTPException as error:
+            self.store(key, validator, error=(error.code, error.description))
+            raise
+        if validator.caches_success:
+            self.store(key, validator, response=response)
+        return response
+
+    def store(self, key, validator, **verdict):
+        verdict['lookups'] = validator.registry_lookups
+        verdict['attributes'] = {name: getattr(validator, name) for name in validator.verdict_attributes}
+        self.entries.set(key, verdict)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        stats = self.entries.stats()
+        stats['hits'] = self.hits
+        stats['misses'] = self.misses
+        return stats
+
+
+def enabled():
+    return bool(current_app.config['VERDICT_CACHE_SIZE'])
+
+
+verdict_cache = VerdictCache()
@@ -1,3 +1,5 @@
+import copy
+
 import pytest
 
 from mds_agency_validator.app import app
@@ -12,6 +14,19 @@ def client():
     return app.test_client()
 
 
+@pytest.fixture
+def config(request):
+    """The app settings, restored as they were after the test
+
+    Tests parametrized with tests.utils.settings get their settings applied.
+    """
+    saved = copy.deepcopy(dict(app.config))
+    app.config.update(getattr(request, 'param', {}))
+    yield app.config
+    app.config.clear()
+    app.config.update(saved)
+
+
 @pytest.fixture(autouse=True)
 def clear_cache():
     cache.clear()
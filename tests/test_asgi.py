@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from flask import url_for
+
+from mds_agency_validator.asgi import application
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+from tests.v1_0_0.utils import generate_telemetry
+
+
+def call(path, method='POST', headers=(), body=b'', chunk_size=None):
+    """Run one request through the ASGI application, return (status, headers, body)"""
+    chunk_size = chunk_size or max(len(body), 1)
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)] or [b'']
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1} for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        # Let other tasks run, as a slow client would
+        await asyncio.sleep(0)
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': b'',
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+        'client': ('127.0.0.1', 12345),
+        'server': ('localhost', 8000),
+    }
+    asyncio.run(application(scope, receive, send))
+    assert [message['type'] for message in sent] == ['http.response.start', 'http.response.body']
+    return sent[0]['status'], dict(sent[0]['headers']), sent[1]['body']
+
+
+def post(path, data, **kwargs):
+    request = get_request(data)
+    headers = dict(request['headers'], **{'Content-Type': request['content_type']})
+    return call(path, headers=headers.items(), body=request['data'].encode('utf8'), **kwargs)
+
+
+def test_index(client):
+    status, _, body = call('/', method='GET')
+    assert status == 200
+    assert body == client.get('/').data
+
+
+def test_telemetry(client):
+    register_device()
+    data = {'data': [generate_telemetry() for _ in range(50)]}
+    status, _, body = post(url_for('v1_0_0.vehicle_telemetry'), data, chunk_size=100)
+    assert status == 201
+    assert json.loads(body) == {'result': 50, 'failures': []}
+
+
+def test_chunked_telemetry(client):
+    register_device()
+    request = get_request({'data': [generate_telemetry() for _ in range(50)]})
+    headers = dict(request['headers'], **{'Content-Type': request['content_type'], 'Transfer-Encoding': 'chunked'})
+    url = url_for('v1_0_0.vehicle_telemetry')
+    status, _, body = call(url, headers=headers.items(), body=request['data'].encode('utf8'), chunk_size=100)
+    assert status == 201
+    assert json.loads(body) == {'result': 50, 'failures': []}
+
+
+def test_same_errors_as_wsgi(client):
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    status, _, body = post(url, {'foo': 'bar'})
+    response = client.post(url, **get_request({'foo': 'bar'}))
+    assert status == response.status_code == 400
+    assert body == response.data
+
+
+def test_concurrent_requests(client):
+    register_device()
+    url = url_for('v1_0_0.vehicle_telemetry')
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        data = {'data': [generate_telemetry()]}
+        return await asyncio.gather(*(loop.run_in_executor(None, post, url, data) for _ in range(10)))
+
+    assert [status for status, _, _ in asyncio.run(run())] == [201] * 10
+
+
+def test_lifespan():
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(application({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,74 @@
+import json
+import uuid
+
+import jwt
+from flask import url_for
+
+from mds_agency_validator import auth
+from mds_agency_validator.auth import TokenCache, token_cache
+
+
+def make_token(**claims):
+    return jwt.encode(claims, 'secret', algorithm='HS256')
+
+
+def test_decode():
+    provider_id = str(uuid.uuid4())
+    cache = TokenCache()
+    assert cache.decode(make_token(provider_id=provider_id)) == ({'provider_id': provider_id}, None)
+    assert cache.decode(make_token(foo='bar')) == ({'foo': 'bar'}, 'Please provide a provider_id')
+    assert cache.decode('not a token') == (None, 'Please provide a valid JWT')
+
+
+def test_hits_and_rejections():
+    cache = TokenCache()
+    token = make_token(provider_id=str(uuid.uuid4()))
+    for _ in range(3):
+        cache.decode(token)
+        cache.decode('not a token')
+    assert cache.stats() == {'entries': 2, 'hits': 4, 'misses': 2, 'hit_rate': 4 / 6}
+
+
+def test_lru_eviction():
+    cache = TokenCache(max_entries=2)
+    tokens = [make_token(provider_id=str(i)) for i in range(3)]
+    cache.decode(tokens[0])
+    cache.decode(tokens[1])
+    cache.decode(tokens[0])
+    cache.decode(tokens[2])
+    assert list(cache.data) == [tokens[0], tokens[2]]
+
+
+def test_disabled():
+    cache = TokenCache(max_entries=0)
+    token = make_token(provider_id=str(uuid.uuid4()))
+    cache.decode(token)
+    cache.decode(token)
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['misses'] == 2
+
+
+def test_expiration(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, 'time', lambda: now[0])
+    cache = TokenCache()
+    token = make_token(provider_id=str(uuid.uuid4()), exp=1010)
+    cache.decode(token)
+    now[0] = 1009
+    cache.decode(token)
+    now[0] = 1010
+    cache.decode(token)
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_repeated_requests(client):
+    token_cache.clear()
+    headers = {'Authorization': 'Bearer %s' % make_token(foo='bar')}
+    for _ in range(2):
+        response = client.post(
+            url_for('v1_0_0.vehicle_register'), data=json.dumps({}), content_type='application/json', headers=headers
+        )
+        assert response.status_code == 401
+        assert 'Please provide a provider_id' in response.data.decode('utf8')
+    assert len(token_cache.data) == 1
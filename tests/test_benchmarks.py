@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from benchmarks import codec, fail_fast, import_time, loadgen, suite
+
+
+def test_suite(tmp_path):
+    output = tmp_path / 'results.json'
+    args = ['--telemetry-sizes', '1', '--registry-sizes', '10', '--min-time', '0', '--min-rounds', '1']
+    assert suite.main(args + ['--output', str(output)]) == 0
+    results = json.loads(output.read_text())['results']
+    assert 'v0_4_0.telemetry.1.invalid' in results
+    assert 'v1_0_0.register.valid' in results
+    assert 'registry.10.event' in results
+    assert results['v1_0_0.update.valid']['rounds'] == 1
+
+
+def test_compare():
+    baseline = {'a': {'median_ms': 1.0}, 'b': {'median_ms': 1.0}}
+    results = {'a': {'median_ms': 1.1}, 'b': {'median_ms': 1.5}, 'c': {'median_ms': 10.0}}
+    assert suite.compare(results, baseline, 0.2) == [('b', 1.0, 1.5, 1.5)]
+
+
+def test_fail_fast():
+    results = fail_fast.run(engines=('compiled',), telemetry_sizes=(10,), min_time=0, min_rounds=1)
+    full, first_anomaly = results['compiled']['v1_0_0.telemetry.10.invalid']
+    assert full > 0 and first_anomaly > 0
+
+
+def test_codec():
+    results = codec.run(telemetry_sizes=(10,), repeat=1)
+    assert {'json', 'orjson', 'msgpack'} <= set(results[10])
+
+
+@pytest.mark.parametrize('version', ['v0_4_0', 'v1_0_0'])
+def test_loadgen(version):
+    results = loadgen.run(version, providers=2, devices=5, rps=200, duration=0.5, batch_size=5, seed=0)
+    assert results['register']['all']['requests'] == 10
+    traffic = results['traffic']['all']
+    assert traffic['requests'] == 100
+    assert traffic['errors'] == 0
+    assert set(results['traffic']) == {'all', 'event', 'telemetry'}
+
+
+def test_import_time():
+    results = import_time.run(repeat=1)
+    # Dependencies of requests are not imported on start
+    assert results['package'][1] == []
+    assert results['app.no_warm_up'][1] == []
@@ -0,0 +1,76 @@
+import io
+import json
+
+from flask import url_for
+
+from mds_agency_validator import limits
+from mds_agency_validator.metrics import metrics
+from tests.test_asgi import post
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0 import test_vehicle_register
+from tests.v1_0_0.utils import generate_telemetry
+
+TOO_LARGE = {'error': 'payload_too_large', 'max_size': 1000}
+SMALL_LIMITS = {'vehicle_register': 1000, 'vehicle_telemetry': 1000}
+
+
+def chunked_request(payload):
+    """Request without Content-Length, as chunked uploads are"""
+    request = get_request(payload)
+    return {
+        'input_stream': io.BytesIO(request.pop('data').encode('utf8')),
+        'environ_overrides': {'wsgi.input_terminated': True},
+        **request,
+    }
+
+
+def test_limited_body():
+    exceeded = []
+    body = limits.LimitedBody(io.BytesIO(b'0123456789'), 4, exceeded.append)
+    assert body.read(3) == b'012'
+    assert not exceeded
+    assert body.read() == b'34'
+    assert exceeded == [5]
+    assert body.read() == b''
+    assert exceeded == [5]
+
+
+@settings(MAX_BODY_SIZES=SMALL_LIMITS)
+def test_content_length(client, config):
+    url = url_for('v1_0_0.vehicle_register')
+    payload = test_vehicle_register.generate_payload()
+    assert client.post(url, **get_request(payload)).status == '201 CREATED'
+    payload['vehicle_id'] = 'x' * 1000
+    response = client.post(url, **get_request(payload))
+    assert response.status == '413 REQUEST ENTITY TOO LARGE'
+    assert response.json == TOO_LARGE
+
+
+@settings(MAX_BODY_SIZES=SMALL_LIMITS)
+def test_chunked(client, config):
+    register_device()
+    url = url_for('v1_0_0.vehicle_telemetry')
+    response = client.post(url, **chunked_request({'data': [generate_telemetry()]}))
+    assert response.status == '201 CREATED'
+    response = client.post(url, **chunked_request({'data': [generate_telemetry() for _ in range(10)]}))
+    assert response.status == '413 REQUEST ENTITY TOO LARGE'
+    assert response.json == TOO_LARGE
+
+
+@settings(MAX_BODY_SIZES=SMALL_LIMITS)
+def test_asgi(client, config):
+    register_device()
+    data = {'data': [generate_telemetry() for _ in range(10)]}
+    status, headers, body = post(url_for('v1_0_0.vehicle_telemetry'), data, chunk_size=100)
+    assert status == 413
+    assert headers[b'content-type'] == b'application/json'
+    assert json.loads(body) == TOO_LARGE
+
+
+@settings(MAX_BODY_SIZES=SMALL_LIMITS)
+def test_metrics(client, config):
+    metrics.clear()
+    url = url_for('v1_0_0.vehicle_telemetry')
+    client.post(url, **get_request({'data': [generate_telemetry() for _ in range(10)]}))
+    text = client.get(url_for('metrics_view')).data.decode()
+    assert 'mds_oversized_bodies_total{version="v1_0_0",route="vehicle_telemetry",payload_bytes="10240"} 1' in text
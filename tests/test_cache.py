@@ -0,0 +1,80 @@
+import threading
+
+from mds_agency_validator import cache as cache_module
+from mds_agency_validator.cache import Cache
+
+
+def test_set_get_clear():
+    cache = Cache()
+    cache.set('key', {'device_id': 'key'})
+    assert cache.get('key') == {'device_id': 'key'}
+    assert cache.get('unknown') is None
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = Cache(max_entries=2, shards=1)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # a is now the most recently used
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats() == {'entries': 2, 'hits': 3, 'misses': 1, 'evictions': 1}
+
+
+def test_small_bound():
+    """Small caches are one exact LRU"""
+    cache = Cache(max_entries=10)
+    assert len(cache.shards) == 1
+    for i in range(20):
+        cache.set(i, i)
+    assert len(cache) == 10
+    assert cache.get_many(range(20)) == {i: i for i in range(10, 20)}
+
+
+def test_sharded_bound():
+    cache = Cache(max_entries=1000)
+    assert len(cache.shards) == 15
+    assert sum(shard.max_entries for shard in cache.shards) == 1000
+    for i in range(5000):
+        cache.set(i, i)
+    assert len(cache) == 1000
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = Cache(ttl=10)
+    cache.set('a', 1)
+    now[0] += 9
+    assert cache.get('a') == 1
+    now[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats() == {'entries': 0, 'hits': 1, 'misses': 1, 'evictions': 1}
+
+
+def test_threads():
+    cache = Cache(max_entries=1000)
+
+    def worker(thread):
+        for i in range(2000):
+            key = '%s-%s' % (thread, i)
+            cache.set(key, i)
+            # other threads may have evicted it already
+            assert cache.get(key) in (i, None)
+
+    threads = [threading.Thread(target=worker, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) <= 1000
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 8 * 2000
+    assert stats['evictions'] == 8 * 2000 - len(cache)
@@ -0,0 +1,111 @@
+import json
+import uuid
+
+import pytest
+
+from mds_agency_validator import cli
+from mds_agency_validator.cache import cache, create_backend
+from tests.utils import REGISTERED_DEVICE_ID, get_request, settings
+from tests.v1_0_0.utils import generate_telemetry
+
+DEVICE = {
+    'device_id': REGISTERED_DEVICE_ID,
+    'vehicle_id': 'AM-9863-EZ',
+    'vehicle_type': 'scooter',
+    'propulsion_types': ['electric'],
+}
+
+
+def make_record(endpoint, data):
+    request = get_request(data)
+    return {'endpoint': endpoint, 'headers': request['headers'], 'body': data}
+
+
+def run(tmp_path, lines, *args):
+    dump = tmp_path / 'dump.ndjson'
+    dump.write_text('\n'.join(lines) + '\n')
+    output = tmp_path / 'verdicts.ndjson'
+    assert cli.main(['validate-file', str(dump), '--output', str(output)] + list(args)) == 0
+    verdicts = [json.loads(line) for line in output.read_text().splitlines()]
+    return {verdict.pop('line'): verdict for verdict in verdicts}
+
+
+def test_get_device_ids():
+    assert cli.get_device_ids({'endpoint': '/v1.0.0/vehicles/abc/event'}) == ['abc']
+    assert cli.get_device_ids({'endpoint': '/v1.0.0/vehicles', 'body': DEVICE}) == [REGISTERED_DEVICE_ID]
+    telemetry = json.dumps({'data': [generate_telemetry(), dict(generate_telemetry(), device_id='abc')]})
+    record = {'endpoint': '/v1.0.0/vehicles/telemetry', 'body': telemetry}
+    assert cli.get_device_ids(record) == [REGISTERED_DEVICE_ID, 'abc']
+    assert not cli.get_device_ids({'endpoint': '/unknown', 'body': DEVICE})
+
+
+def test_validate_file(tmp_path, capsys):
+    telemetry = {'data': [generate_telemetry() for _ in range(3)]}
+    lines = [
+        json.dumps(make_record('/v1.0.0/vehicles', DEVICE)),
+        json.dumps(make_record('/v1.0.0/vehicles/telemetry', telemetry)),
+        '',
+        'not json',
+        json.dumps(make_record('/v1.0.0/vehicles', {'foo': 'bar'})),
+        json.dumps(make_record('/unknown', {})),
+    ]
+    verdicts = run(tmp_path, lines, '--workers', '2', '--chunk-size', '1')
+    assert verdicts[1] == {'status': 201, 'response': None}
+    # The device was registered by the same worker before its telemetry
+    assert verdicts[2] == {'status': 201, 'response': {'result': 3, 'failures': []}}
+    assert verdicts[4]['status'] is None
+    assert verdicts[4]['errors'].startswith('Invalid json')
+    assert verdicts[5]['status'] == 400
+    assert set(verdicts[5]['errors']) == {'bad_param', 'missing_param'}
+    assert verdicts[6]['status'] == 404
+    assert '5 records validated' in capsys.readouterr().err
+
+
+@pytest.fixture(name='registry_backend', params=['memory', 'sqlite'])
+def fixture_registry_backend(request, tmp_path, config):
+    config.update(REGISTRY_BACKEND=request.param, REGISTRY_SQLITE_PATH=str(tmp_path / 'registry.sqlite3'))
+    backend = cache.backend
+    cache.set_backend(create_backend(config))
+    yield request.param
+    cache.set_backend(backend)
+
+
+@pytest.mark.parametrize('workers', ['1', '4'])
+def test_batch_of_several_devices(tmp_path, registry_backend, workers):
+    devices = [dict(DEVICE, device_id=str(uuid.uuid4())) for _ in range(8)]
+    telemetry = {'data': [dict(generate_telemetry(), device_id=device['device_id']) for device in devices]}
+    events = {
+        'data': [
+            {
+                'device_id': device['device_id'],
+                'event': {
+                    'vehicle_state': 'available',
+                    'event_types': ['maintenance'],
+                    'timestamp': telemetry['data'][0]['timestamp'],
+                    'telemetry': point,
+                },
+            }
+            for device, point in zip(devices, telemetry['data'])
+        ]
+    }
+    lines = [json.dumps(make_record('/v1.0.0/vehicles', device)) for device in devices]
+    lines += [
+        json.dumps(make_record('/v1.0.0/vehicles/telemetry', telemetry)),
+        json.dumps(make_record('/v1.0.0/vehicles/events', events)),
+        json.dumps(make_record('/v1.0.0/vehicles', devices[0])),
+    ]
+    verdicts = run(tmp_path, lines, '--workers', workers, '--chunk-size', '1')
+    assert len(verdicts) == 11
+    assert all(verdicts[line] == {'status': 201, 'response': None} for line in range(1, 9))
+    # Devices registered by other workers are known to the worker validating the batches
+    assert verdicts[9] == {'status': 201, 'response': {'result': 8, 'failures': []}}
+    assert verdicts[10] == {'status': 201, 'response': {'result': 8, 'failures': []}}
+    assert verdicts[11]['status'] == 409
+
+
+@settings(SEQUENCE_CHECKS=True)
+def test_sequence_checks_single_process(tmp_path, config, capsys):
+    dump = tmp_path / 'dump.ndjson'
+    dump.write_text(json.dumps(make_record('/v1.0.0/vehicles', DEVICE)) + '\n')
+    assert cli.main(['validate-file', str(dump), '--workers', '2']) == 2
+    assert 'SEQUENCE_CHECKS requires --workers 1' in capsys.readouterr().err
@@ -0,0 +1,107 @@
+import json
+
+import msgpack
+import pytest
+from flask import url_for
+from werkzeug.exceptions import BadRequest
+
+from mds_agency_validator import codec
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0 import test_vehicle_register
+from tests.v1_0_0.utils import generate_telemetry
+
+
+@pytest.mark.parametrize(
+    'data',
+    [
+        b'{"a": 1, "a": 2}',
+        b'[NaN, Infinity, 1e400]',
+        b'[123456789012345678901234567890, -9223372036854775809, 18446744073709551616]',
+        b'["\\ud800", "\\u00e9", "\xc3\xa9"]',
+        b'[-0, -0.0, 1.0, 1E2, 0.1234567890123456789]',
+    ],
+)
+def test_same_payloads(data):
+    assert repr(codec.loads_orjson(data)) == repr(codec.loads_json(data))
+
+
+@pytest.mark.parametrize('data', [b'', b'{"a": }', b'\xef\xbb\xbf{}', b'\xff'])
+def test_same_errors(data):
+    with pytest.raises(ValueError) as json_error:
+        codec.loads_json(data)
+    with pytest.raises(ValueError) as orjson_error:
+        codec.loads_orjson(data)
+    assert type(orjson_error.value) is type(json_error.value)
+
+
+def test_json_decoder():
+    assert codec.get_json_decoder('json') is codec.loads_json
+    assert codec.get_json_decoder('auto') is codec.loads_orjson
+    with pytest.raises(ValueError):
+        codec.get_json_decoder('simplejson')
+
+
+@settings({'JSON_DECODER': 'json'}, {'JSON_DECODER': 'orjson'}, ids=['json', 'orjson'])
+def test_same_verdicts(client, config):
+    register_device()
+    bad_telemetry = generate_telemetry()
+    bad_telemetry['timestamp'] = 12345678901234567890123
+    bad_telemetry['gps']['lat'] = 'é'
+    url = url_for('v1_0_0.vehicle_telemetry')
+    response = client.post(url, **get_request({'data': [generate_telemetry(), bad_telemetry]}))
+    assert response.status == '201 CREATED'
+    assert response.data == json.dumps({'result': 1, 'failures': [bad_telemetry]}).encode()
+
+
+def msgpack_request(payload):
+    request = get_request({})
+    request['data'] = msgpack.packb(payload)
+    request['content_type'] = 'application/msgpack'
+    return request
+
+
+def test_msgpack_register(client):
+    url = url_for('v1_0_0.vehicle_register')
+    response = client.post(url, **msgpack_request(test_vehicle_register.generate_payload()))
+    assert response.status == '201 CREATED'
+
+    payload = test_vehicle_register.generate_payload()
+    payload['year'] = 2020.5
+    response = client.post(url, **msgpack_request(payload))
+    assert response.status == '400 BAD REQUEST'
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_msgpack_telemetry(client, config, streaming):
+    register_device()
+    config['STREAMING_TELEMETRY'] = streaming
+    telemetries = [generate_telemetry(), generate_telemetry()]
+    del telemetries[1]['timestamp']
+    response = client.post(url_for('v1_0_0.vehicle_telemetry'), **msgpack_request({'data': telemetries}))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 1, 'failures': [telemetries[1]]}
+
+
+@pytest.mark.parametrize(
+    'payload',
+    [
+        {b'device_id': 'foo'},
+        {1: 'foo'},
+        {'year': b'2020'},
+        {'data': [{'timestamp': msgpack.ExtType(1, b'2020')}]},
+        msgpack.Timestamp(0),
+    ],
+)
+def test_msgpack_types(payload):
+    with pytest.raises(BadRequest) as error:
+        codec.loads(msgpack.packb(payload), 'application/msgpack')
+    assert json.loads(error.value.description) == {'error': 'unsupported_msgpack_type'}
+
+
+def test_msgpack_binary_values(client):
+    register_device()
+    telemetries = [generate_telemetry(), dict(generate_telemetry(), timestamp=b'\xff')]
+    response = client.post(url_for('v1_0_0.vehicle_telemetry'), **msgpack_request({'data': telemetries}))
+    assert response.status == '400 BAD REQUEST'
+    response = client.post(url_for('v1_0_0.vehicle_register'), **msgpack_request({b'device_id': 'foo'}))
+    assert response.status == '400 BAD REQUEST'
@@ -0,0 +1,52 @@
+import json
+import random
+import uuid
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator import columnar
+from mds_agency_validator.schemas import schema_registry
+from mds_agency_validator.validators import MdsValidator
+from tests.test_compiler import mutate
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0.utils import generate_telemetry
+
+pytest.importorskip('numpy')
+
+SCHEMAS = [('v0_4_0/schemas', 'vehicle_telemetry.yaml'), ('v1_0_0/schemas', 'vehicle_telemetry.yaml')]
+
+
+@pytest.mark.parametrize('schema_key', SCHEMAS)
+def test_same_failures_as_cerberus(schema_key):
+    rand = random.Random(schema_key[0])
+    validator = columnar.get_validator(*schema_key)
+    cerberus_validator = MdsValidator(schema_registry.get(*schema_key))
+    for _ in range(30):
+        data = [mutate(generate_telemetry(), rand) for _ in range(50)]
+        data[rand.randrange(50)]['device_id'] = str(uuid.uuid4()).upper() + 'suffix'
+        data[rand.randrange(50)]['device_id'] = str(uuid.uuid4())[:-1] + 'g'
+        data[rand.randrange(50)] = 'not a dict'
+        cerberus_validator.validate({'data': data})
+        expected = set(cerberus_validator.errors['data'][0])
+
+        invalid, unclassified = columnar.analyze_rows(validator, data)
+        assert set(invalid) <= expected
+        # Everything else must be left to cerberus
+        assert expected - set(invalid) <= set(unclassified)
+
+
+@settings(COLUMNAR_TELEMETRY=True, COLUMNAR_MIN_BATCH_SIZE=1)
+def test_columnar_telemetry(client, config):
+    register_device()
+    bad_lat = generate_telemetry()
+    bad_lat['gps']['lat'] = 95
+    bad_gps = generate_telemetry()
+    bad_gps['gps'] = 'here'
+    unregistered = generate_telemetry()
+    unregistered['device_id'] = str(uuid.uuid4())
+    telemetries = [generate_telemetry(), bad_lat, bad_gps, unregistered, generate_telemetry()]
+    url = url_for('v1_0_0.vehicle_telemetry')
+    response = client.post(url, **get_request({'data': telemetries}))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 2, 'failures': [bad_lat, bad_gps, unregistered]}
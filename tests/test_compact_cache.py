@@ -0,0 +1,46 @@
+import uuid
+
+from mds_agency_validator import compact_cache
+from tests.utils import REGISTERED_DEVICE_ID
+
+DEVICE = {
+    'device_id': REGISTERED_DEVICE_ID,
+    'vehicle_id': 'AM-9863-EZ',
+    'vehicle_type': 'scooter',
+    'propulsion_types': ['electric'],
+}
+
+
+def test_encode_key():
+    assert compact_cache.encode_key(REGISTERED_DEVICE_ID) == uuid.UUID(REGISTERED_DEVICE_ID).bytes
+    # Keys are not normalized
+    assert compact_cache.encode_key(REGISTERED_DEVICE_ID.upper()) == REGISTERED_DEVICE_ID.upper()
+    assert compact_cache.encode_key('not-an-uuid') == 'not-an-uuid'
+    assert compact_cache.encode_key(None) is None
+
+
+def test_set_get():
+    cache = compact_cache.CompactCache()
+    cache.set(REGISTERED_DEVICE_ID, DEVICE)
+    record = cache.get(REGISTERED_DEVICE_ID)
+    assert isinstance(record, compact_cache.DeviceRecord)
+    assert (record.vehicle_id, record.vehicle_type, record.propulsion) == ('AM-9863-EZ', 'scooter', ('electric',))
+    assert cache.get(REGISTERED_DEVICE_ID.upper()) is None
+    assert cache.get_many([REGISTERED_DEVICE_ID, str(uuid.uuid4())]) == {REGISTERED_DEVICE_ID: record}
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.get(REGISTERED_DEVICE_ID) is None
+
+
+def test_shared_attributes():
+    cache = compact_cache.CompactCache()
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    cache.set(first, dict(DEVICE, propulsion_types=['electric']))
+    cache.set(second, dict(DEVICE, propulsion_types=['electric']))
+    assert cache.get(first).propulsion is cache.get(second).propulsion
+
+
+def test_keep_payload():
+    cache = compact_cache.CompactCache(keep_payload=True)
+    cache.set(REGISTERED_DEVICE_ID, DEVICE)
+    assert cache.get(REGISTERED_DEVICE_ID) == DEVICE
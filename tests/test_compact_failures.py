@@ -0,0 +1,68 @@
+import json
+import uuid
+
+from flask import url_for
+
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0.utils import generate_telemetry
+
+SETTINGS = {
+    'rows': {},
+    'columnar': {'COLUMNAR_TELEMETRY': True, 'COLUMNAR_MIN_BATCH_SIZE': 1},
+    'streaming': {'STREAMING_TELEMETRY': True, 'STREAMING_CHUNK_SIZE': 16},
+}
+
+
+def post_telemetry(client, telemetries, query_string=None):
+    url = url_for('v1_0_0.vehicle_telemetry')
+    return client.post(url, query_string=query_string, **get_request({'data': telemetries}))
+
+
+@settings(*SETTINGS.values(), ids=list(SETTINGS))
+def test_compact_failures(client, config):
+    register_device()
+    missing_device = generate_telemetry()
+    del missing_device['device_id']
+    bad_gps = generate_telemetry()
+    bad_gps['gps']['lat'] = 'north'
+    unregistered = generate_telemetry()
+    unregistered['device_id'] = str(uuid.uuid4())
+    telemetries = [generate_telemetry(), missing_device, bad_gps, unregistered, 'foo']
+
+    response = post_telemetry(client, telemetries, {'failures': 'compact'})
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {
+        'result': 1,
+        'failures': [
+            {'index': 1, 'missing_param': ['device_id']},
+            {'index': 2, 'bad_param': ['gps.lat']},
+            {'index': 3, 'error': 'unregistered_device'},
+            {'index': 4, 'error': 'invalid_telemetry'},
+        ],
+    }
+
+
+def test_compact_failures_setting(client, config):
+    register_device()
+    bad_telemetry = generate_telemetry()
+    del bad_telemetry['timestamp']
+    telemetries = [generate_telemetry(), bad_telemetry]
+
+    config['TELEMETRY_FAILURES'] = 'compact'
+    response = post_telemetry(client, telemetries)
+    assert response.data == b'{"result": 1, "failures": [{"index": 1, "missing_param": ["timestamp"]}]}'
+    # The query parameter overrides the setting
+    response = post_telemetry(client, telemetries, {'failures': 'payload'})
+    assert json.loads(response.data)['failures'] == [bad_telemetry]
+
+
+def test_no_failures(client):
+    register_device()
+    response = post_telemetry(client, [generate_telemetry()], {'failures': 'compact'})
+    assert response.data == b'{"result": 1, "failures": []}'
+
+
+def test_unknown_failures_format(client):
+    register_device()
+    response = post_telemetry(client, [generate_telemetry()], {'failures': 'indexes'})
+    assert response.status == '400 BAD REQUEST'
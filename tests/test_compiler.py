@@ -0,0 +1,145 @@
+"""Differential tests: compiled schemas should find the same errors as cerberus"""
+import copy
+import html
+import json
+import random
+import uuid
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator import compiler
+from mds_agency_validator.schemas import schema_registry
+from mds_agency_validator.validators import MdsValidator
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device, settings
+from tests.v0_4_0 import test_vehicle_event as v0_4_0_event
+from tests.v0_4_0 import test_vehicle_register as v0_4_0_register
+from tests.v0_4_0 import test_vehicle_telemetry as v0_4_0_telemetry
+from tests.v0_4_0 import test_vehicle_update as v0_4_0_update
+from tests.v0_4_0.utils import generate_telemetry as v0_4_0_telemetry_point
+from tests.v1_0_0 import test_vehicle_event as v1_0_0_event
+from tests.v1_0_0 import test_vehicle_register as v1_0_0_register
+from tests.v1_0_0 import test_vehicle_telemetry as v1_0_0_telemetry
+from tests.v1_0_0 import test_vehicle_update as v1_0_0_update
+from tests.v1_0_0.utils import generate_telemetry as v1_0_0_telemetry_point
+
+PAYLOADS = {
+    ('v0_4_0/schemas', 'vehicle_register.yaml'): v0_4_0_register.generate_payload,
+    ('v0_4_0/schemas', 'vehicle_update.yaml'): v0_4_0_update.generate_payload,
+    ('v0_4_0/schemas', 'vehicle_event.yaml'): lambda: v0_4_0_event.generate_payload(
+        {'event_type': 'trip_start', 'trip_id': str(uuid.uuid4())}
+    ),
+    ('v0_4_0/schemas', 'vehicle_telemetry.yaml'): lambda: v0_4_0_telemetry.generate_payload(
+        [v0_4_0_telemetry_point() for _ in range(3)]
+    ),
+    ('v1_0_0/schemas', 'vehicle_register.yaml'): v1_0_0_register.generate_payload,
+    ('v1_0_0/schemas', 'vehicle_update.yaml'): v1_0_0_update.generate_payload,
+    ('v1_0_0/schemas', 'vehicle_event.yaml'): lambda: v1_0_0_event.generate_payload(
+        {'vehicle_state': 'available', 'event_types': ['maintenance']}
+    ),
+    ('v1_0_0/schemas', 'vehicle_telemetry.yaml'): lambda: v1_0_0_telemetry.generate_payload(
+        [v1_0_0_telemetry_point() for _ in range(3)]
+    ),
+}
+
+RANDOM_VALUES = [
+    None,
+    True,
+    0,
+    -1000,
+    12.5,
+    1e10,
+    float('nan'),
+    '',
+    'available',
+    'maintenance',
+    str(uuid.uuid4()),
+    str(uuid.uuid4()).upper(),
+    str(uuid.uuid4()) + 'suffix',
+    [],
+    ['maintenance', 'electric'],
+    ['unknown', {}],
+    {},
+    {'lat': 12, 'lng': 500},
+]
+
+
+def mutate(value, rand):
+    """Randomly break a payload: remove or add fields, replace values"""
+    if isinstance(value, dict):
+        value = dict(value)
+        for key in list(value):
+            action = rand.random()
+            if action < 0.1:
+                del value[key]
+            elif action < 0.2:
+                value[key] = rand.choice(RANDOM_VALUES)
+            else:
+                value[key] = mutate(value[key], rand)
+        if rand.random() < 0.1:
+            value[rand.choice(['unknown', 'zzz', 'aaa'])] = rand.choice(RANDOM_VALUES)
+    elif isinstance(value, list):
+        value = [mutate(item, rand) for item in value]
+        if rand.random() < 0.1:
+            value.append(rand.choice(RANDOM_VALUES))
+    return value
+
+
+def assert_same_errors(schema_key, payload):
+    cerberus_validator = MdsValidator(schema_registry.get(*schema_key))
+    compiled_validator = compiler.CompiledValidator(schema_registry.get_function(*schema_key))
+    payload_copy = copy.deepcopy(payload)
+    assert compiled_validator.validate(payload) == cerberus_validator.validate(payload_copy)
+    # repr also checks errors order, which is the order of fields in responses
+    assert repr(compiled_validator.errors) == repr(cerberus_validator.errors)
+
+
+@pytest.mark.parametrize('schema_key', sorted(PAYLOADS))
+def test_test_payloads(schema_key):
+    assert_same_errors(schema_key, PAYLOADS[schema_key]())
+
+
+@pytest.mark.parametrize('schema_key', sorted(PAYLOADS))
+def test_random_payloads(schema_key):
+    rand = random.Random(schema_key[1])
+    for _ in range(300):
+        assert_same_errors(schema_key, mutate(PAYLOADS[schema_key](), rand))
+
+
+@pytest.mark.parametrize('payload', [[], 'string', None])
+def test_not_a_document(payload):
+    cerberus_validator = MdsValidator(schema_registry.get('v1_0_0/schemas', 'vehicle_update.yaml'))
+    compiled_validator = compiler.CompiledValidator(
+        schema_registry.get_function('v1_0_0/schemas', 'vehicle_update.yaml')
+    )
+    with pytest.raises(Exception) as cerberus_error:
+        cerberus_validator.validate(payload)
+    with pytest.raises(Exception) as compiled_error:
+        compiled_validator.validate(payload)
+    assert compiled_error.type is cerberus_error.type
+
+
+def test_unsupported_schema():
+    with pytest.raises(compiler.UnsupportedSchema):
+        compiler.compile_schema({'name': {'type': 'string', 'regex': '[a-z]+'}})
+
+
+@settings(VALIDATION_ENGINE='compiled')
+def test_compiled_engine(client, config):
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    data = v1_0_0_event.generate_payload({'vehicle_state': 'available', 'event_types': ['located']})
+    del data['telemetry']['gps']['lat']
+    data['unknown_field'] = 'nope'
+    response = client.post(url, **get_request(data))
+    assert response.status == '400 BAD REQUEST'
+    expected = html.escape(json.dumps({'bad_param': ['unknown_field'], 'missing_param': ['telemetry.gps.lat']}))
+    assert expected.encode() in response.data
+
+    url = url_for('v1_0_0.vehicle_telemetry')
+    bad_telemetry = v1_0_0_telemetry_point()
+    del bad_telemetry['timestamp']
+    data = v1_0_0_telemetry.generate_payload([v1_0_0_telemetry_point(), bad_telemetry])
+    response = client.post(url, **get_request(data))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 1, 'failures': [bad_telemetry]}
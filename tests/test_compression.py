@@ -0,0 +1,88 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator import compression
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0 import test_vehicle_register
+from tests.v1_0_0.utils import generate_telemetry
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'deflate': zlib.compress,
+}
+if compression.zstandard is not None:
+    COMPRESSORS['zstd'] = compression.zstandard.ZstdCompressor().compress
+
+MAX_SIZE = 1000
+
+
+def compressed_request(payload, encoding):
+    request = get_request(payload)
+    request['data'] = COMPRESSORS[encoding](request['data'].encode('utf8'))
+    request['headers']['Content-Encoding'] = encoding
+    return request
+
+
+def test_decompress_chunks():
+    data = b'0123456789' * 1000
+    chunks = list(compression.decompress([gzip.compress(data)], 'gzip', None, 64))
+    assert b''.join(chunks) == data
+    assert max(len(chunk) for chunk in chunks) == 64
+
+
+@pytest.mark.parametrize('encoding', sorted(COMPRESSORS))
+def test_register(client, encoding):
+    url = url_for('v1_0_0.vehicle_register')
+    response = client.post(url, **compressed_request(test_vehicle_register.generate_payload(), encoding))
+    assert response.status == '201 CREATED'
+
+
+@pytest.mark.parametrize('encoding', sorted(COMPRESSORS))
+@settings(STREAMING_TELEMETRY=True, STREAMING_CHUNK_SIZE=16)
+def test_streaming_telemetry(client, config, encoding):
+    register_device()
+    telemetries = [generate_telemetry() for _ in range(10)]
+    url = url_for('v1_0_0.vehicle_telemetry')
+    response = client.post(url, **compressed_request({'data': telemetries}, encoding))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 10, 'failures': []}
+
+
+@pytest.mark.parametrize('encoding', sorted(COMPRESSORS))
+@settings(DECOMPRESSED_MAX_SIZE=MAX_SIZE)
+def test_decompression_bomb(client, config, encoding):
+    register_device()
+    url = url_for('v1_0_0.vehicle_telemetry')
+    # Compresses into a few hundred bytes
+    payload = {'data': [generate_telemetry()] * 100}
+    request = compressed_request(payload, encoding)
+    assert len(request['data']) < MAX_SIZE
+    response = client.post(url, **request)
+    assert response.status == '413 REQUEST ENTITY TOO LARGE'
+
+
+def test_unsupported_encoding(client):
+    request = get_request(test_vehicle_register.generate_payload())
+    request['headers']['Content-Encoding'] = 'br'
+    response = client.post(url_for('v1_0_0.vehicle_register'), **request)
+    assert response.status == '415 UNSUPPORTED MEDIA TYPE'
+
+
+@pytest.mark.parametrize('encoding', sorted(COMPRESSORS))
+def test_invalid_body(client, encoding):
+    request = get_request(test_vehicle_register.generate_payload())
+    request['headers']['Content-Encoding'] = encoding
+    response = client.post(url_for('v1_0_0.vehicle_register'), **request)
+    assert response.status == '400 BAD REQUEST'
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+def test_truncated_body(client, encoding):
+    request = compressed_request(test_vehicle_register.generate_payload(), encoding)
+    request['data'] = request['data'][:-8]
+    response = client.post(url_for('v1_0_0.vehicle_register'), **request)
+    assert response.status == '400 BAD REQUEST'
@@ -0,0 +1,92 @@
+import html
+import json
+
+from flask import url_for
+
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0 import test_vehicle_register
+from tests.v1_0_0.utils import generate_telemetry
+
+ENGINES = ['cerberus', 'compiled']
+
+
+def engines(**values):
+    """Run the test with each validation engine, and the other settings of values"""
+    return settings(*({'VALIDATION_ENGINE': engine, **values} for engine in ENGINES), ids=ENGINES)
+
+
+def post(client, endpoint, payload, query_string=None):
+    return client.post(url_for(endpoint), query_string=query_string, **get_request(payload))
+
+
+def invalid_registration():
+    payload = test_vehicle_register.generate_payload()
+    payload['year'] = 'last year'
+    payload['vehicle_type'] = 'rocket'
+    del payload['vehicle_id']
+    return payload
+
+
+def test_full_validation(client):
+    response = post(client, 'v1_0_0.vehicle_register', invalid_registration())
+    assert response.status == '400 BAD REQUEST'
+    errors = {'bad_param': ['vehicle_type', 'year'], 'missing_param': ['vehicle_id']}
+    assert html.escape(json.dumps(errors)).encode() in response.data
+
+
+@engines(FAIL_FAST=True)
+def test_first_anomaly(client, config):
+    response = post(client, 'v1_0_0.vehicle_register', invalid_registration())
+    assert response.status == '400 BAD REQUEST'
+    assert any(
+        html.escape(json.dumps(errors)).encode() in response.data
+        for errors in ({'bad_param': ['vehicle_type']}, {'bad_param': ['year']}, {'missing_param': ['vehicle_id']})
+    )
+
+
+@engines()
+def test_missing_field(client, config):
+    payload = test_vehicle_register.generate_payload()
+    del payload['device_id']
+    response = post(client, 'v1_0_0.vehicle_register', payload, {'fail_fast': 'true'})
+    assert response.status == '400 BAD REQUEST'
+    assert html.escape(json.dumps({'missing_param': ['device_id']})).encode() in response.data
+
+
+@engines(FAIL_FAST=True)
+def test_valid_payload(client, config):
+    response = post(client, 'v1_0_0.vehicle_register', test_vehicle_register.generate_payload())
+    assert response.status == '201 CREATED'
+
+
+@engines(FAIL_FAST=True)
+def test_telemetry(client, config):
+    register_device()
+    bad_telemetry = generate_telemetry()
+    bad_telemetry['gps'] = {'lat': 'north', 'lng': 500}
+    del bad_telemetry['timestamp']
+    response = post(client, 'v1_0_0.vehicle_telemetry', {'data': [generate_telemetry(), bad_telemetry, 'foo']})
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 1, 'failures': [bad_telemetry, 'foo']}
+
+    response = post(
+        client, 'v1_0_0.vehicle_telemetry', {'data': [generate_telemetry(), bad_telemetry]}, {'failures': 'compact'}
+    )
+    failures = json.loads(response.data)['failures']
+    assert len(failures) == 1
+    assert failures[0] in (
+        {'index': 1, 'bad_param': ['gps.lat']},
+        {'index': 1, 'bad_param': ['gps.lng']},
+        {'index': 1, 'missing_param': ['timestamp']},
+    )
+
+
+@settings(FAIL_FAST=True)
+def test_query_parameter(client, config):
+    response = post(client, 'v1_0_0.vehicle_register', invalid_registration(), {'fail_fast': 'false'})
+    errors = {'bad_param': ['vehicle_type', 'year'], 'missing_param': ['vehicle_id']}
+    assert html.escape(json.dumps(errors)).encode() in response.data
+
+    response = post(client, 'v1_0_0.vehicle_register', invalid_registration(), {'fail_fast': 'maybe'})
+    assert response.status == '400 BAD REQUEST'
+    assert html.escape(json.dumps({'bad_param': ['fail_fast']})).encode() in response.data
@@ -8,13 +8,16 @@ from .utils import REGISTERED_DEVICE_ID, get_request
 def test_index(client):
     response = client.get(url_for('index'))
     expected = b"""/
+/metrics
 /v0.4.0/vehicles
 /v0.4.0/vehicles/<device_id>
 /v0.4.0/vehicles/<device_id>/event
+/v0.4.0/vehicles/events
 /v0.4.0/vehicles/telemetry
 /v1.0.0/vehicles
 /v1.0.0/vehicles/<device_id>
 /v1.0.0/vehicles/<device_id>/event
+/v1.0.0/vehicles/events
 /v1.0.0/vehicles/telemetry"""
     assert expected == response.data
 
@@ -30,6 +33,8 @@ def test_index(client):
         ('v1_0_0.vehicle_telemetry', {}),
         ('v1_0_0.vehicle_event', {'device_id': REGISTERED_DEVICE_ID}),
         ('v1_0_0.vehicle_update', {'device_id': REGISTERED_DEVICE_ID}),
+        ('v0_4_0.vehicle_events', {}),
+        ('v1_0_0.vehicle_events', {}),
     ],
 )
 def test_no_authorization(client, url_name, url_kwargs):
@@ -106,3 +111,11 @@ def test_invalid_jwt(client, url_name, url_kwargs):
     )
     assert response.status == '401 UNAUTHORIZED'
     assert b'Please provide a valid JWT' in response.data
+
+
+def test_version():
+    import mds_agency_validator
+
+    assert mds_agency_validator.__version__
+    with pytest.raises(AttributeError):
+        mds_agency_validator.unknown  # pylint: disable=pointless-statement
@@ -0,0 +1,97 @@
+import threading
+
+from flask import url_for
+
+from mds_agency_validator.metrics import UNKNOWN_FIELD, Metrics, metrics
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+from tests.v1_0_0.utils import generate_telemetry
+
+
+def get_samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics(client):
+    metrics.clear()
+    register_device()
+    telemetry = [generate_telemetry(), dict(generate_telemetry(), device_id='unknown')]
+    client.post(url_for('v1_0_0.vehicle_telemetry'), **get_request({'data': telemetry}))
+    client.post(url_for('v1_0_0.vehicle_register'), **get_request({'device_id': 'foo'}))
+    client.post(url_for('v0_4_0.vehicle_update', device_id=REGISTERED_DEVICE_ID), **get_request({}))
+
+    response = client.get(url_for('metrics_view'))
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    samples = get_samples(response.data.decode('utf8'))
+    assert samples['mds_requests_total{version="v1_0_0",route="vehicle_telemetry",status="201"}'] == 1
+    assert samples['mds_requests_total{version="v1_0_0",route="vehicle_register",status="400"}'] == 1
+    assert samples['mds_requests_total{version="v0_4_0",route="vehicle_update",status="400"}'] == 1
+    assert samples['mds_telemetry_points_total{version="v1_0_0",result="valid"}'] == 1
+    assert samples['mds_telemetry_points_total{version="v1_0_0",result="failure"}'] == 1
+    assert (
+        samples[
+            'mds_field_failures_total{version="v1_0_0",route="vehicle_register",kind="bad_param",field="device_id"}'
+        ]
+        == 1
+    )
+    assert (
+        samples[
+            'mds_field_failures_total{version="v0_4_0",route="vehicle_update",kind="missing_param",field="vehicle_id"}'
+        ]
+        == 1
+    )
+    histogram = 'version="v1_0_0",route="vehicle_telemetry",payload_bytes="1024"'
+    assert samples['mds_request_duration_seconds_bucket{%s,le="+Inf"}' % histogram] == 1
+    assert samples['mds_request_duration_seconds_count{%s}' % histogram] == 1
+    assert samples['mds_registry_devices'] == 1
+
+
+def test_threads_merged():
+    registry = Metrics()
+
+    def count():
+        for _ in range(100):
+            registry.observe_request('v1_0_0', 'vehicle_event', 201, 10, 0.003)
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.observe_request('v1_0_0', 'vehicle_event', 201, 10**9, 60)
+    merged = registry.merge()
+    # Accumulators of the finished threads were folded
+    assert len(registry.accumulators) == 1
+    assert merged.requests == {('v1_0_0', 'vehicle_event', 201): 401}
+    histogram = merged.latencies[('v1_0_0', 'vehicle_event', 1024)]
+    assert histogram[2] == 400
+    assert merged.latencies[('v1_0_0', 'vehicle_event', '+Inf')][-2] == 1
+
+
+def test_threads_retired():
+    registry = Metrics()
+
+    def count():
+        registry.observe_request('v1_0_0', 'vehicle_event', 201, 10, 0.003)
+
+    for _ in range(50):
+        thread = threading.Thread(target=count)
+        thread.start()
+        thread.join()
+    assert len(registry.accumulators) <= 1
+    assert registry.merge().requests == {('v1_0_0', 'vehicle_event', 201): 50}
+    assert not registry.accumulators
+
+
+def test_unknown_fields(client):
+    metrics.clear()
+    for i in range(3):
+        client.post(url_for('v1_0_0.vehicle_register'), **get_request({'device_id': 'foo', 'field%s' % i: 1}))
+
+    fields = {key[3]: count for key, count in metrics.merge().field_failures.items() if key[2] == 'bad_param'}
+    assert fields == {'device_id': 3, UNKNOWN_FIELD: 3}
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator import capture, cli, replay
+from mds_agency_validator.app import app
+from mds_agency_validator.verdicts import verdict_cache
+from tests.utils import REGISTERED_DEVICE_ID, get_request, settings
+from tests.v1_0_0.utils import generate_telemetry
+
+DEVICE = {
+    'device_id': REGISTERED_DEVICE_ID,
+    'vehicle_id': 'AM-9863-EZ',
+    'vehicle_type': 'scooter',
+    'propulsion_types': ['electric'],
+}
+
+
+@pytest.fixture(name='capture_log')
+def fixture_capture_log(tmp_path):
+    path = tmp_path / 'capture.log'
+    writer = capture.install(app, str(path))
+    yield path
+    app.after_request_funcs[None].pop()
+    writer.close()
+
+
+def send_requests(client):
+    client.post(url_for('v1_0_0.vehicle_register'), **get_request(DEVICE))
+    client.post(url_for('v1_0_0.vehicle_register'), **get_request(DEVICE))
+    client.post(url_for('v1_0_0.vehicle_telemetry'), **get_request({'data': [generate_telemetry()]}))
+    client.post(url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID), **get_request({'foo': 'bar'}))
+    client.post(url_for('v0_4_0.vehicle_update', device_id='unknown'), **get_request({}))
+    client.get('/')
+
+
+def test_encode_read_log():
+    captured = capture.CapturedRequest(1.5, 201, 'v1_0_0.vehicle_register', '/v1.0.0/vehicles', {}, [], b'{}', b'')
+    stream = io.BytesIO(capture.MAGIC + capture.encode_record(captured) * 2)
+    records = list(capture.read_log(stream))
+    assert len(records) == 2
+    assert records[0].status == 201
+    assert records[0].endpoint == 'v1_0_0.vehicle_register'
+    assert records[0].body == b'{}'
+    with pytest.raises(ValueError):
+        list(capture.read_log(io.BytesIO(capture.MAGIC + capture.encode_record(captured)[:-1])))
+    with pytest.raises(ValueError):
+        list(capture.read_log(io.BytesIO(b'garbage')))
+
+
+def test_capture(client, capture_log):
+    send_requests(client)
+    with open(capture_log, 'rb') as stream:
+        records = list(capture.read_log(stream))
+    # The index is not captured
+    assert [record.status for record in records] == [201, 409, 201, 400, 404]
+    assert records[3].view_args == {'device_id': REGISTERED_DEVICE_ID}
+    assert dict(records[0].headers)['Authorization'].startswith('Bearer ')
+
+
+def test_replay(client, capture_log):
+    send_requests(client)
+    with open(capture_log, 'rb') as stream:
+        records = list(capture.read_log(stream))
+    report = replay.replay(app, records * 2)
+    summary = report.summary()
+    assert summary['replayed'] == 10
+    assert summary['endpoints']['v1_0_0.vehicle_register']['count'] == 4
+    assert summary['endpoints']['v1_0_0.vehicle_register']['p99_ms'] > 0
+    # The device is already registered when the log is replayed again
+    assert report.drifts == [(5, 'v1_0_0.vehicle_register', 201, 409)]
+
+
+def test_replay_command(client, capture_log, tmp_path):
+    send_requests(client)
+    output = tmp_path / 'report.json'
+    assert cli.main(['replay', str(capture_log), '--json', '--output', str(output)]) == 0
+    summary = json.loads(output.read_text())
+    assert summary['drifts'] == 0
+    assert summary['replayed'] == 5
+
+
+@settings(VERDICT_CACHE_SIZE=100, SEQUENCE_CHECKS=True)
+def test_repeat(client, capture_log, tmp_path, config):
+    """Each repeat validates the captured traffic, not cached verdicts"""
+    send_requests(client)
+    verdict_cache.hits = 0
+    output = tmp_path / 'report.json'
+    assert cli.main(['replay', str(capture_log), '--repeat', '3', '--json', '--output', str(output)]) == 0
+    summary = json.loads(output.read_text())
+    assert summary['drifts'] == 0
+    assert summary['replayed'] == 15
+    assert verdict_cache.hits == 0
+    verdict_cache.clear()
@@ -0,0 +1,39 @@
+from cerberus.schema import DefinitionSchema
+
+from mds_agency_validator.schemas import SchemaRegistry, schema_registry
+from mds_agency_validator.v1_0_0 import validators
+
+
+def test_warm_up():
+    registry = SchemaRegistry()
+    assert registry.loaded() == []
+    registry.warm_up()
+    assert registry.loaded() == [
+        ('v0_4_0/schemas', 'vehicle_event.yaml'),
+        ('v0_4_0/schemas', 'vehicle_events.yaml'),
+        ('v0_4_0/schemas', 'vehicle_register.yaml'),
+        ('v0_4_0/schemas', 'vehicle_telemetry.yaml'),
+        ('v0_4_0/schemas', 'vehicle_update.yaml'),
+        ('v1_0_0/schemas', 'vehicle_event.yaml'),
+        ('v1_0_0/schemas', 'vehicle_events.yaml'),
+        ('v1_0_0/schemas', 'vehicle_register.yaml'),
+        ('v1_0_0/schemas', 'vehicle_telemetry.yaml'),
+        ('v1_0_0/schemas', 'vehicle_update.yaml'),
+    ]
+
+
+def test_lazy_load():
+    registry = SchemaRegistry()
+    schema = registry.get('v1_0_0/schemas', 'vehicle_update.yaml')
+    assert isinstance(schema, DefinitionSchema)
+    assert registry.loaded() == [('v1_0_0/schemas', 'vehicle_update.yaml')]
+    # Schema is compiled only once
+    assert registry.get('v1_0_0/schemas', 'vehicle_update.yaml') is schema
+
+
+def test_validators_share_schema(client):
+    first = validators.VehicleRegister()
+    second = validators.VehicleRegister()
+    assert first.cerberus_validator is not second.cerberus_validator
+    assert first.cerberus_validator.schema is second.cerberus_validator.schema
+    assert first.cerberus_validator.schema is schema_registry.get('v1_0_0/schemas', 'vehicle_register.yaml')
@@ -0,0 +1,113 @@
+import html
+import json
+import uuid
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator.sequence import SequenceTable, event_sequences
+from mds_agency_validator.v1_0_0.transitions import TRANSITIONS
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+from tests.v1_0_0.test_vehicle_event import generate_payload
+
+
+@pytest.fixture(name='sequence_checks')
+def fixture_sequence_checks(config):
+    config['SEQUENCE_CHECKS'] = True
+    event_sequences.configure(slots=1024)
+    yield event_sequences
+    event_sequences.configure(slots=config['SEQUENCE_SLOTS'])
+
+
+def test_table():
+    table = SequenceTable(slots=16)
+    assert table.get('a') is None
+    assert table.memory() == 0
+    table.set('a', 3, 1000)
+    assert table.get('a') == (3, 1000)
+    assert len(table) == 1
+    assert table.memory() == 16 * 17
+    table.clear()
+    assert table.get('a') is None
+
+
+def test_collisions():
+    """Devices sharing a slot evict each other, and are not mistaken for each other"""
+    table = SequenceTable(slots=1)
+    table.set('a', 1, 1000)
+    table.set('b', 2, 2000)
+    assert table.get('a') is None
+    assert table.get('b') == (2, 2000)
+    assert len(table) == 1
+
+
+def test_bounded_memory():
+    table = SequenceTable(slots=1000)
+    for _ in range(10000):
+        table.set(str(uuid.uuid4()), 1, 0)
+    assert table.memory() == 17000
+    assert len(table) <= 1000
+
+
+def post_event(client, vehicle_state, event_types, timestamp, **kwargs):
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    payload = generate_payload({'vehicle_state': vehicle_state, 'event_types': event_types, **kwargs})
+    payload['timestamp'] = timestamp
+    return client.post(url, **get_request(payload))
+
+
+def assert_bad_params(response, bad_params):
+    assert response.status == '400 BAD REQUEST'
+    assert html.escape(json.dumps({'bad_param': bad_params})).encode() in response.data
+
+
+def test_valid_sequence(client, sequence_checks):
+    register_device()
+    trip_id = str(uuid.uuid4())
+    assert post_event(client, 'available', ['maintenance'], 1000).status_code == 201
+    assert post_event(client, 'reserved', ['reservation_start'], 2000).status_code == 201
+    assert post_event(client, 'on_trip', ['trip_start'], 3000, trip_id=trip_id).status_code == 201
+    # Sent again
+    assert post_event(client, 'on_trip', ['trip_start'], 3000, trip_id=trip_id).status_code == 201
+    assert post_event(client, 'available', ['trip_end'], 4000, trip_id=trip_id).status_code == 201
+    assert sequence_checks.get(REGISTERED_DEVICE_ID) == (TRANSITIONS.state_codes['available'], 4000)
+
+
+def test_bad_transition(client, sequence_checks):
+    register_device()
+    assert post_event(client, 'available', ['maintenance'], 1000).status_code == 201
+    assert_bad_params(post_event(client, 'available', ['trip_end'], 2000, trip_id=str(uuid.uuid4())), ['vehicle_state'])
+    # Invalid events are not recorded
+    assert sequence_checks.get(REGISTERED_DEVICE_ID) == (TRANSITIONS.state_codes['available'], 1000)
+
+
+def test_time_order(client, sequence_checks):
+    register_device()
+    assert post_event(client, 'available', ['maintenance'], 2000).status_code == 201
+    assert_bad_params(post_event(client, 'non_operational', ['battery_low'], 1000), ['timestamp'])
+
+
+def test_unknown_state(client, sequence_checks):
+    register_device()
+    assert post_event(client, 'unknown', ['missing'], 1000).status_code == 201
+    assert post_event(client, 'available', ['provider_drop_off'], 2000).status_code == 201
+
+
+def test_disabled(client):
+    register_device()
+    assert post_event(client, 'available', ['maintenance'], 2000).status_code == 201
+    assert post_event(client, 'available', ['maintenance'], 1000).status_code == 201
+    assert event_sequences.get(REGISTERED_DEVICE_ID) is None
+
+
+def test_huge_timestamp(client, sequence_checks):
+    register_device()
+    assert post_event(client, 'available', ['maintenance'], 1 << 64).status_code == 201
+    assert sequence_checks.get(REGISTERED_DEVICE_ID) is None
+
+
+def test_invalid_state(client, sequence_checks):
+    register_device()
+    response = post_event(client, ['available'], ['maintenance'], 1000)
+    assert response.status_code == 400
+    assert sequence_checks.get(REGISTERED_DEVICE_ID) is None
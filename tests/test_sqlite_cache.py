@@ -0,0 +1,52 @@
+import multiprocessing
+
+import pytest
+
+from mds_agency_validator.sqlite_cache import SqliteCache
+
+
+@pytest.fixture(name='path')
+def fixture_path(tmp_path):
+    return str(tmp_path / 'registry.sqlite3')
+
+
+def test_set_get_clear(path):
+    cache = SqliteCache(path)
+    cache.set('key', {'device_id': 'key'})
+    assert cache.get('key') == {'device_id': 'key'}
+    assert cache.get('unknown') is None
+    assert cache.get(None) is None
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_get_many(path):
+    cache = SqliteCache(path)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, {'device_id': key})
+    # Lookup in database, not in read cache
+    cache.read_cache.clear()
+    assert cache.get('a') == {'device_id': 'a'}
+    assert cache.get_many(['a', 'b', 'unknown', 'c', 'b']) == {
+        'a': {'device_id': 'a'},
+        'b': {'device_id': 'b'},
+        'c': {'device_id': 'c'},
+    }
+    assert not cache.get_many([])
+
+
+def register(path):
+    SqliteCache(path).set('key', {'device_id': 'key'})
+
+
+def test_shared_between_processes(path):
+    cache = SqliteCache(path)
+    assert cache.get('key') is None
+    process = multiprocessing.Process(target=register, args=(path,))
+    process.start()
+    process.join()
+    # Unknown devices are not kept in read cache
+    assert cache.get('key') == {'device_id': 'key'}
+    assert cache.stats()['entries'] == 1
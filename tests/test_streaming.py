@@ -0,0 +1,68 @@
+import json
+import uuid
+
+import pytest
+from flask import url_for
+
+from mds_agency_validator.streaming import StreamingObject
+from tests.utils import get_request, register_device, settings
+from tests.v1_0_0.utils import generate_telemetry
+
+
+def split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+def test_parse_items(chunk_size):
+    payload = {
+        'before': {'nested': [1, 2.5, None, True]},
+        'data': [123456, -1.5e10, 'é€𝄞', [], {}, {'a': [{'b': 'c'}]}, None, False, 7],
+        'after': 'value',
+    }
+    data = json.dumps(payload, ensure_ascii=False, indent=1).encode('utf8')
+    stream = StreamingObject(split(data, chunk_size), 'data')
+    assert list(stream.items()) == payload['data']
+    assert stream.found
+    assert stream.fields == {'before': payload['before'], 'after': 'value'}
+
+
+@pytest.mark.parametrize(
+    'data, expected, found',
+    [
+        (b'{}', [], False),
+        (b'{"data": []}', [], True),
+        (b'{"data": "not a list"}', [], False),
+        (b' { "data" : [ 1 , 2 ] } ', [1, 2], True),
+    ],
+)
+def test_parse_edge_cases(data, expected, found):
+    stream = StreamingObject(split(data, 2), 'data')
+    assert list(stream.items()) == expected
+    assert stream.found == found
+
+
+@pytest.mark.parametrize(
+    'data',
+    [b'', b'[1, 2]', b'{"data": [1, 2}', b'{"data": [1 2]}', b'{"data": [1]} extra', b'{"data": [1], }', b'{1: 2}'],
+)
+def test_invalid_json(data):
+    with pytest.raises(json.JSONDecodeError):
+        list(StreamingObject(split(data, 3), 'data').items())
+
+
+@settings(STREAMING_TELEMETRY=True, STREAMING_CHUNK_SIZE=16)
+def test_streaming_telemetry(client, config):
+    register_device()
+    bad_telemetry = generate_telemetry()
+    del bad_telemetry['gps']['lng']
+    unregistered = generate_telemetry()
+    unregistered['device_id'] = str(uuid.uuid4())
+    telemetries = [generate_telemetry(), bad_telemetry, 'not a dict', unregistered, generate_telemetry()]
+    url = url_for('v1_0_0.vehicle_telemetry')
+    response = client.post(url, **get_request({'data': telemetries}))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {'result': 2, 'failures': [bad_telemetry, 'not a dict', unregistered]}
+
+    response = client.post(url, **get_request({'data': [bad_telemetry]}))
+    assert response.status == '400 BAD REQUEST'
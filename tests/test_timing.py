@@ -0,0 +1,67 @@
+import json
+import logging
+
+from flask import url_for
+
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device, settings
+from tests.v1_0_0.test_vehicle_update import generate_payload
+
+STAGES = [
+    'check_authorization',
+    'extract_payload',
+    'analyze_payload',
+    'additional_checks',
+    'raise_on_anomalies',
+    'valid_response',
+    'total',
+]
+
+
+def parse_server_timing(header):
+    durations = {}
+    for metric in header.split(', '):
+        name, duration = metric.split(';dur=')
+        durations[name] = float(duration)
+    return durations
+
+
+def test_disabled(client):
+    register_device()
+    url = url_for('v1_0_0.vehicle_update', device_id=REGISTERED_DEVICE_ID)
+    response = client.post(url, **get_request(generate_payload()))
+    assert response.status_code == 201
+    assert 'Server-Timing' not in response.headers
+
+
+@settings(STAGE_TIMING=True)
+def test_server_timing(client, config):
+    register_device()
+    url = url_for('v1_0_0.vehicle_update', device_id=REGISTERED_DEVICE_ID)
+    response = client.post(url, **get_request(generate_payload()))
+    assert response.status_code == 201
+    durations = parse_server_timing(response.headers['Server-Timing'])
+    assert list(durations) == STAGES
+    assert durations['total'] >= sum(durations[stage] for stage in STAGES[:-1]) - 0.01
+
+
+@settings(STAGE_TIMING=True)
+def test_server_timing_on_abort(client, config):
+    url = url_for('v1_0_0.vehicle_update', device_id=REGISTERED_DEVICE_ID)
+    response = client.post(url, **get_request(generate_payload()))
+    # Unknown device, aborted in additional checks
+    assert response.status_code == 404
+    assert list(parse_server_timing(response.headers['Server-Timing'])) == STAGES[:4] + ['total']
+
+
+@settings(STAGE_TIMING=True)
+def test_slow_requests(client, config, caplog):
+    register_device()
+    url = url_for('v1_0_0.vehicle_update', device_id=REGISTERED_DEVICE_ID)
+    config['SLOW_REQUEST_THRESHOLD'] = 0
+    with caplog.at_level(logging.WARNING, logger='mds_agency_validator.timing'):
+        client.post(url, **get_request(generate_payload()))
+    record = caplog.records[0].timing
+    assert record['endpoint'] == 'v1_0_0.vehicle_update'
+    assert record['status'] == 201
+    assert list(record['stages_ms']) == STAGES[:-1]
+    assert json.loads(caplog.records[0].getMessage().split(' ', 2)[2]) == record
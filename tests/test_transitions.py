@@ -0,0 +1,46 @@
+import html
+import json
+
+from flask import url_for
+
+from benchmarks import transitions as benchmark
+from mds_agency_validator.v1_0_0 import transitions
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+from tests.v1_0_0.test_vehicle_event import generate_payload
+
+
+def test_same_verdicts_as_sets():
+    for payload in benchmark.generate_payloads():
+        assert benchmark.compiled_check(payload) == benchmark.legacy_check(payload), payload
+
+
+def test_introspection():
+    rules = transitions.TRANSITIONS.describe()
+    assert sorted(rules) == sorted(transitions.ALLOWED_STATE_TRANSITIONS)
+    for state, event_types in transitions.ALLOWED_STATE_TRANSITIONS.items():
+        assert set(rules[state]) == set(event_types) | {'comms_restored', 'located', 'unspecified'}
+    assert transitions.TRANSITIONS.event_types(transitions.TRANSITIONS.trip_events) == [
+        'trip_cancel',
+        'trip_end',
+        'trip_enter_jurisdiction',
+        'trip_leave_jurisdiction',
+        'trip_start',
+    ]
+    assert transitions.TRANSITIONS.allowed_event_types('bogus') == ['comms_restored', 'located', 'unspecified']
+
+
+def test_mask():
+    assert transitions.TRANSITIONS.mask(['maintenance', 'unknown']) == transitions.TRANSITIONS.bits['maintenance']
+    assert transitions.TRANSITIONS.mask('maintenance') == 0
+    assert transitions.TRANSITIONS.mask([{}, 12]) == 0
+
+
+def test_unknown_vehicle_state(client):
+    """Is reported as a bad param, instead of an internal error"""
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    payload = generate_payload({'vehicle_state': ['available'], 'event_types': ['maintenance']})
+    response = client.post(url, **get_request(payload))
+    assert response.status == '400 BAD REQUEST'
+    expected = html.escape(json.dumps({'bad_param': ['vehicle_state', 'event_types']}))
+    assert expected.encode() in response.data
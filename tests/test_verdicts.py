@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import msgpack
+import pytest
+from flask import url_for
+
+from mds_agency_validator.app import app
+from mds_agency_validator.cache import cache
+from mds_agency_validator.verdicts import verdict_cache
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+from tests.v1_0_0 import test_vehicle_event, test_vehicle_register
+from tests.v1_0_0.utils import generate_telemetry
+
+
+@pytest.fixture(name='verdicts')
+def fixture_verdicts(config):
+    size = config['VERDICT_CACHE_SIZE']
+    config['VERDICT_CACHE_SIZE'] = 100
+    verdict_cache.configure(max_entries=100)
+    verdict_cache.hits = verdict_cache.misses = 0
+    yield verdict_cache
+    verdict_cache.configure(max_entries=size)
+
+
+def post_twice(client, url, request):
+    first = client.post(url, **request)
+    second = client.post(url, **request)
+    assert (first.status_code, first.data) == (second.status_code, second.data)
+    return first
+
+
+def test_retried_event(client, verdicts):
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    payload = test_vehicle_event.generate_payload({'vehicle_state': 'available', 'event_types': ['maintenance']})
+    assert post_twice(client, url, get_request(payload)).status_code == 201
+    assert (verdicts.hits, verdicts.misses) == (1, 1)
+
+
+def test_retried_invalid_payload(client, verdicts):
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    assert post_twice(client, url, get_request({'foo': 'bar'})).status_code == 400
+    assert (verdicts.hits, verdicts.misses) == (1, 1)
+
+
+def test_registry_changes(client, verdicts):
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    payload = test_vehicle_event.generate_payload({'vehicle_state': 'available', 'event_types': ['maintenance']})
+    request = get_request(payload)
+    assert client.post(url, **request).status_code == 404
+    register_device()
+    assert client.post(url, **request).status_code == 201
+    cache.clear()
+    assert client.post(url, **request).status_code == 404
+    assert verdicts.hits == 0
+
+
+def test_registration(client, verdicts):
+    url = url_for('v1_0_0.vehicle_register')
+    request = get_request(test_vehicle_register.generate_payload())
+    assert client.post(url, **request).status_code == 201
+    response = client.post(url, **request)
+    assert response.status_code == 409
+    assert b'already_registered' in response.data
+    assert client.post(url, **request).status_code == 409
+    assert (verdicts.hits, verdicts.misses) == (1, 2)
+
+
+def test_telemetry(client, verdicts):
+    register_device()
+    url = url_for('v1_0_0.vehicle_telemetry')
+    unknown_device = dict(generate_telemetry(), device_id='c8b5d5c2-2bd5-4d8a-a40b-9ba0f2a0d8b8')
+    request = get_request({'data': [generate_telemetry(), unknown_device]})
+    assert json.loads(post_twice(client, url, request).data) == {'result': 1, 'failures': [unknown_device]}
+    assert verdicts.hits == 1
+    cache.set(unknown_device['device_id'], {'device_id': unknown_device['device_id']})
+    assert json.loads(client.post(url, **request).data) == {'result': 2, 'failures': []}
+
+
+def test_authorization_is_part_of_the_key(client, verdicts):
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    request = get_request({'foo': 'bar'})
+    assert client.post(url, **request).status_code == 400
+    request['headers']['Authorization'] = 'Bearer bad_jwt'
+    assert client.post(url, **request).status_code == 401
+    assert verdicts.hits == 0
+
+
+@pytest.mark.parametrize('headers', [{'Content-Encoding': 'gzip'}, {'Content-Type': 'application/msgpack'}])
+def test_decoding_headers_are_part_of_the_key(headers):
+    with app.test_request_context(method='POST', data=b'{}'):
+        key = verdict_cache.get_key(None)
+    with app.test_request_context(method='POST', data=b'{}', headers=headers):
+        assert verdict_cache.get_key(None) != key
+
+
+def test_compressed_body(client, verdicts):
+    """Is not mistaken for the same bytes sent without Content-Encoding"""
+    register_device()
+    url = url_for('v1_0_0.vehicle_event', device_id=REGISTERED_DEVICE_ID)
+    request = get_request({'foo': 'bar'})
+    request['data'] = gzip.compress(request['data'].encode('utf8'))
+    request['headers']['Content-Encoding'] = 'gzip'
+    assert client.post(url, **request).status_code == 400
+    del request['headers']['Content-Encoding']
+    client.post(url, **request)
+    assert (verdicts.hits, verdicts.misses) == (0, 2)
+
+
+def test_msgpack_body(client, verdicts):
+    """Is not mistaken for the same bytes sent as json"""
+    url = url_for('v1_0_0.vehicle_register')
+    request = get_request({'device_id': 'foo'})
+    request['data'] = msgpack.packb({'device_id': 'foo'})
+    request['content_type'] = 'application/msgpack'
+    assert client.post(url, **request).status_code == 400
+    request['content_type'] = 'application/json'
+    client.post(url, **request)
+    assert (verdicts.hits, verdicts.misses) == (0, 2)
@@ -5,6 +5,7 @@ import string
 import uuid
 
 import jwt
+import pytest
 
 from mds_agency_validator.cache import cache
 
@@ -33,6 +34,14 @@ def get_request(data):
     }
 
 
+def settings(*overrides, ids=None, **values):
+    """Run the test with the app settings of values, or once for each overrides dict
+
+    The test gets them through the config fixture, which restores settings after it.
+    """
+    return pytest.mark.parametrize('config', list(overrides) or [values], ids=ids, indirect=True)
+
+
 def register_device():
     device = {
         'device_id': REGISTERED_DEVICE_ID,
@@ -0,0 +1,30 @@
+import json
+import uuid
+
+from flask import url_for
+
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+
+from .test_vehicle_event import generate_payload as generate_event
+
+
+def generate_item(event_args):
+    return {'device_id': REGISTERED_DEVICE_ID, 'event': generate_event(event_args)}
+
+
+def test_post(client):
+    register_device()
+    items = [
+        generate_item({'event_type': 'trip_start', 'trip_id': str(uuid.uuid4())}),
+        generate_item({'event_type': 'service_end'}),
+        generate_item({'event_type': 'deregister', 'event_type_reason': 'rebalance'}),
+    ]
+    response = client.post(url_for('v0_4_0.vehicle_events'), **get_request({'data': items}))
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {
+        'result': 1,
+        'failures': [
+            {'index': 1, 'missing_param': ['event.event_type_reason']},
+            {'index': 2, 'bad_param': ['event.event_type_reason']},
+        ],
+    }
@@ -0,0 +1,68 @@
+import html
+import json
+import uuid
+
+from flask import url_for
+
+from tests.utils import REGISTERED_DEVICE_ID, get_request, register_device
+
+from .test_vehicle_event import generate_payload as generate_event
+
+
+def generate_item(event_args=None, device_id=REGISTERED_DEVICE_ID):
+    event_args = event_args or {'vehicle_state': 'available', 'event_types': ['maintenance']}
+    return {'device_id': device_id, 'event': generate_event(event_args)}
+
+
+def post_events(client, items):
+    return client.post(url_for('v1_0_0.vehicle_events'), **get_request({'data': items}))
+
+
+def test_valid_post(client):
+    register_device()
+    items = [
+        generate_item(),
+        generate_item({'vehicle_state': 'on_trip', 'event_types': ['trip_start'], 'trip_id': str(uuid.uuid4())}),
+    ]
+    response = post_events(client, items)
+    assert response.status == '201 CREATED'
+    assert response.data == b'{"result": 2, "failures": []}'
+
+
+def test_partially_invalid(client):
+    register_device()
+    bad_timestamp = generate_item()
+    bad_timestamp['event']['timestamp'] = 'now'
+    trip_without_id = generate_item({'vehicle_state': 'on_trip', 'event_types': ['trip_start']})
+    items = [
+        generate_item(),
+        bad_timestamp,
+        trip_without_id,
+        generate_item(device_id=str(uuid.uuid4())),
+        {'device_id': REGISTERED_DEVICE_ID},
+        'foo',
+    ]
+    response = post_events(client, items)
+    assert response.status == '201 CREATED'
+    assert json.loads(response.data) == {
+        'result': 1,
+        'failures': [
+            {'index': 1, 'bad_param': ['event.timestamp']},
+            {'index': 2, 'missing_param': ['event.trip_id']},
+            {'index': 3, 'error': 'unregistered_device'},
+            {'index': 4, 'missing_param': ['event']},
+            {'index': 5, 'error': 'invalid_event'},
+        ],
+    }
+
+
+def test_all_invalid(client):
+    response = post_events(client, [generate_item()])
+    assert response.status == '400 BAD REQUEST'
+
+
+def test_invalid_payload(client):
+    response = client.post(url_for('v1_0_0.vehicle_events'), **get_request({'foo': 'bar'}))
+    assert response.status == '400 BAD REQUEST'
+    errors = {'bad_param': ['foo'], 'missing_param': ['data']}
+    assert html.escape(json.dumps(errors)).encode() in response.data